@@ -2,21 +2,39 @@ import os
 
 from flask import Flask, g
 from dotenv import load_dotenv
-from sqlalchemy import create_engine, pool
+from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 
+import live_trains
 from routes.station_routes import station_bp
 from routes.map_routes import map_bp
 from routes.train_routes import train_bp
+from routes.live_routes import live_bp
+from routes.journey_routes import journey_bp
+from routes.metrics_routes import metrics_bp
+from services.instrumentation import TimedQueuePool, instrument
+from services.live_positions import LivePositionTicker
+from services.reachability import ReachabilityIndex
+from services.spatial import SpatialIndex
+from services.station_index import StationNameIndex
+from services.timetable import DataVersion, TimetableSnapshot
+from tools.migrate import LATEST_VERSION, current_version
 
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
+# "snapshot" serves the read-only timetable from memory, "sql" queries the DB on every request
+TIMETABLE_MODE = os.getenv("TIMETABLE_MODE", "snapshot")
+# Background computation of all live train positions; set LIVE_TICKER=0 to compute per request
+LIVE_TICKER = os.getenv("LIVE_TICKER", "1") == "1"
+LIVE_TICK_SECONDS = float(os.getenv("LIVE_TICK_SECONDS", "2.5"))
+# SQL mode: how often the data fingerprint behind ETags is re-read, so imports show up without a restart
+DATA_VERSION_TTL = float(os.getenv("DATA_VERSION_TTL", "5"))
 
 
 engine = create_engine(
     DATABASE_URL,
-    poolclass=pool.QueuePool,
+    poolclass=TimedQueuePool,
     pool_size=10,
     max_overflow=20
 )
@@ -26,11 +44,55 @@ SessionLocal = sessionmaker(bind=engine)
 def create_app() -> Flask:
     app = Flask(__name__)
     app.config['DB_ENGINE'] = engine
+    live_trains.configure(engine)
+
+    with engine.connect() as conn:
+        schema_version = current_version(conn)
+    if schema_version < LATEST_VERSION:
+        # Queries rely on the migrated schema (integer stop_order, service-day seconds)
+        raise RuntimeError(
+            f"Database schema version {schema_version} is behind {LATEST_VERSION}; run `python -m tools.migrate upgrade`"
+        )
     app.config['SESSION_FACTORY'] = SessionLocal
+    app.config['TIMETABLE'] = TimetableSnapshot.load(engine) if TIMETABLE_MODE == 'snapshot' else None
+    app.config['REACHABILITY'] = ReachabilityIndex.load(engine)
+
+    timetable = app.config['TIMETABLE']
+    # ETag base for timetable endpoints: fixed for a snapshot, re-fingerprinted on a TTL in SQL mode
+    if timetable is not None:
+        app.config['DATA_VERSION'] = DataVersion.fixed(timetable.version)
+    else:
+        app.config['DATA_VERSION'] = DataVersion(engine, ttl=DATA_VERSION_TTL)
+
+    if timetable is not None:
+        app.config['SPATIAL'] = SpatialIndex.build(timetable.located_stations, timetable.paths)
+        app.config['STATION_NAMES'] = StationNameIndex(timetable.stations.values())
+    else:
+        app.config['SPATIAL'] = SpatialIndex.load(engine)
+        app.config['STATION_NAMES'] = StationNameIndex.load(engine)
+
+    app.config['JOURNEY_PLANNER'] = None
+    app.config['LIVE_TICKER'] = None
+
+    if LIVE_TICKER:
+        ticker = LivePositionTicker(
+            SessionLocal,
+            timetable=app.config['TIMETABLE'],
+            reachability=app.config['REACHABILITY'],
+            interval=LIVE_TICK_SECONDS,
+        )
+        ticker.start()
+        app.config['LIVE_TICKER'] = ticker
 
     app.register_blueprint(station_bp)
     app.register_blueprint(map_bp)
     app.register_blueprint(train_bp)
+    app.register_blueprint(live_bp)
+    app.register_blueprint(journey_bp)
+    app.register_blueprint(metrics_bp)
+
+    # Server-Timing header and /metrics histograms
+    instrument(app, engine)
 
     @app.teardown_appcontext
     def close_db(error):
@@ -0,0 +1,280 @@
+"""
+ASGI entry point for serving many concurrent live viewers from one process:
+
+    uvicorn asgi:application --workers 1
+
+The live endpoints (/api/train_positions and the /api/live/stream SSE feed) are served natively:
+waiting for the next live tick costs a coroutine, not a worker thread or a pooled connection, and
+the actual route lookups run on a small executor sized below the connection pool. Every other
+request goes to the unchanged Flask app, which also runs on that executor, so `python app.py`
+and WSGI servers keep using the synchronous path exactly as before.
+
+The native paths only answer GET (405 otherwise) and report the same Server-Timing header and
+/metrics histograms as the Flask views.
+"""
+import asyncio
+import contextvars
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+from app import create_app
+from db_interface import RouteService
+from routes.live_routes import live_covers_date, live_delta, select_live_trains, sse_event, stream_wait_seconds
+from routes.train_routes import train_positions
+from services.instrumentation import finish_timing, native_request
+
+# Threads running blocking work (route lookups, Flask views); keep below pool_size in app.py
+ASGI_THREADS = int(os.getenv("ASGI_THREADS", 8))
+
+
+class LiveUpdates:
+    """Wakes coroutines waiting for the ticker's next snapshot; the ticker thread calls `publish`."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self._event = asyncio.Event()
+
+    def publish(self, snapshot) -> None:
+        self.loop.call_soon_threadsafe(self._wake)
+
+    def _wake(self) -> None:
+        event, self._event = self._event, asyncio.Event()
+        event.set()
+
+    async def wait(self, timeout: float) -> None:
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+
+class AsgiApp:
+
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        self.executor = ThreadPoolExecutor(ASGI_THREADS, thread_name_prefix='asgi')
+        self.updates = None
+        self.native = {
+            '/api/train_positions': self.train_positions,
+            '/api/live/stream': self.live_stream,
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        if scope['type'] != 'http':
+            return
+
+        handler = self.native.get(scope['path'])
+        if handler is None:
+            return await self.call_flask(scope, receive, send)
+        # Never bridge these paths: the WSGI bridge buffers the whole body, which an SSE stream never ends
+        if scope['method'] != 'GET':
+            await send({'type': 'http.response.start', 'status': 405, 'headers': [(b'allow', b'GET')]})
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+        args = {key: values[0] for key, values in parse_qs(scope['query_string'].decode('latin-1')).items()}
+        with native_request(scope['path']) as timing:
+            return await handler(args, timing, receive, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                ticker = self.flask_app.config.get('LIVE_TICKER')
+                if ticker is not None:
+                    self.updates = LiveUpdates(asyncio.get_running_loop())
+                    ticker.add_listener(self.updates.publish)
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    # ------------------------------------------------------------------
+    # Native live endpoints
+    # ------------------------------------------------------------------
+
+    def live_snapshot(self):
+        ticker = self.flask_app.config.get('LIVE_TICKER')
+        return ticker.current() if ticker is not None else None
+
+    async def run_with_service(self, func, *args):
+        """
+        Runs func(service, *args) on the executor with a fresh RouteService; the session is closed after.
+        Runs in a copy of the caller's context so its queries count towards the request's timing.
+        """
+        config = self.flask_app.config
+
+        def call():
+            session = config['SESSION_FACTORY']()
+            try:
+                service = RouteService(
+                    session,
+                    timetable=config.get('TIMETABLE'),
+                    reachability=config.get('REACHABILITY'),
+                    names=config.get('STATION_NAMES'),
+                )
+                return func(service, *args)
+            finally:
+                session.close()
+
+        context = contextvars.copy_context()
+        return await asyncio.get_running_loop().run_in_executor(self.executor, context.run, call)
+
+    @staticmethod
+    def _timed_headers(timing, headers: list) -> list:
+        # Same Server-Timing header and /metrics histograms as the Flask views get from instrumentation
+        if timing is not None:
+            headers.append((b'server-timing', finish_timing(timing).encode('latin-1')))
+        return headers
+
+    async def train_positions(self, args, timing, receive, send):
+        from_station, to_station = args.get('from_station'), args.get('to_station')
+        trains = []
+        if from_station and to_station:
+            trains = await self.run_with_service(
+                train_positions, self.live_snapshot(), from_station, to_station, args.get('time'), args.get('date'))
+
+        started = time.perf_counter()
+        body = json.dumps(trains, ensure_ascii=False, separators=(',', ':')).encode()
+        if timing is not None:
+            timing.json_seconds += time.perf_counter() - started
+        await send({'type': 'http.response.start', 'status': 200, 'headers': self._timed_headers(timing, [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(body)).encode()),
+        ])})
+        await send({'type': 'http.response.body', 'body': body})
+
+    async def live_stream(self, args, timing, receive, send):
+        """
+        Same frames as the Flask /api/live/stream view, without a thread per open stream.
+        Like Flask's after_request, the timing covers the setup up to the response headers.
+        """
+        from_station, to_station, date_str = args.get('from_station'), args.get('to_station'), args.get('date')
+        if self.updates is None or not from_station or not to_station or \
+                not live_covers_date(self.live_snapshot(), date_str):
+            # 204 tells EventSource not to reconnect, so the client falls back to polling
+            await send({'type': 'http.response.start', 'status': 204, 'headers': self._timed_headers(timing, [])})
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+
+        trips = await self.run_with_service(lambda service: service.get_route_between(from_station, to_station, date_str))
+
+        await send({'type': 'http.response.start', 'status': 200, 'headers': self._timed_headers(timing, [
+            (b'content-type', b'text/event-stream; charset=utf-8'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+        ])})
+
+        wait_seconds = stream_wait_seconds(self.flask_app.config['LIVE_TICKER'])
+        disconnected = asyncio.ensure_future(self._wait_for_disconnect(receive))
+        try:
+            seq, sent = 0, None
+            while not disconnected.done():
+                live = self.live_snapshot()
+                if live is not None and live.seq == seq:
+                    update = asyncio.ensure_future(self.updates.wait(wait_seconds))
+                    await asyncio.wait({update, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+                    update.cancel()
+                    live = self.live_snapshot()
+                    if disconnected.done():
+                        break
+                    if live is not None and live.seq == seq:
+                        await self._send_chunk(send, ": keepalive\n\n")
+                        continue
+                if not live_covers_date(live, date_str):
+                    # The ticker stopped publishing or moved past the requested day; the reconnect gets 204
+                    break
+                seq = live.seq
+
+                # Selecting the route's trains only touches the in-memory snapshot and trips list
+                current = select_live_trains(None, live, trips, date_str)
+                if sent is None:
+                    await self._send_chunk(send, sse_event('full', list(current.values())))
+                else:
+                    delta = live_delta(sent, current)
+                    if any(delta.values()):
+                        await self._send_chunk(send, sse_event('delta', delta))
+                sent = current
+        finally:
+            disconnected.cancel()
+
+    @staticmethod
+    async def _wait_for_disconnect(receive):
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+    @staticmethod
+    async def _send_chunk(send, text: str):
+        await send({'type': 'http.response.body', 'body': text.encode(), 'more_body': True})
+
+    # ------------------------------------------------------------------
+    # Everything else: the Flask app on the executor
+    # ------------------------------------------------------------------
+
+    async def call_flask(self, scope, receive, send):
+        body = b''
+        while True:
+            message = await receive()
+            body += message.get('body', b'')
+            if not message.get('more_body'):
+                break
+
+        environ = self._environ(scope, body)
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            response['status'] = int(status.split(' ', 1)[0])
+            response['headers'] = [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+
+        def call():
+            result = self.flask_app(environ, start_response)
+            try:
+                return b''.join(result)
+            finally:
+                if hasattr(result, 'close'):
+                    result.close()
+
+        content = await asyncio.get_running_loop().run_in_executor(self.executor, call)
+        await send({'type': 'http.response.start', 'status': response['status'], 'headers': response['headers']})
+        await send({'type': 'http.response.body', 'body': content})
+
+    @staticmethod
+    def _environ(scope, body: bytes) -> dict:
+        server_name, server_port = scope.get('server') or ('localhost', 80)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+            'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+            'QUERY_STRING': scope['query_string'].decode('latin-1'),
+            'SERVER_NAME': server_name,
+            'SERVER_PORT': str(server_port),
+            'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+            'REMOTE_ADDR': (scope.get('client') or ('',))[0],
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': io.BytesIO(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+        for name, value in scope['headers']:
+            key = name.decode('latin-1').upper().replace('-', '_')
+            value = value.decode('latin-1')
+            if key == 'CONTENT_TYPE':
+                environ['CONTENT_TYPE'] = value
+            elif key != 'CONTENT_LENGTH':
+                key = f"HTTP_{key}"
+                environ[key] = f"{environ[key]},{value}" if key in environ else value
+        return environ
+
+
+application = AsgiApp(create_app())
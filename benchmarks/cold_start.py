@@ -0,0 +1,67 @@
+"""
+Measures cold start: `import app`, `create_app()` and the first /api/stations response,
+each in a fresh interpreter, and lists which heavy modules were imported along the way.
+
+    python benchmarks/cold_start.py [--repeat 5] [--url /api/stations]
+
+Uses the database from DATABASE_URL.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ('folium', 'numpy', 'jinja2', 'branca', 'requests')
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import app as app_module
+imported = time.perf_counter()
+app = app_module.create_app()
+created = time.perf_counter()
+response = app.test_client().get(sys.argv[1])
+responded = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - start) * 1000,
+    'create_app_ms': (created - imported) * 1000,
+    'first_response_ms': (responded - created) * 1000,
+    'total_ms': (responded - start) * 1000,
+    'status': response.status_code,
+    'heavy_at_import': [m for m in sys.argv[2:] if m in sys.modules],
+}))
+"""
+
+
+def probe(url: str) -> dict:
+    env = dict(os.environ, LIVE_TICKER='0')
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE, url, *HEAVY_MODULES],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--url', default='/api/stations')
+    args = parser.parse_args()
+
+    runs = [probe(args.url) for _ in range(args.repeat)]
+
+    print(f"{'phase':<18} {'median ms':>10} {'max ms':>8}")
+    for key in ('import_ms', 'create_app_ms', 'first_response_ms', 'total_ms'):
+        values = [run[key] for run in runs]
+        print(f"{key[:-3]:<18} {statistics.median(values):>10.1f} {max(values):>8.1f}")
+
+    print(f"status: {runs[-1]['status']}")
+    print(f"heavy modules loaded before first response: {', '.join(runs[-1]['heavy_at_import']) or 'none'}")
+
+
+if __name__ == '__main__':
+    main()
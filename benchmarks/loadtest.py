@@ -0,0 +1,247 @@
+"""
+Load test that replays the browser's call pattern with N concurrent virtual users.
+
+    python benchmarks/loadtest.py --users 50 --duration 60 --scale medium
+    python benchmarks/loadtest.py --users 200 --duration 120 --url http://127.0.0.1:8000
+
+Each virtual user behaves like one open tab (main.js + train_map.js): it clicks an origin station
+(/api/reachable + /api/map), picks a reachable destination (/api/map + /api/route_trains), and then
+the map iframe polls /api/train_positions every 2.5 s until the user moves on to another route.
+
+Without --url the app is started locally (werkzeug, threaded) on a synthetic database, or on --db.
+Reports p50/p95/p99 latency, throughput and error rate per endpoint.
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date
+from urllib.parse import urlencode, urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.synthetic_db import build, resolve_scale, scale_arguments  # noqa: E402
+
+SERVER = """
+import sys
+from werkzeug.serving import run_simple
+import app
+run_simple(sys.argv[1], int(sys.argv[2]), app.create_app(), threaded=True)
+"""
+
+
+class Stats:
+    """Latencies and errors per endpoint, shared by all virtual users."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies: dict[str, list[float]] = {}
+        self.errors: dict[str, int] = {}
+
+    def record(self, endpoint: str, elapsed_ms: float, ok: bool) -> None:
+        with self._lock:
+            self.latencies.setdefault(endpoint, []).append(elapsed_ms)
+            if not ok:
+                self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    index = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class VirtualUser(threading.Thread):
+
+    def __init__(self, base_url: str, stations: list[str], stats: Stats, args, deadline: float, seed: int):
+        super().__init__(daemon=True)
+        parts = urlsplit(base_url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.stations = stations
+        self.stats = stats
+        self.args = args
+        self.deadline = deadline
+        self.rng = random.Random(seed)
+        self.conn = None
+
+    def get(self, endpoint: str, params: dict):
+        url = f"{endpoint}?{urlencode(params)}"
+        start = time.perf_counter()
+        try:
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.args.timeout)
+            self.conn.request('GET', url)
+            response = self.conn.getresponse()
+            body = response.read()
+            ok = 200 <= response.status < 400
+        except (OSError, http.client.HTTPException):
+            self.conn.close()
+            self.conn = None
+            body, ok = None, False
+        self.stats.record(endpoint, (time.perf_counter() - start) * 1000, ok)
+        return body if ok else None
+
+    def think(self, low: float, high: float) -> bool:
+        """Sleeps like a user would; False once the test is over."""
+        pause = self.rng.uniform(low, high)
+        if time.monotonic() + pause >= self.deadline:
+            return False
+        time.sleep(pause)
+        return True
+
+    def run(self):
+        today = date.today().isoformat()
+        while time.monotonic() < self.deadline:
+            origin = self.rng.choice(self.stations)
+
+            # Station click: fetchReachable() and updateMap() with only the origin set
+            body = self.get('/api/reachable', {'name': origin})
+            self.get('/api/map', {'from_station': origin, 'map_theme': 'dark'})
+            reachable = json.loads(body) if body else []
+            if not self.think(1, 4):
+                break
+            if not reachable:
+                continue
+
+            # Second click: updateMap() with both stations, then the results panel
+            destination = self.rng.choice(reachable)
+            route = {'from_station': origin, 'to_station': destination}
+            self.get('/api/map', {**route, 'map_theme': 'dark'})
+            self.get('/api/route_trains', {**route, 'date': today})
+
+            # The map iframe polls train positions until the user picks another route
+            if not self.think(0.5, 0.5):
+                break
+            leave_at = time.monotonic() + self.rng.uniform(*self.args.dwell)
+            while time.monotonic() < min(leave_at, self.deadline):
+                self.get('/api/train_positions', {**route, 'date': today})
+                if not self.think(self.args.poll, self.args.poll):
+                    break
+
+        if self.conn is not None:
+            self.conn.close()
+
+
+def start_local_server(db_path: str, port: int) -> subprocess.Popen:
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.abspath(db_path)}")
+    server = subprocess.Popen(
+        [sys.executable, '-c', SERVER, '127.0.0.1', str(port)],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            sys.exit(f"local server exited with status {server.returncode}")
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+            conn.request('GET', '/api/stations')
+            if conn.getresponse().status == 200:
+                return server
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    sys.exit("local server did not come up within 60 s")
+
+
+def fetch_stations(base_url: str) -> list[str]:
+    parts = urlsplit(base_url)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+    conn.request('GET', '/api/stations')
+    return [st['name'] for st in json.loads(conn.getresponse().read())]
+
+
+def report(stats: Stats, elapsed: float) -> dict:
+    rows = {}
+    everything = []
+    for endpoint in sorted(stats.latencies):
+        values = sorted(stats.latencies[endpoint])
+        everything.extend(values)
+        rows[endpoint] = summarize(values, stats.errors.get(endpoint, 0), elapsed)
+    everything.sort()
+    if everything:
+        rows['total'] = summarize(everything, sum(stats.errors.values()), elapsed)
+
+    print(f"{'endpoint':<22} {'requests':>9} {'req/s':>8} {'errors':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for endpoint, row in rows.items():
+        print(
+            f"{endpoint:<22} {row['requests']:>9} {row['throughput_rps']:>8.1f} {row['error_rate']:>7.1%}"
+            f" {row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f} {row['p99_ms']:>8.1f} {row['max_ms']:>8.1f}"
+        )
+    return rows
+
+
+def summarize(sorted_values: list[float], errors: int, elapsed: float) -> dict:
+    return {
+        'requests': len(sorted_values),
+        'throughput_rps': round(len(sorted_values) / elapsed, 2),
+        'error_rate': round(errors / len(sorted_values), 4),
+        'p50_ms': round(percentile(sorted_values, 50), 2),
+        'p95_ms': round(percentile(sorted_values, 95), 2),
+        'p99_ms': round(percentile(sorted_values, 99), 2),
+        'max_ms': round(sorted_values[-1], 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=20, help='concurrent virtual users (open tabs)')
+    parser.add_argument('--duration', type=float, default=60, help='seconds of load after ramp-up starts')
+    parser.add_argument('--ramp', type=float, default=10, help='seconds over which users join')
+    parser.add_argument('--poll', type=float, default=2.5, help='train_positions interval, as in train_map.js')
+    parser.add_argument('--dwell', type=float, nargs=2, default=(20, 60), metavar=('MIN', 'MAX'),
+                        help='seconds a user watches one route before picking another')
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--url', help='already running server; otherwise one is started locally')
+    parser.add_argument('--db', help='database for the local server instead of a synthetic one')
+    parser.add_argument('--port', type=int, default=5077)
+    parser.add_argument('--out', help='write the report as JSON')
+    scale_arguments(parser)
+    args = parser.parse_args()
+
+    server = None
+    base_url = args.url
+    if not base_url:
+        db_path = args.db
+        if not db_path:
+            scale = resolve_scale(args)
+            db_path = os.path.join(tempfile.mkdtemp(prefix='euroticket-load-'), 'load.db')
+            print(f"building synthetic database: {scale}")
+            build(db_path, seed=args.seed, **scale)
+        server = start_local_server(db_path, args.port)
+        base_url = f"http://127.0.0.1:{args.port}"
+
+    try:
+        stations = fetch_stations(base_url)
+        stats = Stats()
+        started = time.monotonic()
+        deadline = started + args.duration
+        print(f"{args.users} users against {base_url} for {args.duration:.0f} s")
+
+        users = []
+        for n in range(args.users):
+            user = VirtualUser(base_url, stations, stats, args, deadline, seed=args.seed * 1000 + n)
+            users.append(user)
+            user.start()
+            time.sleep(args.ramp / max(args.users, 1))
+        for user in users:
+            user.join(timeout=max(0.0, deadline - time.monotonic()) + args.timeout)
+
+        rows = report(stats, time.monotonic() - started)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump({'users': args.users, 'duration': args.duration, 'url': args.url, 'endpoints': rows}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
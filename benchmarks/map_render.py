@@ -0,0 +1,60 @@
+"""
+Times /api/map rendering in both MapBuilder render modes and reports HTML size.
+
+    python benchmarks/map_render.py [--repeat 20]
+
+Uses the database from DATABASE_URL.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app  # noqa: E402
+from db_helpers import get_route_service  # noqa: E402
+from services.map_builder import MapBuilder  # noqa: E402
+
+SCENARIOS = {
+    'overview': {},
+    'from_station': {'from_station': 0},
+    'route': {'from_station': 0, 'to_station': 1},
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    os.environ.setdefault('LIVE_TICKER', '0')
+    app = create_app()
+    client = app.test_client()
+
+    stations = client.get('/api/stations').get_json()
+    names = [st['name'] for st in stations]
+    origin = names[0] if names else ''
+    reachable = client.get('/api/reachable', query_string={'name': origin}).get_json() or names[1:2]
+
+    print(f"{'mode':<8} {'scenario':<13} {'first ms':>9} {'median ms':>10} {'html KB':>8}")
+    for mode in ('folium', 'geojson'):
+        for scenario, params in SCENARIOS.items():
+            from_station = origin if 'from_station' in params else None
+            to_station = reachable[0] if 'to_station' in params and reachable else None
+
+            timings = []
+            html = ''
+            for _ in range(args.repeat):
+                with app.test_request_context():
+                    builder = MapBuilder(get_route_service(), 'dark', render_mode=mode)
+                    start = time.perf_counter()
+                    html = builder.render(from_station, to_station, None)
+                    timings.append((time.perf_counter() - start) * 1000)
+
+            median = sorted(timings)[len(timings) // 2]
+            print(f"{mode:<8} {scenario:<13} {timings[0]:>9.1f} {median:>10.1f} {len(html.encode()) / 1024:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,210 @@
+"""
+Micro-benchmarks for RouteService, live_trains, TrainTracker and MapBuilder on a synthetic timetable.
+
+    python benchmarks/suite.py run --scale medium --out benchmarks/results/base.json
+    python benchmarks/suite.py run --db /tmp/bench.db --filter route_between
+    python benchmarks/suite.py compare base.json new.json --threshold 0.15
+
+`run` builds a synthetic database (see synthetic_db.py) unless --db is given, times every case
+in both timetable modes and writes the medians as a JSON baseline. `compare` exits with status 1
+when any case's median got slower than the baseline by more than the threshold.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask  # noqa: E402
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+import live_trains  # noqa: E402
+from benchmarks.synthetic_db import build, resolve_scale, scale_arguments  # noqa: E402
+from db_interface import RouteService  # noqa: E402
+from services.geometry import geometry_store  # noqa: E402
+from services.map_builder import MapBuilder, _base_documents, _rendered_maps  # noqa: E402
+from services.reachability import ReachabilityIndex  # noqa: E402
+from services.station_index import StationNameIndex  # noqa: E402
+from services.timetable import TimetableSnapshot  # noqa: E402
+from services.train_tracker import TrainTracker  # noqa: E402
+
+BENCH_DATE = '2026-03-02'
+BENCH_TIME = datetime.combine(datetime.fromisoformat(BENCH_DATE).date(), datetime.min.time()).replace(hour=12)
+
+
+def time_case(func, setup=None, repeat: int = 15, budget: float = 3.0) -> dict:
+    """Median/min/mean wall time in ms; `setup` runs before every call and is not timed."""
+    if setup:
+        setup()
+    func()  # warm-up
+
+    samples = []
+    deadline = time.perf_counter() + budget
+    while len(samples) < repeat and (len(samples) < 3 or time.perf_counter() < deadline):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+
+    return {
+        'median_ms': round(statistics.median(samples), 4),
+        'min_ms': round(min(samples), 4),
+        'mean_ms': round(statistics.fmean(samples), 4),
+        'runs': len(samples),
+    }
+
+
+def pick_inputs(timetable: TimetableSnapshot) -> dict:
+    """The busiest station and the station pair with the most direct trips."""
+    busiest = max(timetable.postings, key=lambda station_id: len(timetable.postings[station_id]))
+    best_pair, best_count = None, -1
+    for arr_id in timetable.reachable_station_ids(busiest):
+        count = len(timetable.trips_between(busiest, arr_id))
+        if count > best_count:
+            best_pair, best_count = (busiest, arr_id), count
+
+    names = {st['id']: st['name'] for st in timetable.stations.values()}
+    trip_ids = sorted(timetable.trip_stops)
+    return {
+        'origin': names[best_pair[0]],
+        'destination': names[best_pair[1]],
+        'trip_id': trip_ids[len(trip_ids) // 2],
+        'trip_ids': trip_ids[:200],
+    }
+
+
+def build_cases(engine, mode: str, inputs: dict) -> dict:
+    session = sessionmaker(bind=engine)()
+    timetable = TimetableSnapshot.load(engine) if mode == 'snapshot' else None
+    names = StationNameIndex(timetable.stations.values()) if timetable else StationNameIndex.load(engine)
+    service = RouteService(session, timetable=timetable, reachability=ReachabilityIndex.load(engine), names=names)
+
+    origin, destination = inputs['origin'], inputs['destination']
+    stops = service.get_trip_stops(inputs['trip_ids'])
+    pairs = [(a['station_id'], b['station_id']) for s in stops.values() for a, b in zip(s, s[1:])]
+
+    def clear_maps():
+        for cache in (_base_documents, _rendered_maps):
+            with cache._lock:
+                cache._entries.clear()
+
+    cases = {
+        'route_service.get_all_stations': (service.get_all_stations, None),
+        'route_service.get_reachable_stations': (lambda: service.get_reachable_stations(origin), None),
+        'route_service.get_reachable_paths': (lambda: service.get_reachable_paths(origin), None),
+        'route_service.get_route_between': (lambda: service.get_route_between(origin, destination, BENCH_DATE), None),
+        'route_service.get_running_trips': (lambda: service.get_running_trips(BENCH_DATE), None),
+        'route_service.get_trip_stops': (lambda: service.get_trip_stops(inputs['trip_ids']), None),
+        'route_service.get_segment_paths[cold]': (lambda: service.get_segment_paths(pairs), geometry_store.clear),
+        'route_service.get_segment_paths[warm]': (lambda: service.get_segment_paths(pairs), None),
+        'route_service.get_specific_path': (lambda: service.get_specific_path(origin, destination), None),
+        'train_tracker.get_active_trains': (
+            lambda: TrainTracker(service, BENCH_TIME).get_active_trains(origin, destination, None, BENCH_DATE), None),
+        'map_builder.build[folium]': (
+            lambda: MapBuilder(service, 'dark', render_mode='folium').build(origin, destination, None), None),
+        'map_builder.render[geojson,cold]': (
+            lambda: MapBuilder(service, 'dark', render_mode='geojson').render(origin, destination, None), clear_maps),
+    }
+    if mode == 'sql':
+        # live_trains talks to the engine directly, the timetable mode makes no difference to it
+        cases['live_trains.calculate_train_position'] = (
+            lambda: live_trains.calculate_train_position(inputs['trip_id'], '12:00:00'), None)
+    return cases
+
+
+def run(args) -> None:
+    if args.db:
+        db_path, scale = args.db, {'db': args.db}
+    else:
+        scale = resolve_scale(args)
+        db_path = os.path.join(tempfile.mkdtemp(prefix='euroticket-bench-'), 'bench.db')
+        print(f"building synthetic database: {scale}")
+        build(db_path, seed=args.seed, **scale)
+
+    engine = create_engine(f"sqlite:///{db_path}")
+    live_trains.configure(engine)
+    inputs = pick_inputs(TimetableSnapshot.load(engine))
+
+    results = {}
+    flask_app = Flask(__name__)
+    with flask_app.test_request_context():
+        for mode in ('sql', 'snapshot'):
+            for name, (func, setup) in build_cases(engine, mode, inputs).items():
+                case = f"{mode}:{name}"
+                if args.filter and args.filter not in case:
+                    continue
+                geometry_store.clear()
+                results[case] = time_case(func, setup, repeat=args.repeat)
+                print(f"{case:<58} {results[case]['median_ms']:>10.3f} ms  (min {results[case]['min_ms']:.3f}, n={results[case]['runs']})")
+
+    report = {
+        'meta': {
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'scale': scale,
+            'inputs': {k: v for k, v in inputs.items() if k != 'trip_ids'},
+        },
+        'results': results,
+    }
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"saved {args.out}")
+
+
+def compare(args) -> None:
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)['results']
+    with open(args.current, encoding='utf-8') as f:
+        current = json.load(f)['results']
+
+    regressions = []
+    print(f"{'case':<58} {'base ms':>10} {'new ms':>10} {'change':>8}")
+    for case in sorted(set(baseline) | set(current)):
+        if case not in baseline or case not in current:
+            print(f"{case:<58} {'only in ' + ('baseline' if case in baseline else 'current'):>30}")
+            continue
+        base, new = baseline[case]['median_ms'], current[case]['median_ms']
+        change = (new - base) / base if base else 0.0
+        flag = ''
+        if change > args.threshold:
+            flag = '  REGRESSION'
+            regressions.append(case)
+        print(f"{case:<58} {base:>10.3f} {new:>10.3f} {change:>+8.1%}{flag}")
+
+    if regressions:
+        sys.exit(f"{len(regressions)} cases regressed by more than {args.threshold:.0%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='time every case and optionally save a JSON baseline')
+    run_parser.add_argument('--db', help='existing database instead of a synthetic one')
+    run_parser.add_argument('--out', help='where to write the JSON results')
+    run_parser.add_argument('--repeat', type=int, default=15)
+    run_parser.add_argument('--filter', help='only cases whose name contains this')
+    scale_arguments(run_parser)
+
+    compare_parser = commands.add_parser('compare', help='compare two result files')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--threshold', type=float, default=0.15, help='allowed slowdown (0.15 = 15%%)')
+
+    args = parser.parse_args()
+    run(args) if args.command == 'run' else compare(args)
+
+
+if __name__ == '__main__':
+    main()
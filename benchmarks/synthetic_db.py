@@ -0,0 +1,178 @@
+"""
+Builds a synthetic EuroTicket SQLite database at a configurable scale and migrates it to the latest schema.
+
+    python benchmarks/synthetic_db.py /tmp/bench.db --scale medium
+    python benchmarks/synthetic_db.py /tmp/bench.db --stations 800 --trips 5000 --stops 12 --vertices 60
+"""
+import argparse
+import json
+import math
+import os
+import random
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine  # noqa: E402
+
+from tools.migrate import upgrade  # noqa: E402
+
+SCALES = {
+    'small': dict(stations=60, trips=300, stops=8, vertices=20),
+    'medium': dict(stations=600, trips=4000, stops=12, vertices=60),
+    'large': dict(stations=2500, trips=20000, stops=16, vertices=120),
+}
+
+# The schema old_files/SQL_fill.py creates (schema version 0)
+BASE_SCHEMA = """
+CREATE TABLE stations (id INTEGER PRIMARY KEY, name VARCHAR NOT NULL, platform INTEGER, latitude FLOAT,
+                       longitude FLOAT, utc_offset INTEGER DEFAULT '1' NOT NULL);
+CREATE INDEX ix_stations_name ON stations (name);
+CREATE TABLE trains (id INTEGER PRIMARY KEY, number VARCHAR NOT NULL, name VARCHAR, has_wifi BOOLEAN,
+                     has_air_con BOOLEAN, has_restaurant BOOLEAN, has_bicycle_holder BOOLEAN, is_accessible BOOLEAN);
+CREATE TABLE trips (id INTEGER PRIMARY KEY, train_id INTEGER REFERENCES trains(id), days_mask INTEGER);
+CREATE TABLE route_stops (id INTEGER PRIMARY KEY, trip_id INTEGER REFERENCES trips(id),
+                          station_id INTEGER REFERENCES stations(id), arrival_time TIME, departure_time TIME,
+                          stop_order INTEGER);
+CREATE INDEX ix_route_stops_trip_id ON route_stops (trip_id);
+CREATE INDEX ix_route_stops_station_id ON route_stops (station_id);
+CREATE TABLE graph (id INTEGER PRIMARY KEY, departure INTEGER REFERENCES stations(id),
+                    arrival INTEGER REFERENCES stations(id), path JSON);
+"""
+
+# Roughly the bounding box of Poland
+MIN_LAT, MAX_LAT = 49.0, 54.8
+MIN_LON, MAX_LON = 14.1, 24.1
+
+DAYS_MASKS = [127, 127, 127, 31, 96, 63]
+
+
+def _clock(seconds: int | None) -> str | None:
+    if seconds is None:
+        return None
+    seconds %= 24 * 3600
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}.000000"
+
+
+def _neighbours(coords: list, k: int) -> list[list[int]]:
+    """k nearest stations of every station, via a coarse grid so large scales stay fast."""
+    cell = 0.5
+    grid = {}
+    for i, (lat, lon) in enumerate(coords):
+        grid.setdefault((int(lat / cell), int(lon / cell)), []).append(i)
+
+    result = []
+    for i, (lat, lon) in enumerate(coords):
+        cy, cx = int(lat / cell), int(lon / cell)
+        candidates = []
+        ring = 1
+        while len(candidates) <= k and ring < 40:
+            candidates = [
+                j for dy in range(-ring, ring + 1) for dx in range(-ring, ring + 1)
+                for j in grid.get((cy + dy, cx + dx), ()) if j != i
+            ]
+            ring += 1
+        candidates.sort(key=lambda j: (coords[j][0] - lat) ** 2 + (coords[j][1] - lon) ** 2)
+        result.append(candidates[:k])
+    return result
+
+
+def build(path: str, stations: int, trips: int, stops: int, vertices: int, seed: int = 1) -> str:
+    if os.path.exists(path):
+        os.remove(path)
+    rng = random.Random(seed)
+
+    conn = sqlite3.connect(path)
+    conn.executescript(BASE_SCHEMA)
+
+    coords = [(rng.uniform(MIN_LAT, MAX_LAT), rng.uniform(MIN_LON, MAX_LON)) for _ in range(stations)]
+    conn.executemany(
+        "INSERT INTO stations (id, name, platform, latitude, longitude, utc_offset) VALUES (?, ?, ?, ?, ?, 1)",
+        [(i + 1, f"Stacja {i + 1:05d}", rng.randint(1, 8), lat, lon) for i, (lat, lon) in enumerate(coords)],
+    )
+    neighbours = _neighbours(coords, 6)
+
+    pairs = set()
+    train_rows, trip_rows, stop_rows = [], [], []
+    for trip_id in range(1, trips + 1):
+        train_rows.append((trip_id, str(10000 + trip_id), f"IC {trip_id}", trip_id % 2, 1, trip_id % 3 == 0, 1, trip_id % 4 == 0))
+        trip_rows.append((trip_id, trip_id, rng.choice(DAYS_MASKS)))
+
+        # A trip is a random walk over nearby stations, so segments repeat across trips like real lines do
+        route = [rng.randrange(stations)]
+        while len(route) < stops:
+            options = [j for j in neighbours[route[-1]] if j not in route]
+            if not options:
+                break
+            route.append(rng.choice(options))
+
+        clock = rng.randint(4 * 3600, 23 * 3600)
+        for order, station in enumerate(route, 1):
+            arrival = None if order == 1 else clock
+            if order > 1:
+                clock += rng.randint(1, 4) * 60
+            departure = None if order == len(route) else clock
+            stop_rows.append((trip_id, station + 1, _clock(arrival), _clock(departure), order))
+            clock += rng.randint(15, 60) * 60
+            if order < len(route):
+                pairs.add((station, route[order]))
+
+    conn.executemany("INSERT INTO trains VALUES (?, ?, ?, ?, ?, ?, ?, ?)", train_rows)
+    conn.executemany("INSERT INTO trips VALUES (?, ?, ?)", trip_rows)
+    conn.executemany(
+        "INSERT INTO route_stops (trip_id, station_id, arrival_time, departure_time, stop_order) VALUES (?, ?, ?, ?, ?)",
+        stop_rows,
+    )
+
+    graph_rows = []
+    for a, b in sorted(pairs):
+        (lat_a, lon_a), (lat_b, lon_b) = coords[a], coords[b]
+        wobble = math.hypot(lat_b - lat_a, lon_b - lon_a) * 0.05
+        points = [[lat_a, lon_a]]
+        for k in range(1, vertices - 1):
+            points.append([
+                lat_a + (lat_b - lat_a) * k / (vertices - 1) + rng.uniform(-wobble, wobble),
+                lon_a + (lon_b - lon_a) * k / (vertices - 1) + rng.uniform(-wobble, wobble),
+            ])
+        points.append([lat_b, lon_b])
+        graph_rows.append((a + 1, b + 1, json.dumps(points)))
+    conn.executemany("INSERT INTO graph (departure, arrival, path) VALUES (?, ?, ?)", graph_rows)
+
+    conn.commit()
+    conn.close()
+
+    upgrade(create_engine(f"sqlite:///{path}"))
+    return path
+
+
+def scale_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument('--scale', choices=sorted(SCALES), default='small')
+    parser.add_argument('--stations', type=int)
+    parser.add_argument('--trips', type=int)
+    parser.add_argument('--stops', type=int, help='stops per trip')
+    parser.add_argument('--vertices', type=int, help='polyline vertices per graph segment')
+    parser.add_argument('--seed', type=int, default=1)
+
+
+def resolve_scale(args) -> dict:
+    scale = dict(SCALES[args.scale])
+    for key in scale:
+        if getattr(args, key) is not None:
+            scale[key] = getattr(args, key)
+    return scale
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('path')
+    scale_arguments(parser)
+    args = parser.parse_args()
+
+    scale = resolve_scale(args)
+    build(args.path, seed=args.seed, **scale)
+    print(f"built {args.path}: " + ', '.join(f"{k}={v}" for k, v in scale.items()))
+
+
+if __name__ == '__main__':
+    main()
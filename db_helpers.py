@@ -9,5 +9,17 @@ def get_db():
     return g.db_session
 
 
+def release_db() -> None:
+    """Closes the request's session early, e.g. before a long-lived streaming response."""
+    db_session = g.pop('db_session', None)
+    if db_session is not None:
+        db_session.close()
+
+
 def get_route_service() -> RouteService:
-    return RouteService(get_db())
\ No newline at end of file
+    return RouteService(
+        get_db(),
+        timetable=current_app.config.get('TIMETABLE'),
+        reachability=current_app.config.get('REACHABILITY'),
+        names=current_app.config.get('STATION_NAMES'),
+    )
\ No newline at end of file
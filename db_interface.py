@@ -1,11 +1,27 @@
-import json
-from sqlalchemy import text
+from datetime import date
+
+from sqlalchemy import bindparam, text
+
+from services.geometry import Polyline, geometry_store
+from services.service_time import format_clock
+
 
 class RouteService:
-    def __init__(self, session):
+    def __init__(self, session, timetable=None, reachability=None, names=None):
         self.session = session
+        self.timetable = timetable
+        self.reachability = reachability
+        self.names = names
+
+    @property
+    def data_version(self) -> str | None:
+        """Token that changes whenever the loaded timetable does; None when reading straight from SQL."""
+        return self.timetable.version if self.timetable is not None else None
 
     def get_all_stations(self) -> list:
+        if self.timetable is not None:
+            return list(self.timetable.located_stations)
+
         query = text("""
             SELECT id, name, latitude as lat, longitude as lon, platform as platforms, utc_offset
             FROM stations
@@ -15,6 +31,12 @@ class RouteService:
         return [dict(r) for r in rows]
 
     def get_reachable_stations(self, station_name: str) -> list:
+        if self.reachability is not None or self.timetable is not None:
+            start_id = self._station_id(station_name)
+            if start_id is None:
+                return []
+            return self._station_names(self._reachable_ids(start_id))
+
         query = text("""
             SELECT DISTINCT s_end.name
             FROM stations s_start
@@ -22,79 +44,35 @@ class RouteService:
             JOIN route_stops rs_end ON rs_start.trip_id = rs_end.trip_id
             JOIN stations s_end ON rs_end.station_id = s_end.id
             WHERE s_start.name = :station_name
-              AND CAST(rs_end.stop_order AS INTEGER) > CAST(rs_start.stop_order AS INTEGER)
+              AND rs_end.stop_order > rs_start.stop_order
         """)
 
         rows = self.session.execute(query, {"station_name": station_name}).mappings().all()
         return [row['name'] for row in rows]
 
-    def get_reachable_paths(self, station_name: str) -> list:
-        id_query = text("SELECT id FROM stations WHERE name = :station_name")
-        row = self.session.execute(id_query, {"station_name": station_name}).mappings().first()
-
-        if not row:
+    def get_reachable_paths(self, station_name: str, tolerance: float = 0.0) -> list:
+        start_id = self._station_id(station_name)
+        if start_id is None:
             return []
 
-        start_id = row['id']
-
-        reachable_query = text("""
-            SELECT DISTINCT rs_end.station_id
-            FROM route_stops rs_start
-            JOIN route_stops rs_end ON rs_start.trip_id = rs_end.trip_id
-            WHERE rs_start.station_id = :start_id
-              AND CAST(rs_end.stop_order AS INTEGER) > CAST(rs_start.stop_order AS INTEGER)
-        """)
-        reachable_rows = self.session.execute(reachable_query, {"start_id": start_id}).mappings().all()
-        reachable_ids = [str(r['station_id']) for r in reachable_rows]
-
+        reachable_ids = self._reachable_ids(start_id)
         if not reachable_ids:
             return []
 
-        path_query = text(f"""
-            SELECT path FROM graph
-            WHERE departure = :start_id
-            AND arrival IN ({','.join([':id_' + str(i) for i in range(len(reachable_ids))])})
-            AND path IS NOT NULL AND path != ''
-        """)
-
-        # Build the parameters dictionary
-        params = {"start_id": start_id}
-        for i, r_id in enumerate(reachable_ids):
-            params[f"id_{i}"] = r_id
-
-        path_rows = self.session.execute(path_query, params).mappings().all()
-
-        paths = []
-        for r in path_rows:
-            try:
-                paths.append(json.loads(r['path']))
-            except Exception:
-                pass
-
-        return paths
+        paths = self.get_segment_paths((start_id, arr_id) for arr_id in reachable_ids)
+        return [polyline.coords(tolerance) for polyline in paths.values()]
 
     def get_route_between(self, departure_name: str, arrival_name: str, date_str: str = None) -> list:
-        dep_query = text("SELECT id FROM stations WHERE name = :name")
-        arr_query = text("SELECT id FROM stations WHERE name = :name")
+        if self.timetable is not None:
+            return self._route_between_from_snapshot(departure_name, arrival_name, date_str)
 
-        dep_row = self.session.execute(dep_query, {"name": departure_name}).mappings().first()
-        arr_row = self.session.execute(arr_query, {"name": arrival_name}).mappings().first()
+        dep_id = self._station_id(departure_name)
+        arr_id = self._station_id(arrival_name)
 
-        if not dep_row or not arr_row:
+        if dep_id is None or arr_id is None:
             return []
 
-        dep_id = dep_row['id']
-        arr_id = arr_row['id']
-
-        # Визначаємо біт дня тижня: пн=0, вт=1, ..., нд=6
-        day_bit = None
-        if date_str:
-            from datetime import date as _date
-            try:
-                d = _date.fromisoformat(date_str)
-                day_bit = d.weekday()  # 0=пн, 6=нд
-            except ValueError:
-                pass
+        day_bit = self._day_bit(date_str)
 
         trip_query = text("""
             SELECT t.id AS trip_id, t.days_mask, tr.number AS train_number, tr.name AS train_name,
@@ -107,7 +85,7 @@ class RouteService:
             JOIN route_stops rs_arr ON t.id = rs_arr.trip_id AND rs_arr.station_id = :arr_id
             JOIN stations s_dep ON s_dep.id = :dep_id
             JOIN stations s_arr ON s_arr.id = :arr_id
-            WHERE CAST(rs_dep.stop_order AS INTEGER) < CAST(rs_arr.stop_order AS INTEGER)
+            WHERE rs_dep.stop_order < rs_arr.stop_order
         """)
 
         trips = self.session.execute(trip_query, {"dep_id": dep_id, "arr_id": arr_id}).mappings().all()
@@ -116,46 +94,107 @@ class RouteService:
         if day_bit is not None:
             trips = [t for t in trips if (t['days_mask'] >> day_bit) & 1]
 
-        results = []
+        stops_by_trip = self.get_trip_stops([t['trip_id'] for t in trips])
+
+        return [
+            self._build_trip_result(
+                trip_row, stops_by_trip.get(trip_row['trip_id'], []),
+                trip_row['dep_order'], trip_row['arr_order'], trip_row['dep_utc'], trip_row['arr_utc'],
+            )
+            for trip_row in trips
+        ]
+
+    def get_running_trips(self, date_str: str | None = None) -> list[dict]:
+        """Every trip (trip_id, train_number) whose days_mask includes the weekday of date_str."""
+        day_bit = self._day_bit(date_str)
+
+        if self.timetable is not None:
+            trips = self.timetable.trips.values()
+        else:
+            query = text("""
+                SELECT t.id AS trip_id, t.days_mask, tr.number AS train_number
+                FROM trips t
+                JOIN trains tr ON t.train_id = tr.id
+            """)
+            trips = self.session.execute(query).mappings().all()
+
+        return [
+            {"trip_id": t['trip_id'], "train_number": t['train_number']}
+            for t in trips
+            if day_bit is None or (t['days_mask'] >> day_bit) & 1
+        ]
+
+    def get_trip_stops(self, trip_ids) -> dict[int, list[dict]]:
+        """
+        Loads the ordered stops of every trip in trip_ids in a single pass.
+        Returns {trip_id: [{station_id, station, arrival, departure, order, utc_offset, lat, lon}, ...]}
+        with arrival/departure in seconds from the start of the trip's service day.
+        """
+        trip_ids = list(dict.fromkeys(trip_ids))
+        if not trip_ids:
+            return {}
+
+        if self.timetable is not None:
+            return self._trip_stops_from_snapshot(trip_ids)
 
-        segment_query = text("""
-            SELECT s.name AS station, rs.arrival_time, rs.departure_time, CAST(rs.stop_order AS INTEGER) as stop_order, s.utc_offset
+        query = text("""
+            SELECT rs.trip_id, rs.station_id, s.name AS station, rs.arrival_sec, rs.departure_sec,
+                   rs.stop_order, s.utc_offset, s.latitude, s.longitude
             FROM route_stops rs
             JOIN stations s ON rs.station_id = s.id
-            WHERE rs.trip_id = :trip_id
-            ORDER BY CAST(rs.stop_order AS INTEGER)
-        """)
-
-        for trip_row in trips:
-            segment_stops = self.session.execute(segment_query, {
-                "trip_id": trip_row['trip_id']
-            }).mappings().all()
-
-            route_full = [{"station": rs['station'], "arrival": rs['arrival_time'], "departure": rs['departure_time'], "order": rs['stop_order'], "utc_offset": int(rs['utc_offset']) if rs['utc_offset'] is not None else 1} for rs in segment_stops]
-
-            results.append({
-                "trip_id": trip_row['trip_id'],
-                "train_number": trip_row['train_number'],
-                "train_name": trip_row['train_name'],
-                "has_wifi": bool(trip_row['has_wifi']),
-                "has_air_con": bool(trip_row['has_air_con']),
-                "has_restaurant": bool(trip_row['has_restaurant']),
-                "has_bicycle": bool(trip_row['has_bicycle_holder']),
-                "accessible": bool(trip_row['is_accessible']),
-                "route": route_full,
-                "dep_order": int(trip_row['dep_order']),
-                "arr_order": int(trip_row['arr_order']),
-                "dep_utc": int(trip_row['dep_utc']),
-                "arr_utc": int(trip_row['arr_utc']),
+            WHERE rs.trip_id IN :trip_ids
+            ORDER BY rs.trip_id, rs.stop_order
+        """).bindparams(bindparam("trip_ids", expanding=True))
+
+        stops_by_trip = {trip_id: [] for trip_id in trip_ids}
+        for rs in self.session.execute(query, {"trip_ids": trip_ids}).mappings():
+            stops_by_trip[rs['trip_id']].append({
+                "station_id": rs['station_id'],
+                "station": rs['station'],
+                "arrival": rs['arrival_sec'],
+                "departure": rs['departure_sec'],
+                "order": rs['stop_order'],
+                "utc_offset": int(rs['utc_offset']) if rs['utc_offset'] is not None else 1,
+                "lat": rs['latitude'],
+                "lon": rs['longitude'],
             })
+        return stops_by_trip
 
-        return results
+    def get_segment_paths(self, pairs) -> dict[tuple[int, int], Polyline]:
+        """
+        Returns the decoded track geometry of every (departure_id, arrival_id) pair,
+        served from the process-wide geometry cache. Pairs without a stored path are left out.
+        """
+        return geometry_store.get_many(pairs, self._fetch_raw_paths)
 
-    def get_specific_path(self, departure_name: str, arrival_name: str) -> list:
+    def _fetch_raw_paths(self, pairs) -> dict[tuple[int, int], str]:
+        pairs = set(pairs)
+        if self.timetable is not None:
+            return {pair: self.timetable.paths.get(pair) for pair in pairs}
+
+        query = text("""
+            SELECT departure, arrival, path FROM graph
+            WHERE departure IN :deps AND arrival IN :arrs
+            AND path IS NOT NULL AND path != ''
+            ORDER BY id
+        """).bindparams(bindparam("deps", expanding=True), bindparam("arrs", expanding=True))
+        rows = self.session.execute(query, {
+            "deps": list({dep for dep, _ in pairs}),
+            "arrs": list({arr for _, arr in pairs}),
+        })
+
+        raw_paths = {}
+        for dep, arr, path in rows:
+            if (dep, arr) in pairs:
+                raw_paths.setdefault((dep, arr), path)
+        return raw_paths
+
+    def get_specific_path(self, departure_name: str, arrival_name: str, tolerance: float = 0.0) -> list:
         """
         Fetches the exact physical track geometry (polyline) between two stations
         by stitching together paths for each station stop segment along a valid trip.
         Returns a list of coordinate pairs: [[[lat, lon], [lat, lon]], [[lat...]]]
+        simplified to `tolerance` degrees when it is above 0.
         """
         routes = self.get_route_between(departure_name, arrival_name)
         if not routes:
@@ -165,37 +204,154 @@ class RouteService:
         dep_order = trip["dep_order"]
         arr_order = trip["arr_order"]
 
-        station_names = [
-            stop["station"] for stop in trip["route"]
-            if stop["order"] >= dep_order and stop["order"] <= arr_order
+        stops = [
+            stop for stop in self.get_trip_stops([trip["trip_id"]]).get(trip["trip_id"], [])
+            if dep_order <= stop["order"] <= arr_order
         ]
+        if len(stops) < 2:
+            return []
 
-        if len(station_names) < 2:
+        pairs = [(a["station_id"], b["station_id"]) for a, b in zip(stops, stops[1:])]
+        paths = self.get_segment_paths(pairs)
+
+        return [paths[pair].coords(tolerance) for pair in pairs if pair in paths]
+
+    @staticmethod
+    def _build_trip_result(trip_row, stops: list[dict], dep_order, arr_order, dep_utc, arr_utc) -> dict:
+        route_full = [
+            {
+                "station": stop["station"],
+                "arrival": format_clock(stop["arrival"]),
+                "departure": format_clock(stop["departure"]),
+                "order": stop["order"],
+                "utc_offset": stop["utc_offset"],
+            }
+            for stop in stops
+        ]
+
+        # Service-day seconds of the selected leg, so callers can compare times without parsing
+        dep_seconds = arr_seconds = None
+        for stop in stops:
+            if stop["order"] == dep_order:
+                dep_seconds = stop["departure"] if stop["departure"] is not None else stop["arrival"]
+            elif stop["order"] == arr_order:
+                arr_seconds = stop["arrival"] if stop["arrival"] is not None else stop["departure"]
+
+        return {
+            "trip_id": trip_row['trip_id'],
+            "train_number": trip_row['train_number'],
+            "train_name": trip_row['train_name'],
+            "has_wifi": bool(trip_row['has_wifi']),
+            "has_air_con": bool(trip_row['has_air_con']),
+            "has_restaurant": bool(trip_row['has_restaurant']),
+            "has_bicycle": bool(trip_row['has_bicycle_holder']),
+            "accessible": bool(trip_row['is_accessible']),
+            "route": route_full,
+            "dep_order": int(dep_order),
+            "arr_order": int(arr_order),
+            "dep_utc": int(dep_utc),
+            "arr_utc": int(arr_utc),
+            "departure_seconds": dep_seconds,
+            "arrival_seconds": arr_seconds,
+        }
+
+    # ------------------------------------------------------------------
+    # Lookups shared by the snapshot and SQL paths
+    # ------------------------------------------------------------------
+
+    def _station_id(self, station_name: str) -> int | None:
+        if self.names is not None:
+            return self.names.lookup(station_name)
+        if self.timetable is not None:
+            return self.timetable.station_ids.get(station_name)
+
+        row = self.session.execute(
+            text("SELECT id FROM stations WHERE name = :station_name"), {"station_name": station_name}
+        ).first()
+        return row[0] if row else None
+
+    def _station_names(self, station_ids) -> list[str]:
+        station_ids = list(station_ids)
+        if self.timetable is not None:
+            stations = self.timetable.stations
+            return [stations[i]['name'] for i in station_ids if i in stations]
+        if not station_ids:
             return []
 
-        placeholders = ', '.join([f":name_{i}" for i in range(len(station_names))])
-        params = {f"name_{i}": name for i, name in enumerate(station_names)}
+        query = text("SELECT name FROM stations WHERE id IN :ids").bindparams(bindparam("ids", expanding=True))
+        return [row[0] for row in self.session.execute(query, {"ids": station_ids})]
 
-        query = text(f"SELECT id, name FROM stations WHERE name IN ({placeholders})")
-        rows = self.session.execute(query, params).mappings().all()
-        name_to_id = {r['name']: r['id'] for r in rows}
+    def _reachable_ids(self, start_id: int) -> list[int]:
+        if self.reachability is not None:
+            return list(self.reachability.reachable_from(start_id))
+        if self.timetable is not None:
+            return list(self.timetable.reachable_station_ids(start_id))
 
-        path_segments = []
+        reachable_query = text("""
+            SELECT DISTINCT rs_end.station_id
+            FROM route_stops rs_start
+            JOIN route_stops rs_end ON rs_start.trip_id = rs_end.trip_id
+            WHERE rs_start.station_id = :start_id
+              AND rs_end.stop_order > rs_start.stop_order
+        """)
+        return [r[0] for r in self.session.execute(reachable_query, {"start_id": start_id})]
 
-        for i in range(len(station_names) - 1):
-            dep_id = name_to_id.get(station_names[i])
-            arr_id = name_to_id.get(station_names[i+1])
+    # ------------------------------------------------------------------
+    # Snapshot-backed implementations
+    # ------------------------------------------------------------------
 
-            if dep_id and arr_id:
-                graph_query = text("SELECT path FROM graph WHERE departure = :dep AND arrival = :arr AND path IS NOT NULL AND path != ''")
-                g_row = self.session.execute(graph_query, {"dep": dep_id, "arr": arr_id}).mappings().first()
-                if g_row and g_row['path']:
-                    try:
-                        path_data = g_row['path']
-                        coords = json.loads(path_data) if isinstance(path_data, str) else path_data
-                        if coords:
-                            path_segments.append(coords)
-                    except Exception as e:
-                        print(f"Error parsing path JSON: {e}")
+    @staticmethod
+    def _day_bit(date_str: str | None) -> int | None:
+        # Визначаємо біт дня тижня: пн=0, вт=1, ..., нд=6
+        if not date_str:
+            return None
+        try:
+            return date.fromisoformat(date_str).weekday()
+        except ValueError:
+            return None
+
+    def _route_between_from_snapshot(self, departure_name: str, arrival_name: str, date_str: str | None) -> list:
+        snapshot = self.timetable
+        dep_id = snapshot.station_ids.get(departure_name)
+        arr_id = snapshot.station_ids.get(arrival_name)
+        if dep_id is None or arr_id is None:
+            return []
+
+        day_bit = self._day_bit(date_str)
+        dep_station = snapshot.stations[dep_id]
+        arr_station = snapshot.stations[arr_id]
+
+        matches = [
+            (trip_id, dep_order, arr_order)
+            for trip_id, dep_order, arr_order in snapshot.trips_between(dep_id, arr_id)
+            if day_bit is None or (snapshot.trips[trip_id]['days_mask'] >> day_bit) & 1
+        ]
+        stops_by_trip = self.get_trip_stops([trip_id for trip_id, _, _ in matches])
+
+        return [
+            self._build_trip_result(
+                snapshot.trips[trip_id], stops_by_trip[trip_id],
+                dep_order, arr_order, dep_station['utc_offset'], arr_station['utc_offset'],
+            )
+            for trip_id, dep_order, arr_order in matches
+        ]
 
-        return path_segments
\ No newline at end of file
+    def _trip_stops_from_snapshot(self, trip_ids: list[int]) -> dict[int, list[dict]]:
+        stations = self.timetable.stations
+        stops_by_trip = {}
+        for trip_id in trip_ids:
+            stops = []
+            for stop in self.timetable.trip_stops.get(trip_id, ()):
+                station = stations[stop.station_id]
+                stops.append({
+                    "station_id": stop.station_id,
+                    "station": station['name'],
+                    "arrival": stop.arrival,
+                    "departure": stop.departure,
+                    "order": stop.order,
+                    "utc_offset": int(station['utc_offset']) if station['utc_offset'] is not None else 1,
+                    "lat": station['lat'],
+                    "lon": station['lon'],
+                })
+            stops_by_trip[trip_id] = stops
+        return stops_by_trip
@@ -1,36 +1,42 @@
 import json
-import math
 import os
 from datetime import datetime, timedelta
-from sqlalchemy import create_engine, MetaData, Table, select
-db_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'EuroTicket.db')
-engine = create_engine(f'sqlite:///{db_path}')
+from sqlalchemy import column, create_engine, select, table
 
-metadata = MetaData()
-stations_table = Table('stations', metadata, autoload_with=engine)
-route_stops_table = Table('route_stops', metadata, autoload_with=engine)
-graph_table = Table('graph', metadata, autoload_with=engine)
+from services.geometry import Polyline, geometry_store
+from services.service_time import clock_seconds, service_clock
 
-def get_db_connection():
-    return engine.connect()
+# Lightweight table constructs: nothing is reflected, so importing this module never touches the DB
+stations_table = table('stations', column('id'), column('name'), column('latitude'), column('longitude'))
+route_stops_table = table(
+    'route_stops', column('trip_id'), column('station_id'),
+    column('arrival_sec'), column('departure_sec'), column('stop_order')
+)
+graph_table = table('graph', column('departure'), column('arrival'), column('path'))
+
+_engine = None
 
-def haversine(lat1, lon1, lat2, lon2):
-    R = 6371.0
 
-    lat1_rad, lon1_rad = math.radians(lat1), math.radians(lon1)
-    lat2_rad, lon2_rad = math.radians(lat2), math.radians(lon2)
+def configure(engine):
+    """Makes live_trains use the app's pooled engine instead of opening its own."""
+    global _engine
+    _engine = engine
 
-    dlat = lat2_rad - lat1_rad
-    dlon = lon2_rad - lon1_rad
 
-    a = math.sin(dlat / 2)**2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(dlon / 2)**2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+def get_engine():
+    global _engine
+    if _engine is None:
+        # Standalone use (python live_trains.py): DATABASE_URL, else EuroTicket.db next to this file
+        db_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'EuroTicket.db')
+        _engine = create_engine(os.getenv("DATABASE_URL") or f'sqlite:///{db_path}')
+    return _engine
 
-    return R * c
+def get_db_connection():
+    return get_engine().connect()
 
 def calculate_traveled_distance(elapsed_seconds, total_seconds, total_segment_distance):
     if total_seconds <= 0:
-        return total_segment_distance
+        return total_segment_distance, 1.0
 
     speed_ratio = elapsed_seconds / total_seconds
     speed_ratio = max(0.0, min(1.0, speed_ratio))
@@ -52,76 +58,100 @@ def parse_time(time_val):
         time_obj = time_val
     return datetime.combine(datetime.today(), time_obj)
 
+def find_active_segment(stops, current_time):
+    """
+    Picks the pair of consecutive stops the train is travelling between at current_time.
+    `stops` are ordered dicts with station_id, station, arrival, departure, order, lat and lon keys;
+    arrival/departure are service-day seconds. The returned 'time' values are on the same clock,
+    and dep_info['now'] is current_time on that clock.
+    """
+    now = clock_seconds(current_time) + current_time.microsecond / 1e6
+    for dep_stop, arr_stop in zip(stops, stops[1:]):
+        dep_time = dep_stop['departure']
+        arr_time = arr_stop['arrival'] if arr_stop['arrival'] is not None else arr_stop['departure']
+
+        if dep_time is None or arr_time is None:
+            continue
+
+        c_time = service_clock(dep_time, arr_time, now)
+        if c_time is not None:
+            return {
+                'station_id': dep_stop['station_id'],
+                'name': dep_stop['station'],
+                'time': dep_time,
+                'now': c_time,
+                'coords': (dep_stop['lat'], dep_stop['lon']),
+                'stop_order': dep_stop['order']
+            }, {
+                'station_id': arr_stop['station_id'],
+                'name': arr_stop['station'],
+                'time': arr_time,
+                'coords': (arr_stop['lat'], arr_stop['lon']),
+                'stop_order': arr_stop['order']
+            }
+
+    return None, None
+
 def get_active_segment(conn, trip_id, current_time):
     j = route_stops_table.join(stations_table, route_stops_table.c.station_id == stations_table.c.id)
     query = select(
-        route_stops_table.c.id,
         route_stops_table.c.station_id,
-        stations_table.c.name,
-        route_stops_table.c.arrival_time,
-        route_stops_table.c.departure_time,
-        route_stops_table.c.stop_order,
-        stations_table.c.latitude,
-        stations_table.c.longitude
+        stations_table.c.name.label('station'),
+        route_stops_table.c.arrival_sec.label('arrival'),
+        route_stops_table.c.departure_sec.label('departure'),
+        route_stops_table.c.stop_order.label('order'),
+        stations_table.c.latitude.label('lat'),
+        stations_table.c.longitude.label('lon')
     ).select_from(j).where(route_stops_table.c.trip_id == trip_id).order_by(route_stops_table.c.stop_order)
 
-    stops = conn.execute(query).fetchall()
+    stops = conn.execute(query).mappings().all()
 
-    if not stops:
+    dep_info, arr_info = find_active_segment(stops, current_time)
+    if not dep_info or not arr_info:
         return None, None, None
 
-    for i in range(len(stops) - 1):
-        dep_stop = stops[i]
-        arr_stop = stops[i + 1]
-
-        dep_time_str = dep_stop[4]
-        arr_time_str = arr_stop[3] or arr_stop[4]
-
-        if not dep_time_str or not arr_time_str:
-            continue
-
-        dep_time = parse_time(dep_time_str)
-        arr_time = parse_time(arr_time_str)
-
-        if arr_time < dep_time:
-            arr_time += timedelta(days=1)
-
-        c_time = current_time
-        if c_time < dep_time and (dep_time - c_time).total_seconds() > 12 * 3600:
-            c_time += timedelta(days=1)
-
-        if dep_time <= c_time <= arr_time:
-            dep_station_id = dep_stop[1]
-            arr_station_id = arr_stop[1]
-
+    def fetch(pairs):
+        raw_paths = {}
+        for dep_id, arr_id in pairs:
             graph_query = select(graph_table.c.path).where(
-                (graph_table.c.departure == dep_station_id) &
-                (graph_table.c.arrival == arr_station_id))
-
+                (graph_table.c.departure == dep_id) &
+                (graph_table.c.arrival == arr_id))
             graph_row = conn.execute(graph_query).fetchone()
-
-            track_path = []
-            if graph_row and graph_row[0]:
-                if isinstance(graph_row[0], str):
-                    track_path = json.loads(graph_row[0])
-                else:
-                    track_path = graph_row[0]
-
-            return {
-                'station_id': dep_station_id,
-                'name': dep_stop[2],
-                'time': dep_time,
-                'coords': (dep_stop[6], dep_stop[7]),
-                'stop_order': dep_stop[5]
-            }, {
-                'station_id': arr_station_id,
-                'name': arr_stop[2],
-                'time': arr_time,
-                'coords': (arr_stop[6], arr_stop[7]),
-                'stop_order': arr_stop[5]
-            }, track_path
-
-    return None, None, None
+            raw_paths[(dep_id, arr_id)] = graph_row[0] if graph_row else None
+        return raw_paths
+
+    track_path = geometry_store.get((dep_info['station_id'], arr_info['station_id']), fetch)
+
+    return dep_info, arr_info, track_path
+
+def build_position_feature(trip_id, dep_info, arr_info, track_path, current_time):
+    """`track_path` is the segment's Polyline from the geometry store, or None to use a straight line."""
+    elapsed_seconds = dep_info['now'] - dep_info['time']
+    total_seconds = arr_info['time'] - dep_info['time']
+    if track_path is None or len(track_path) < 2:
+        track_path = Polyline([dep_info['coords'], arr_info['coords']])
+
+    traveled_distance, speed_ratio = calculate_traveled_distance(elapsed_seconds, total_seconds, track_path.total_distance)
+    current_coord = track_path.point_at(traveled_distance)
+
+    return {
+        "type": "Feature",
+        "geometry": {
+            "type": "Point",
+            "coordinates": [current_coord[1], current_coord[0]]
+        },
+        "properties": {
+            "trip_id": trip_id,
+            "current_speed_ratio": round(speed_ratio, 4),
+            "next_station": arr_info['name'],
+            "next_station_id": arr_info['station_id'],
+            "previous_station": dep_info['name'],
+            "dep_stop_order": int(dep_info['stop_order']),
+            "arr_stop_order": int(arr_info['stop_order']),
+            "delay_status": "on_time",
+            "calculated_at": current_time.strftime('%H:%M:%S')
+        }
+    }
 
 def calculate_train_position(trip_id, current_time_str=None):
     if current_time_str:
@@ -137,62 +167,7 @@ def calculate_train_position(trip_id, current_time_str=None):
         if not dep_info or not arr_info:
             return None
 
-        elapsed_seconds = (current_time - dep_info['time']).total_seconds()
-        total_seconds = (arr_info['time'] - dep_info['time']).total_seconds()
-        if not track_path or len(track_path) < 2:
-            track_path = [dep_info['coords'], arr_info['coords']]
-
-        total_distance = 0
-        segment_distances = []
-        for i in range(len(track_path) - 1):
-            p1 = track_path[i]
-            p2 = track_path[i + 1]
-            dist = haversine(p1[0], p1[1], p2[0], p2[1])
-            segment_distances.append(dist)
-            total_distance += dist
-
-        traveled_distance, speed_ratio = calculate_traveled_distance(elapsed_seconds, total_seconds, total_distance)
-
-        current_distance = 0
-        current_coord = track_path[-1]
-
-        for i, dist in enumerate(segment_distances):
-            if current_distance + dist >= traveled_distance:
-                overshoot = traveled_distance - current_distance
-
-                segment_ratio = overshoot / dist if dist > 0 else 0
-
-                p1_lat, p1_lon = track_path[i]
-                p2_lat, p2_lon = track_path[i + 1]
-
-                interp_lat = p1_lat + (p2_lat - p1_lat) * segment_ratio
-                interp_lon = p1_lon + (p2_lon - p1_lon) * segment_ratio
-
-                current_coord = (interp_lat, interp_lon)
-                break
-
-            current_distance += dist
-
-        feature = {
-            "type": "Feature",
-            "geometry": {
-                "type": "Point",
-                "coordinates": [current_coord[1], current_coord[0]]
-            },
-            "properties": {
-                "trip_id": trip_id,
-                "current_speed_ratio": round(speed_ratio, 4),
-                "next_station": arr_info['name'],
-                "next_station_id": arr_info['station_id'],
-                "previous_station": dep_info['name'],
-                "dep_stop_order": int(dep_info['stop_order']),
-                "arr_stop_order": int(arr_info['stop_order']),
-                "delay_status": "on_time",
-                "calculated_at": current_time.strftime('%H:%M:%S')
-            }
-        }
-
-        return feature
+        return build_position_feature(trip_id, dep_info, arr_info, track_path, current_time)
 
     finally:
         conn.close()
@@ -0,0 +1,58 @@
+import threading
+from typing import TYPE_CHECKING
+
+from flask import Blueprint, current_app, jsonify, request
+
+from services.http_cache import timetable_cached
+
+if TYPE_CHECKING:
+    from services.journey_planner import JourneyPlanner
+
+journey_bp = Blueprint('journeys', __name__)
+
+_planner_lock = threading.Lock()
+
+
+def get_journey_planner() -> 'JourneyPlanner':
+    # Built on first use: the connection arrays are only needed once someone plans a journey
+    from services.journey_planner import JourneyPlanner  # numpy is imported on first use
+
+    planner = current_app.config.get('JOURNEY_PLANNER')
+    if planner is None:
+        with _planner_lock:
+            planner = current_app.config.get('JOURNEY_PLANNER')
+            if planner is None:
+                timetable = current_app.config.get('TIMETABLE')
+                if timetable is not None:
+                    planner = JourneyPlanner(timetable)
+                else:
+                    planner = JourneyPlanner.load(current_app.config['DB_ENGINE'])
+                current_app.config['JOURNEY_PLANNER'] = planner
+    return planner
+
+
+@journey_bp.route('/api/journeys')
+@timetable_cached
+def get_journeys():
+    from_station = request.args.get('from_station')
+    to_station = request.args.get('to_station')
+    date_str = request.args.get('date')
+    time_str = request.args.get('time')
+
+    if not from_station or not to_station:
+        return jsonify([])
+
+    from services.journey_planner import MAX_TRANSFERS
+
+    try:
+        max_transfers = min(max(int(request.args.get('max_transfers', MAX_TRANSFERS)), 0), 5)
+    except ValueError:
+        max_transfers = MAX_TRANSFERS
+
+    names = current_app.config['STATION_NAMES']
+    dep_id = names.lookup(from_station)
+    arr_id = names.lookup(to_station)
+    if dep_id is None or arr_id is None:
+        return jsonify([])
+
+    return jsonify(get_journey_planner().plan(dep_id, arr_id, date_str, time_str, max_transfers))
@@ -0,0 +1,130 @@
+import json
+
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context
+
+from db_helpers import get_route_service, release_db
+from services.live_positions import STALE_TICKS
+from services.spatial import parse_bbox
+from services.train_tracker import TrainTracker
+
+live_bp = Blueprint('live', __name__)
+
+STREAM_KEEPALIVE_SECONDS = 15
+
+
+def get_live_snapshot():
+    ticker = current_app.config.get('LIVE_TICKER')
+    return ticker.current() if ticker is not None else None
+
+
+@live_bp.route('/api/live/all')
+def get_all_live_trains():
+    from_station = request.args.get('from_station')
+    to_station = request.args.get('to_station')
+    try:
+        bbox = parse_bbox(request.args.get('bbox'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    live = get_live_snapshot()
+    if live is None:
+        return jsonify([])
+
+    if from_station and to_station:
+        service = get_route_service()
+        trips = service.get_route_between(from_station, to_station)
+        trains = TrainTracker(service, live.calculated_at).select_from_snapshot(live.trains, trips)
+    else:
+        trains = list(live.trains.values())
+
+    if bbox:
+        min_lon, min_lat, max_lon, max_lat = bbox
+        trains = [
+            t for t in trains
+            if min_lon <= t["lon"] <= max_lon and min_lat <= t["lat"] <= max_lat
+        ]
+
+    return jsonify(trains)
+
+
+@live_bp.route('/api/live/stream')
+def stream_live_trains():
+    """
+    Server-Sent Events feed for one (from_station, to_station, date): a `full` frame with
+    every active train, then `delta` frames with only added, changed and removed trains.
+    """
+    from_station = request.args.get('from_station')
+    to_station = request.args.get('to_station')
+    date_str = request.args.get('date')
+
+    ticker = current_app.config.get('LIVE_TICKER')
+    if ticker is None or not from_station or not to_station:
+        # 204 tells EventSource not to reconnect, so the client falls back to polling
+        return Response(status=204)
+    if not live_covers_date(ticker.current(), date_str):
+        # No fresh snapshot yet, or another day than the live one: /api/train_positions computes it on demand
+        return Response(status=204)
+
+    trips = get_route_service().get_route_between(from_station, to_station, date_str)
+    # The loop below only reads the snapshot; don't hold a pooled connection for the stream's lifetime
+    release_db()
+
+    def events():
+        seq = 0
+        sent = None
+        while True:
+            ticker.wait_for_update(seq, timeout=stream_wait_seconds(ticker))
+            live = ticker.current()
+            if live is not None and live.seq == seq:
+                yield ": keepalive\n\n"
+                continue
+            if not live_covers_date(live, date_str):
+                # The ticker stopped publishing or moved past the requested day; the reconnect gets 204 and the client polls
+                return
+            seq = live.seq
+
+            current = select_live_trains(None, live, trips, date_str)
+            if sent is None:
+                yield sse_event('full', list(current.values()))
+            else:
+                delta = live_delta(sent, current)
+                if any(delta.values()):
+                    yield sse_event('delta', delta)
+            sent = current
+
+    return Response(stream_with_context(events()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
+
+
+def live_covers_date(live, date_str: str | None) -> bool:
+    """False without a live snapshot, or when the request is for another day than it was calculated for."""
+    if live is None or live.calculated_at is None:
+        return False
+    return not date_str or date_str == live.calculated_at.date().isoformat()
+
+
+def stream_wait_seconds(ticker) -> float:
+    # Wake at least once per staleness window, so a stream whose ticker stopped ends within a few ticks
+    return min(STREAM_KEEPALIVE_SECONDS, STALE_TICKS * ticker.interval)
+
+
+def select_live_trains(service, live, trips: list[dict], date_str: str | None) -> dict[int, dict]:
+    """Entries of the live snapshot that belong to the selected route, keyed by trip_id."""
+    if not live_covers_date(live, date_str):
+        return {}
+    tracker = TrainTracker(service, live.calculated_at)
+    return {t["trip_id"]: t for t in tracker.select_from_snapshot(live.trains, trips)}
+
+
+def live_delta(sent: dict[int, dict], current: dict[int, dict]) -> dict:
+    return {
+        "added": [t for trip_id, t in current.items() if trip_id not in sent],
+        "changed": [t for trip_id, t in current.items() if trip_id in sent and sent[trip_id] != t],
+        "removed": [trip_id for trip_id in sent if trip_id not in current],
+    }
+
+
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, separators=(',', ':'))}\n\n"
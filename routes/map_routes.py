@@ -1,5 +1,6 @@
 from flask import Blueprint, request, render_template
 from db_helpers import get_route_service
+from services.http_cache import current_data_version
 from services.map_builder import MapBuilder
 
 map_bp = Blueprint('map', __name__)
@@ -18,11 +19,10 @@ def get_map():
     map_theme = request.args.get('map_theme', 'dark')
 
     service = get_route_service()
-    builder = MapBuilder(service, map_theme)
+    builder = MapBuilder(service, map_theme, data_version=current_data_version())
 
-    folium_map = builder.build(
+    return builder.render(
         from_station=from_station,
         to_station=to_station,
         time_str=time_str,
     )
-    return folium_map.get_root().render()
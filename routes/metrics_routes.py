@@ -0,0 +1,11 @@
+from flask import Blueprint, Response
+
+from services.instrumentation import render_metrics
+
+metrics_bp = Blueprint('metrics', __name__)
+
+
+@metrics_bp.route('/metrics')
+def get_metrics():
+    # Histograms are per process: with several workers, scrape each one
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
@@ -1,16 +1,23 @@
-from flask import Blueprint, jsonify, request
+from functools import partial
+
+from flask import Blueprint, current_app, jsonify, request
 from db_helpers import get_route_service
+from services.geometry import encode_polyline, polyline_precision, tolerance_from_args
+from services.http_cache import timetable_cached
+from services.spatial import check_lat_lon, parse_bbox
 
 station_bp = Blueprint('stations', __name__)
 
 
 @station_bp.route('/api/stations')
+@timetable_cached
 def get_stations():
     service = get_route_service()
     return jsonify(service.get_all_stations())
 
 
 @station_bp.route('/api/reachable')
+@timetable_cached
 def get_reachable():
     name = request.args.get('name')
     if not name:
@@ -20,9 +27,90 @@ def get_reachable():
 
 
 @station_bp.route('/api/reachable_paths')
+@timetable_cached
 def get_reachable_paths():
     name = request.args.get('name')
     if not name:
         return jsonify([])
     service = get_route_service()
-    return jsonify(service.get_reachable_paths(name))
\ No newline at end of file
+    paths = service.get_reachable_paths(name, tolerance_from_args(request.args))
+
+    precision = polyline_precision(request.args)
+    if precision is not None:
+        paths = [encode_polyline(path, precision) for path in paths]
+    return jsonify(paths)
+
+
+@station_bp.route('/api/stations/search')
+@timetable_cached
+def search_stations():
+    query = request.args.get('q', '')
+    try:
+        limit = min(max(int(request.args.get('limit', 10)), 1), 50)
+    except ValueError:
+        limit = 10
+
+    # Destination search: only stations reachable from the chosen origin, filtered before the limit
+    names = current_app.config['STATION_NAMES']
+    station_filter = None
+    origin_id = names.lookup(request.args.get('from_station'))
+    if origin_id is not None:
+        station_filter = partial(current_app.config['REACHABILITY'].can_reach, origin_id)
+    return jsonify(names.search(query, limit, station_filter))
+
+
+@station_bp.route('/api/stations/bbox')
+@timetable_cached
+def get_stations_in_bbox():
+    try:
+        bbox = parse_bbox(request.args.get('bbox'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if not bbox:
+        return jsonify([])
+    return jsonify(current_app.config['SPATIAL'].stations_in_bbox(bbox))
+
+
+@station_bp.route('/api/stations/nearest')
+@timetable_cached
+def get_nearest_stations():
+    if 'lat' not in request.args or 'lon' not in request.args:
+        return jsonify([])
+    try:
+        lat = float(request.args['lat'])
+        lon = float(request.args['lon'])
+        check_lat_lon(lat, lon)
+        limit = min(max(int(request.args.get('limit', 1)), 1), 50)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    nearest = current_app.config['SPATIAL'].nearest_stations(lat, lon, limit)
+    return jsonify([dict(st, distance_km=round(distance, 3)) for distance, st in nearest])
+
+
+@station_bp.route('/api/paths/bbox')
+@timetable_cached
+def get_paths_in_bbox():
+    try:
+        bbox = parse_bbox(request.args.get('bbox'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if not bbox:
+        return jsonify([])
+
+    pairs = current_app.config['SPATIAL'].paths_in_bbox(bbox)
+    paths = get_route_service().get_segment_paths(pairs)
+    tolerance = tolerance_from_args(request.args)
+    precision = polyline_precision(request.args)
+
+    result = []
+    for dep, arr in pairs:
+        if (dep, arr) not in paths:
+            continue
+        coords = paths[(dep, arr)].coords(tolerance)
+        result.append({
+            "departure": dep,
+            "arrival": arr,
+            "path": encode_polyline(coords, precision) if precision is not None else coords,
+        })
+    return jsonify(result)
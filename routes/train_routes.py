@@ -2,13 +2,16 @@ from flask import Blueprint, jsonify, request
 from datetime import datetime, timedelta
 
 from db_helpers import get_route_service
-from live_trains import calculate_train_position, parse_time
+from live_trains import parse_time
+from routes.live_routes import get_live_snapshot
+from services.http_cache import timetable_cached
 from services.train_tracker import TrainTracker
 
 train_bp = Blueprint('trains', __name__)
 
 
 @train_bp.route('/api/route_trains')
+@timetable_cached
 def get_route_trains():
     from_station = request.args.get('from_station')
     to_station = request.args.get('to_station')
@@ -31,10 +34,20 @@ def get_train_positions():
     if not from_station or not to_station:
         return jsonify([])
 
-    service = get_route_service()
+    return jsonify(train_positions(get_route_service(), get_live_snapshot(), from_station, to_station, time_str, date_str))
+
+
+def train_positions(service, live, from_station: str, to_station: str, time_str: str | None, date_str: str | None) -> list[dict]:
+    """
+    Active trains on the route: picked out of the live snapshot when it covers the request,
+    computed for the requested time otherwise. Shared with the ASGI path in asgi.py.
+    """
+    if not time_str and live and (not date_str or date_str == live.calculated_at.date().isoformat()):
+        tracker = TrainTracker(service, live.calculated_at)
+        trips = service.get_route_between(from_station, to_station, date_str)
+        return tracker.select_from_snapshot(live.trains, trips)
+
     current_time = parse_time(time_str) if time_str else (datetime.now() - timedelta(hours=1))
 
     tracker = TrainTracker(service, current_time)
-    active_trains = tracker.get_active_trains(from_station, to_station, time_str, date_str)
-
-    return jsonify(active_trains)
\ No newline at end of file
+    return tracker.get_active_trains(from_station, to_station, time_str, date_str)
\ No newline at end of file
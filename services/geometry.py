@@ -0,0 +1,234 @@
+import json
+import math
+import os
+import threading
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    R = 6371.0
+
+    lat1_rad, lon1_rad = math.radians(lat1), math.radians(lon1)
+    lat2_rad, lon2_rad = math.radians(lat2), math.radians(lon2)
+
+    dlat = lat2_rad - lat1_rad
+    dlon = lon2_rad - lon1_rad
+
+    a = math.sin(dlat / 2)**2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(dlon / 2)**2
+    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+    return R * c
+
+
+# Decimal places kept by format=polyline responses (5 is about 1 m, what most decoders assume)
+POLYLINE_PRECISION = int(os.getenv("POLYLINE_PRECISION", 5))
+
+
+def zoom_tolerance(zoom: float) -> float:
+    """Half a pixel of a 256px web-map tile at `zoom`, in degrees of longitude."""
+    return 180.0 / (256 * 2 ** zoom)
+
+
+def tolerance_from_args(args) -> float:
+    """
+    Simplification tolerance from request args: `tolerance` in degrees, or a map `zoom`; 0 keeps every vertex.
+    Unparseable or non-finite values (float() accepts nan and inf) fall through to the next option.
+    """
+    tolerance = _finite_arg(args, 'tolerance')
+    if tolerance is not None:
+        return max(tolerance, 0.0)
+    zoom = _finite_arg(args, 'zoom')
+    if zoom is not None:
+        return zoom_tolerance(min(max(zoom, 0.0), 22.0))
+    return 0.0
+
+
+def _finite_arg(args, name: str) -> float | None:
+    try:
+        value = float(args[name])
+    except (KeyError, TypeError, ValueError):
+        return None
+    return value if math.isfinite(value) else None
+
+
+def polyline_precision(args) -> int | None:
+    """Precision asked for with format=polyline, None when the plain coordinate JSON is wanted."""
+    if args.get('format') != 'polyline':
+        return None
+    try:
+        # JS decoders work on 32-bit ints: 7 places would overflow on longitudes past ±107°
+        return min(max(int(args.get('precision', POLYLINE_PRECISION)), 1), 6)
+    except ValueError:
+        return POLYLINE_PRECISION
+
+
+def encode_polyline(coords, precision: int = POLYLINE_PRECISION) -> str:
+    """Google encoded-polyline string of [[lat, lon], ...]; decoded by static/js/polyline.js."""
+    factor = 10 ** precision
+    chunks = []
+    prev_lat = prev_lon = 0
+    for lat, lon in coords:
+        lat, lon = round(lat * factor), round(lon * factor)
+        for delta in (lat - prev_lat, lon - prev_lon):
+            value = ~(delta << 1) if delta < 0 else delta << 1
+            while value >= 0x20:
+                chunks.append(chr((0x20 | (value & 0x1f)) + 63))
+                value >>= 5
+            chunks.append(chr(value + 63))
+        prev_lat, prev_lon = lat, lon
+    return ''.join(chunks)
+
+
+class Polyline:
+    """
+    Decoded track geometry stored as flat float arrays, together with the cumulative
+    haversine distance (km) from the first vertex to every vertex.
+    """
+
+    __slots__ = ('lats', 'lons', 'cumulative', '_significance')
+
+    def __init__(self, coords):
+        self.lats = array('d', (float(p[0]) for p in coords))
+        self.lons = array('d', (float(p[1]) for p in coords))
+        self.cumulative = array('d', [0.0])
+
+        total = 0.0
+        for i in range(len(self.lats) - 1):
+            total += haversine(self.lats[i], self.lons[i], self.lats[i + 1], self.lons[i + 1])
+            self.cumulative.append(total)
+        self._significance = None
+
+    def __len__(self):
+        return len(self.lats)
+
+    @property
+    def total_distance(self) -> float:
+        return self.cumulative[-1]
+
+    def coords(self, tolerance: float = 0.0) -> list[list[float]]:
+        """Every vertex, or the Douglas-Peucker simplification at `tolerance` degrees."""
+        if tolerance <= 0 or len(self.lats) < 3:
+            return [[lat, lon] for lat, lon in zip(self.lats, self.lons)]
+        if self._significance is None:
+            self._significance = self._douglas_peucker()
+        return [
+            [lat, lon] for lat, lon, significance in zip(self.lats, self.lons, self._significance)
+            if significance > tolerance
+        ]
+
+    def _douglas_peucker(self) -> array:
+        """
+        Runs Douglas-Peucker once for every tolerance at the same time: a vertex survives
+        simplification at tolerance t exactly when its significance is greater than t.
+        Distances are in degrees of longitude, with latitude stretched like on a Mercator map.
+        """
+        n = len(self.lats)
+        lat_scale = 1 / max(math.cos(math.radians(sum(self.lats) / n)), 0.01)
+        xs = self.lons
+        ys = [lat * lat_scale for lat in self.lats]
+
+        significance = array('d', [0.0]) * n
+        significance[0] = significance[-1] = math.inf
+        stack = [(0, n - 1, math.inf)]
+        while stack:
+            i, j, parent = stack.pop()
+            if j - i < 2:
+                continue
+            ax, ay = xs[i], ys[i]
+            dx, dy = xs[j] - ax, ys[j] - ay
+            length_sq = dx * dx + dy * dy
+
+            farthest, max_dist = i + 1, -1.0
+            for k in range(i + 1, j):
+                px, py = xs[k] - ax, ys[k] - ay
+                t = (px * dx + py * dy) / length_sq if length_sq else 0.0
+                t = 0.0 if t < 0 else 1.0 if t > 1 else t
+                dist = math.hypot(px - t * dx, py - t * dy)
+                if dist > max_dist:
+                    farthest, max_dist = k, dist
+
+            # A vertex is only reached once its parent split survived, so it can't outlive it
+            kept_until = min(max_dist, parent)
+            significance[farthest] = kept_until
+            stack.append((i, farthest, kept_until))
+            stack.append((farthest, j, kept_until))
+        return significance
+
+    def point_at(self, distance: float) -> tuple[float, float]:
+        """Interpolates the (lat, lon) lying `distance` km along the line."""
+        j = bisect_left(self.cumulative, distance, 1)
+        if j >= len(self.cumulative):
+            return self.lats[-1], self.lons[-1]
+
+        i = j - 1
+        dist = self.cumulative[j] - self.cumulative[i]
+        ratio = (distance - self.cumulative[i]) / dist if dist > 0 else 0
+
+        return (
+            self.lats[i] + (self.lats[j] - self.lats[i]) * ratio,
+            self.lons[i] + (self.lons[j] - self.lons[i]) * ratio,
+        )
+
+
+class GeometryStore:
+    """
+    Process-wide LRU cache of decoded `graph` paths keyed by (departure_id, arrival_id).
+
+    Callers pass a `fetch(pairs) -> {pair: raw_path}` callable used for cache misses, so
+    the same store serves the timetable snapshot, the SQL fallback and live_trains.
+    Pairs without geometry are cached as None to avoid asking for them again.
+    """
+
+    def __init__(self, maxsize: int = 4096):
+        self.maxsize = maxsize
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, pair: tuple[int, int], fetch) -> Polyline | None:
+        return self.get_many([pair], fetch).get(pair)
+
+    def get_many(self, pairs, fetch) -> dict[tuple[int, int], Polyline]:
+        found = {}
+        missing = []
+        with self._lock:
+            for pair in set(pairs):
+                if pair in self._entries:
+                    self._entries.move_to_end(pair)
+                    found[pair] = self._entries[pair]
+                else:
+                    missing.append(pair)
+
+        if missing:
+            raw_paths = fetch(missing)
+            decoded = {pair: self._decode(raw_paths.get(pair)) for pair in missing}
+            with self._lock:
+                for pair, polyline in decoded.items():
+                    self._entries[pair] = polyline
+                    self._entries.move_to_end(pair)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+            found.update(decoded)
+
+        return {pair: polyline for pair, polyline in found.items() if polyline is not None}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    @staticmethod
+    def _decode(raw) -> Polyline | None:
+        if not raw:
+            return None
+        try:
+            coords = json.loads(raw) if isinstance(raw, str) else raw
+        except Exception as e:
+            print(f"Error parsing path JSON: {e}")
+            return None
+        if not coords:
+            return None
+        return Polyline(coords)
+
+
+geometry_store = GeometryStore(int(os.getenv("GEOMETRY_CACHE_SIZE", 4096)))
@@ -0,0 +1,49 @@
+import hashlib
+import os
+from functools import wraps
+
+from flask import current_app, make_response, request
+
+# How long browsers and proxies may reuse a timetable response before revalidating
+TIMETABLE_MAX_AGE = int(os.getenv("TIMETABLE_MAX_AGE", 300))
+
+
+def current_data_version() -> str | None:
+    data_version = current_app.config.get('DATA_VERSION')
+    return data_version.current() if data_version is not None else None
+
+
+def request_etag(version: str) -> str:
+    """Strong ETag for the current request: data version plus a digest of the normalized query string."""
+    args = sorted((key, value) for key in request.args for value in request.args.getlist(key))
+    digest = hashlib.sha1(repr((request.path, args)).encode()).hexdigest()[:12]
+    return f"{version}-{digest}"
+
+
+def timetable_cached(view):
+    """
+    Conditional GET for views whose output depends only on the timetable and query args.
+    A matching If-None-Match is answered with 304 before the view (and its queries) runs.
+    """
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        version = current_data_version()
+        if not version:
+            return view(*args, **kwargs)
+
+        etag = request_etag(version)
+        if etag in request.if_none_match:
+            response = current_app.response_class(status=304)
+        else:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+
+        response.set_etag(etag)
+        response.cache_control.public = True
+        response.cache_control.max_age = TIMETABLE_MAX_AGE
+        response.vary.add('Accept-Encoding')
+        return response
+
+    return wrapper
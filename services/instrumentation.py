@@ -0,0 +1,194 @@
+import contextvars
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from flask import g, has_request_context, request
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import event, pool
+
+# Set INSTRUMENTATION=0 to drop the per-request hooks, the Server-Timing header and /metrics data
+INSTRUMENTATION = os.getenv("INSTRUMENTATION", "1") == "1"
+
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+
+class Histogram:
+    """Prometheus-style cumulative histogram, one series per endpoint label."""
+
+    def __init__(self, name: str, description: str, buckets: tuple):
+        self.name = name
+        self.description = description
+        self.buckets = buckets
+        self._series: dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, endpoint: str, value: float) -> None:
+        with self._lock:
+            series = self._series.get(endpoint)
+            if series is None:
+                # per-bucket counts (last slot is +Inf), sum, count
+                series = self._series[endpoint] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {endpoint: (list(counts), total, n) for endpoint, (counts, total, n) in self._series.items()}
+        for endpoint, (counts, total, n) in sorted(snapshot.items()):
+            label = endpoint.replace('\\', '\\\\').replace('"', '\\"')
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{endpoint="{label}",le="{bound:g}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{endpoint="{label}",le="+Inf"}} {n}')
+            lines.append(f'{self.name}_sum{{endpoint="{label}"}} {total:.6f}')
+            lines.append(f'{self.name}_count{{endpoint="{label}"}} {n}')
+        return lines
+
+
+REQUEST_SECONDS = Histogram('euroticket_request_duration_seconds', 'Time spent in the Flask handler.', DURATION_BUCKETS)
+SQL_SECONDS = Histogram('euroticket_sql_duration_seconds', 'SQL execution time per request.', DURATION_BUCKETS)
+SQL_QUERIES = Histogram('euroticket_sql_queries', 'SQL statements executed per request.', COUNT_BUCKETS)
+JSON_SECONDS = Histogram('euroticket_json_duration_seconds', 'JSON serialization time per request.', DURATION_BUCKETS)
+POOL_WAIT_SECONDS = Histogram(
+    'euroticket_pool_wait_seconds', 'Time spent waiting for a connection from the pool.', DURATION_BUCKETS)
+
+HISTOGRAMS = (REQUEST_SECONDS, SQL_SECONDS, SQL_QUERIES, JSON_SECONDS, POOL_WAIT_SECONDS)
+
+
+class RequestTiming:
+    __slots__ = ('endpoint', 'started', 'sql_count', 'sql_seconds', 'json_seconds', 'pool_wait_seconds')
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self.started = time.perf_counter()
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+        self.json_seconds = 0.0
+        self.pool_wait_seconds = 0.0
+
+
+# Timing of a request served outside Flask (the native endpoints in asgi.py)
+_native_timing: contextvars.ContextVar[RequestTiming | None] = contextvars.ContextVar('native_timing', default=None)
+
+
+def _current_timing() -> RequestTiming | None:
+    if has_request_context():
+        return g.get('request_timing')
+    return _native_timing.get()
+
+
+class TimedQueuePool(pool.QueuePool):
+    """QueuePool that measures how long each checkout waits for a free connection."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            waited = time.perf_counter() - started
+            timing = _current_timing()
+            if timing is not None:
+                timing.pool_wait_seconds += waited
+            POOL_WAIT_SECONDS.observe(timing.endpoint if timing is not None else 'background', waited)
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+
+    def dumps(self, obj, **kwargs) -> str:
+        started = time.perf_counter()
+        try:
+            return super().dumps(obj, **kwargs)
+        finally:
+            timing = _current_timing()
+            if timing is not None:
+                timing.json_seconds += time.perf_counter() - started
+
+
+def _endpoint() -> str:
+    return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # On the execution context, not a per-connection stack: a statement that raises never
+    # reaches after_cursor_execute and would leave its entry behind on the pooled connection
+    context._query_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, '_query_started', None)
+    if started is None:
+        return
+    timing = _current_timing()
+    if timing is not None:
+        timing.sql_count += 1
+        timing.sql_seconds += time.perf_counter() - started
+
+
+def finish_timing(timing: RequestTiming) -> str:
+    """Records a finished request in the histograms and returns its Server-Timing header value."""
+    elapsed = time.perf_counter() - timing.started
+    REQUEST_SECONDS.observe(timing.endpoint, elapsed)
+    SQL_SECONDS.observe(timing.endpoint, timing.sql_seconds)
+    SQL_QUERIES.observe(timing.endpoint, timing.sql_count)
+    JSON_SECONDS.observe(timing.endpoint, timing.json_seconds)
+    return ', '.join((
+        f"app;dur={elapsed * 1000:.2f}",
+        f'db;dur={timing.sql_seconds * 1000:.2f};desc="{timing.sql_count} queries"',
+        f"json;dur={timing.json_seconds * 1000:.2f}",
+        f"pool;dur={timing.pool_wait_seconds * 1000:.2f}",
+    ))
+
+
+@contextmanager
+def native_request(endpoint: str):
+    """
+    Timing for a request handled outside Flask; yields None when instrumentation is off.
+    Blocking work must run in a copy of the current context (contextvars.copy_context().run)
+    for its SQL and pool wait to be attributed to the request.
+    """
+    timing = RequestTiming(endpoint) if INSTRUMENTATION else None
+    token = _native_timing.set(timing)
+    try:
+        yield timing
+    finally:
+        _native_timing.reset(token)
+
+
+def _start_request():
+    g.request_timing = RequestTiming(_endpoint())
+
+
+def _finish_request(response):
+    timing = g.pop('request_timing', None)
+    if timing is None:
+        return response
+    response.headers.add('Server-Timing', finish_timing(timing))
+    return response
+
+
+def instrument(app, engine) -> None:
+    """
+    Hooks request timing, SQL counting and JSON timing into the app. Pool wait is only
+    measured when the engine was created with poolclass=TimedQueuePool.
+    """
+    if not INSTRUMENTATION:
+        return
+    app.json = TimedJSONProvider(app)
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+
+
+def render_metrics() -> str:
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.render())
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,267 @@
+import os
+import threading
+from bisect import bisect_left
+from datetime import date
+
+import numpy as np
+
+from services.service_time import DAY_SECONDS, format_clock, parse_clock
+
+INF = float('inf')
+
+# Minimum time to change trains at a station (the schema has no per-station transfer times)
+MIN_TRANSFER_SECONDS = int(os.getenv("MIN_TRANSFER_SECONDS", 300))
+MAX_TRANSFERS = int(os.getenv("JOURNEY_MAX_TRANSFERS", 3))
+# Journeys with fewer transfers are only searched for up to this long after the earliest arrival
+PARETO_WINDOW_SECONDS = int(os.getenv("JOURNEY_PARETO_WINDOW", 3 * 3600))
+
+
+class JourneyPlanner:
+    """
+    Multi-leg journey search with the Connection Scan Algorithm over a timetable snapshot.
+
+    Every pair of consecutive stops of a trip is one connection. Connections are kept in
+    flat arrays sorted by departure time. Stop times are service-day seconds, so overnight
+    trips simply run past 24:00. For a given weekday the planner combines the
+    trips running that day with the tails of the previous day's trips and the next day's
+    trips (shifted by -24h/+24h), and caches that merged array per weekday.
+
+    The scan keeps one arrival label per station and number of trips used, which yields
+    the Pareto set of (arrival time, transfers) in a single pass. Once the target is reached,
+    the scan only continues for PARETO_WINDOW_SECONDS looking for journeys with fewer transfers.
+    """
+
+    def __init__(self, timetable, min_transfer: int = MIN_TRANSFER_SECONDS):
+        self.timetable = timetable
+        self.min_transfer = min_transfer
+
+        self.station_index = {station_id: i for i, station_id in enumerate(timetable.stations)}
+        self.station_ids = list(timetable.stations)
+        self.trip_ids = [trip_id for trip_id in timetable.trips if trip_id in timetable.trip_stops]
+        self.days_masks = np.array([timetable.trips[t]['days_mask'] or 0 for t in self.trip_ids], dtype=np.int64)
+
+        self._build_connections()
+        self._days: dict = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, engine) -> 'JourneyPlanner':
+        from services.timetable import TimetableSnapshot
+
+        return cls(TimetableSnapshot.load(engine))
+
+    def plan(self, dep_id: int, arr_id: int, date_str: str | None = None, time_str: str | None = None,
+             max_transfers: int = MAX_TRANSFERS) -> list[dict]:
+        """
+        Pareto-optimal journeys departing at or after time_str on date_str, sorted by arrival.
+        The first journey is the earliest arrival; each following one uses fewer transfers.
+        """
+        source = self.station_index.get(dep_id)
+        target = self.station_index.get(arr_id)
+        if source is None or target is None or source == target:
+            return []
+
+        start = float(parse_clock(time_str) or 0)
+
+        conns = self._connections_for(self._weekday(date_str))
+        rounds = max(1, max_transfers + 1)
+        labels, parents = self._scan(conns, source, target, start, start + DAY_SECONDS, rounds)
+
+        journeys = []
+        best = INF
+        for k in range(1, rounds + 1):
+            arrival = labels[k * len(self.station_ids) + target]
+            if arrival < best:
+                best = arrival
+                journeys.append(self._journey(conns, parents, target, k))
+        journeys.sort(key=lambda j: j['arrival_seconds'])
+        return journeys
+
+    # ------------------------------------------------------------------
+    # Connection arrays
+    # ------------------------------------------------------------------
+
+    def _build_connections(self) -> None:
+        dep_station, arr_station, dep_time, arr_time, trip, dep_order, arr_order = [], [], [], [], [], [], []
+        for t, trip_id in enumerate(self.trip_ids):
+            stops = self.timetable.trip_stops[trip_id]
+            for dep_stop, arr_stop in zip(stops, stops[1:]):
+                arrival = arr_stop.arrival if arr_stop.arrival is not None else arr_stop.departure
+                if dep_stop.departure is None or arrival is None:
+                    continue
+                dep_station.append(self.station_index[dep_stop.station_id])
+                arr_station.append(self.station_index[arr_stop.station_id])
+                dep_time.append(dep_stop.departure)
+                arr_time.append(arrival)
+                trip.append(t)
+                dep_order.append(dep_stop.order)
+                arr_order.append(arr_stop.order)
+
+        order = np.argsort(np.asarray(dep_time, dtype=np.float64), kind='stable')
+        self.dep_station = np.asarray(dep_station, dtype=np.int32)[order]
+        self.arr_station = np.asarray(arr_station, dtype=np.int32)[order]
+        self.dep_time = np.asarray(dep_time, dtype=np.float64)[order]
+        self.arr_time = np.asarray(arr_time, dtype=np.float64)[order]
+        self.trip = np.asarray(trip, dtype=np.int32)[order]
+        self.dep_order = np.asarray(dep_order, dtype=np.int32)[order]
+        self.arr_order = np.asarray(arr_order, dtype=np.int32)[order]
+
+    @staticmethod
+    def _weekday(date_str: str | None) -> int | None:
+        if not date_str:
+            return None
+        try:
+            return date.fromisoformat(date_str).weekday()
+        except ValueError:
+            return None
+
+    def _connections_for(self, weekday: int | None) -> tuple:
+        with self._lock:
+            cached = self._days.get(weekday)
+        if cached is not None:
+            return cached
+
+        trip_of = self.trip
+        if weekday is None:
+            # No date: every trip runs, today and (for late journeys) tomorrow
+            shifts = [(np.ones(len(trip_of), dtype=bool), 0.0), (np.ones(len(trip_of), dtype=bool), DAY_SECONDS)]
+        else:
+            runs = lambda day: ((self.days_masks >> (day % 7)) & 1).astype(bool)[trip_of]
+            shifts = [
+                (runs(weekday - 1) & (self.dep_time >= DAY_SECONDS), -DAY_SECONDS),
+                (runs(weekday), 0.0),
+                (runs(weekday + 1), DAY_SECONDS),
+            ]
+
+        parts = []
+        for day, (mask, shift) in enumerate(shifts):
+            idx = np.flatnonzero(mask)
+            parts.append((idx, self.dep_time[idx] + shift, self.arr_time[idx] + shift, day))
+
+        dep_time = np.concatenate([p[1] for p in parts])
+        order = np.argsort(dep_time, kind='stable')
+        idx = np.concatenate([p[0] for p in parts])[order]
+        # The same trip on two service days is two different vehicles
+        trip_key = (np.concatenate([np.full(len(p[0]), p[3]) for p in parts])[order] * len(self.trip_ids)
+                    + self.trip[idx])
+
+        conns = (
+            dep_time[order].tolist(),
+            np.concatenate([p[2] for p in parts])[order].tolist(),
+            self.dep_station[idx].tolist(),
+            self.arr_station[idx].tolist(),
+            trip_key.tolist(),
+            idx.tolist(),
+        )
+        with self._lock:
+            self._days[weekday] = conns
+        return conns
+
+    # ------------------------------------------------------------------
+    # Scan
+    # ------------------------------------------------------------------
+
+    def _scan(self, conns, source: int, target: int, start: float, horizon: float, rounds: int):
+        dep_time, arr_time, dep_station, arr_station, trip_key, _ = conns
+        n = len(self.station_ids)
+        transfer = self.min_transfer
+
+        # labels[k * n + s]: earliest arrival at s using exactly k trips (k = 0 is the origin);
+        # ready[s]: earliest time any of those labels allows boarding at s
+        labels = [INF] * ((rounds + 1) * n)
+        labels[source] = start
+        ready = [INF] * n
+        ready[source] = start
+        parents = {}
+        boarded = {}  # trip_key -> (rounds needed, boarding connection, round of the label used)
+        direct = n + target
+        limit = horizon + DAY_SECONDS
+        # target_best[k]: earliest arrival at the target using at most k trips (target pruning)
+        target_best = [INF] * (rounds + 1)
+
+        for i in range(bisect_left(dep_time, start), len(dep_time)):
+            t_dep = dep_time[i]
+            # Nothing departing after the best direct arrival can improve the Pareto set
+            if t_dep >= labels[direct] or t_dep > limit:
+                break
+
+            s = dep_station[i]
+            state = boarded.get(trip_key[i])
+            if state is None:
+                if ready[s] > t_dep:
+                    continue
+                k = rounds + 1
+            else:
+                k = state[0]
+
+            # New boardings only up to the horizon; trips already on board run to the end
+            if ready[s] <= t_dep <= horizon:
+                for j in range(min(k, rounds)):
+                    if labels[j * n + s] + (transfer if j else 0) <= t_dep:
+                        if j + 1 < k:
+                            k = j + 1
+                            state = (k, i, j)
+                            boarded[trip_key[i]] = state
+                        break
+
+            if state is None or t_dep >= target_best[k]:
+                continue
+
+            a = arr_station[i]
+            t_arr = arr_time[i]
+            pos = k * n + a
+            if t_arr < labels[pos]:
+                labels[pos] = t_arr
+                parents[pos] = (state[1], i, state[2])
+                if t_arr + transfer < ready[a]:
+                    ready[a] = t_arr + transfer
+                if a == target:
+                    for kk in range(k, rounds + 1):
+                        target_best[kk] = min(target_best[kk], t_arr)
+                    limit = min(limit, t_arr + PARETO_WINDOW_SECONDS)
+
+        return labels, parents
+
+    def _journey(self, conns, parents: dict, target: int, k: int) -> dict:
+        dep_station = conns[2]
+        n = len(self.station_ids)
+
+        legs = []
+        station, rnd = target, k
+        while rnd > 0:
+            board, alight, prev_round = parents[rnd * n + station]
+            legs.append(self._leg(conns, board, alight))
+            station, rnd = dep_station[board], prev_round
+        legs.reverse()
+
+        departure = legs[0]['departure_seconds']
+        arrival = legs[-1]['arrival_seconds']
+        return {
+            "departure": format_clock(departure),
+            "arrival": format_clock(arrival),
+            "arrival_day_offset": int(arrival // DAY_SECONDS),
+            "arrival_seconds": arrival,
+            "duration_minutes": round((arrival - departure) / 60),
+            "transfers": len(legs) - 1,
+            "legs": legs,
+        }
+
+    def _leg(self, conns, board: int, alight: int) -> dict:
+        dep_time, arr_time, _, _, _, base = conns
+        trip_id = self.trip_ids[self.trip[base[board]]]
+        trip = self.timetable.trips[trip_id]
+        stations = self.timetable.stations
+        return {
+            "trip_id": trip_id,
+            "train_number": trip['train_number'],
+            "train_name": trip['train_name'],
+            "from_station": stations[self.station_ids[self.dep_station[base[board]]]]['name'],
+            "to_station": stations[self.station_ids[self.arr_station[base[alight]]]]['name'],
+            "departure": format_clock(dep_time[board]),
+            "arrival": format_clock(arr_time[alight]),
+            "departure_seconds": dep_time[board],
+            "arrival_seconds": arr_time[alight],
+            "dep_order": int(self.dep_order[base[board]]),
+            "arr_order": int(self.arr_order[base[alight]]),
+        }
+
@@ -0,0 +1,123 @@
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import NamedTuple
+
+from db_interface import RouteService
+from services.train_tracker import TrainTracker
+
+logger = logging.getLogger(__name__)
+
+# A snapshot not replaced for this many intervals counts as missing: requests compute positions themselves
+STALE_TICKS = 4
+
+
+class LiveSnapshot(NamedTuple):
+    seq: int
+    calculated_at: datetime | None
+    trains: dict[int, dict]
+
+
+class LivePositionTicker:
+    """
+    Background thread that computes the position of every running trip once per tick
+    and publishes the result as an immutable LiveSnapshot shared by all requests.
+    """
+
+    def __init__(self, session_factory, timetable=None, reachability=None, interval: float = 2.5):
+        self.session_factory = session_factory
+        self.timetable = timetable
+        self.reachability = reachability
+        self.interval = interval
+
+        self._snapshot = LiveSnapshot(0, None, {})
+        self._published = None
+        self._updated = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = None
+        self._listeners = []
+
+    @property
+    def snapshot(self) -> LiveSnapshot:
+        return self._snapshot
+
+    def current(self) -> LiveSnapshot | None:
+        """The latest snapshot, or None before the first tick and once ticks have stopped succeeding."""
+        published = self._published
+        if published is None or time.monotonic() - published > STALE_TICKS * self.interval:
+            return None
+        return self._snapshot
+
+    def add_listener(self, callback) -> None:
+        """`callback(snapshot)` runs on the ticker thread after every published snapshot; keep it cheap."""
+        self._listeners.append(callback)
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name='live-position-ticker', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def tick(self, current_time: datetime | None = None) -> LiveSnapshot:
+        if current_time is None:
+            current_time = datetime.now() - timedelta(hours=1)
+
+        from services.position_engine import PositionEngine  # numpy is imported on first use
+
+        session = self.session_factory()
+        try:
+            service = RouteService(session, timetable=self.timetable, reachability=self.reachability)
+            trips = service.get_running_trips(current_time.date().isoformat())
+            features = self._positions(PositionEngine(service), [t["trip_id"] for t in trips], current_time)
+        finally:
+            session.close()
+
+        trains = {
+            trip["trip_id"]: TrainTracker.build_train_entry(trip, features[trip["trip_id"]])
+            for trip in trips
+            if trip["trip_id"] in features
+        }
+        with self._updated:
+            self._snapshot = LiveSnapshot(self._snapshot.seq + 1, current_time, trains)
+            self._published = time.monotonic()
+            self._updated.notify_all()
+            snapshot = self._snapshot
+        for callback in self._listeners:
+            callback(snapshot)
+        return snapshot
+
+    @staticmethod
+    def _positions(engine, trip_ids: list, current_time: datetime) -> dict[int, dict]:
+        try:
+            return engine.positions(trip_ids, current_time)
+        except Exception:
+            logger.exception("Live positions batch failed, retrying trip by trip")
+
+        # One bad trip must not cost the whole snapshot
+        features, failed = {}, []
+        for trip_id in trip_ids:
+            try:
+                features.update(engine.positions([trip_id], current_time))
+            except Exception:
+                failed.append(trip_id)
+        if failed:
+            logger.warning("Skipped %d trips without a live position: %s", len(failed), failed[:20])
+        return features
+
+    def wait_for_update(self, seq: int, timeout: float | None = None) -> LiveSnapshot:
+        """Blocks until a snapshot newer than `seq` is published (or timeout) and returns the latest one."""
+        with self._updated:
+            self._updated.wait_for(lambda: self._snapshot.seq > seq, timeout)
+            return self._snapshot
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.tick()
+            except Exception:
+                logger.exception("Live position tick failed")
+            self._stop.wait(self.interval)
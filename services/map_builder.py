@@ -1,6 +1,14 @@
-import folium
 import json
-from folium import Element
+import os
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING
+
+from services.geometry import POLYLINE_PRECISION, encode_polyline, zoom_tolerance
+
+# folium pulls in jinja2/branca/requests; it is only imported once a map is actually built
+if TYPE_CHECKING:
+    import folium
 
 
 TILE_THEMES = {
@@ -8,6 +16,13 @@ TILE_THEMES = {
     'light': 'CartoDB positron',
 }
 
+# "geojson" renders stations as one data-driven layer over a cached base document,
+# "folium" builds a fresh folium.Map with one CircleMarker per station
+MAP_RENDER_MODE = os.getenv("MAP_RENDER_MODE", "geojson")
+MAP_CACHE_SIZE = int(os.getenv("MAP_CACHE_SIZE", 256))
+# The selected route is embedded simplified for this zoom; closer in it may be off by a few pixels
+MAP_ROUTE_TOLERANCE = zoom_tolerance(float(os.getenv("MAP_ROUTE_ZOOM", 13)))
+
 STATION_DEFAULTS = {
     'color': '#000000',
     'fill_color': '#f27b21',
@@ -16,12 +31,64 @@ STATION_DEFAULTS = {
 }
 
 
+class RenderCache:
+    """Small thread-safe LRU for rendered map documents."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, key, value) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+
+_base_documents = RenderCache(maxsize=len(TILE_THEMES))
+_rendered_maps = RenderCache(maxsize=MAP_CACHE_SIZE)
+
+
 class MapBuilder:
-    def __init__(self, route_service, map_theme: str = 'dark'):
+    def __init__(self, route_service, map_theme: str = 'dark', render_mode: str = MAP_RENDER_MODE,
+                 data_version: str | None = None):
         self.service = route_service
-        self.tiles = TILE_THEMES.get(map_theme, TILE_THEMES['dark'])
+        # Render cache base; the app passes its current data version so SQL mode is cached too
+        self.data_version = data_version if data_version is not None else route_service.data_version
+        self.theme = map_theme if map_theme in TILE_THEMES else 'dark'
+        self.tiles = TILE_THEMES[self.theme]
+        self.render_mode = render_mode
+
+    def render(self, from_station: str | None, to_station: str | None, time_str: str | None) -> str:
+        """Returns the full HTML document for /api/map."""
+        if self.render_mode == 'folium':
+            return self.build(from_station, to_station, time_str).get_root().render()
+
+        version = self.data_version
+        key = (self.theme, from_station, to_station, version)
+        html = _rendered_maps.get(key) if version else None
+
+        if html is None:
+            html = self._render_geojson(from_station, to_station)
+            if version:
+                _rendered_maps.put(key, html)
+
+        if from_station and to_station:
+            html = self._inject(html, self._live_train_js(from_station, to_station, time_str))
+        return html
+
+    def build(self, from_station: str | None, to_station: str | None, time_str: str | None) -> 'folium.Map':
+        import folium
 
-    def build(self, from_station: str | None, to_station: str | None, time_str: str | None) -> folium.Map:
         m = folium.Map(location=[52.0, 19.0], zoom_start=6, tiles=self.tiles, zoom_control=False)
 
         all_stations = self.service.get_all_stations()
@@ -41,31 +108,50 @@ class MapBuilder:
     # Private helpers
     # ------------------------------------------------------------------
 
-    def _add_route_polyline(self, m: folium.Map, from_station: str, to_station: str) -> None:
-        coords = self.service.get_specific_path(from_station, to_station)
-        if not coords:
+    def _add_route_polyline(self, m: 'folium.Map', from_station: str, to_station: str) -> None:
+        route = self._encoded_route(from_station, to_station)
+        if not route:
             return
+
+        import folium
+
+        # Embedded as encoded polylines instead of a folium.PolyLine full of float pairs
+        m.get_root().html.add_child(folium.Element(f"""
+        <script src="/static/js/polyline.js"></script>
+        <script>
+        document.addEventListener('DOMContentLoaded', function() {{
+            L.polyline(
+                {_safe_json(route)}.map((line) => decodePolyline(line, {POLYLINE_PRECISION})),
+                {{ color: '#00ff00', weight: 4, opacity: 0.9, smoothFactor: 1 }}
+            ).addTo({m.get_name()});
+        }});
+        </script>
+        """))
+
+    def _encoded_route(self, from_station: str, to_station: str) -> list[str]:
+        coords = self.service.get_specific_path(from_station, to_station, MAP_ROUTE_TOLERANCE)
+        if not coords:
+            return []
         if isinstance(coords[0], (float, int)):
-            coords = [coords]
-
-        folium.PolyLine(
-            locations=coords,
-            color='#00ff00',
-            weight=4,
-            opacity=0.9,
-            smooth_factor=1,
-        ).add_to(m)
+            coords = [[coords]]
+        return [encode_polyline(line, POLYLINE_PRECISION) for line in coords]
 
     def _add_live_train_js(
-        self, m: folium.Map, from_station: str, to_station: str, time_str: str | None
+        self, m: 'folium.Map', from_station: str, to_station: str, time_str: str | None
     ) -> None:
-        safe_config = json.dumps({
+        import folium
+
+        m.get_root().html.add_child(folium.Element(self._live_train_js(from_station, to_station, time_str)))
+
+    @staticmethod
+    def _live_train_js(from_station: str, to_station: str, time_str: str | None) -> str:
+        safe_config = _safe_json({
             "fromStation": from_station or "",
             "toStation": to_station or "",
             "fallbackTime": time_str or ""
-        }).replace('<', '\\u003c').replace('>', '\\u003e')
+        })
 
-        js = f"""
+        return f"""
         <script src="/static/js/train_map.js"></script>
         <script>
         document.addEventListener('DOMContentLoaded', function() {{
@@ -73,11 +159,60 @@ class MapBuilder:
         }});
         </script>
         """
-        m.get_root().html.add_child(Element(js))
+
+    # ------------------------------------------------------------------
+    # GeoJSON render mode
+    # ------------------------------------------------------------------
+
+    def _render_geojson(self, from_station: str | None, to_station: str | None) -> str:
+        base_html, map_name = self._base_document()
+
+        overlay = {
+            "fromStation": from_station or "",
+            "toStation": to_station or "",
+            "reachable": [],
+            "route": [],
+            "routePrecision": POLYLINE_PRECISION,
+        }
+        if from_station and not to_station:
+            overlay["reachable"] = self.service.get_reachable_stations(from_station)
+        elif from_station and to_station:
+            overlay["route"] = self._encoded_route(from_station, to_station)
+
+        js = f"""
+        <script>
+            initStationLayer({map_name}, {_safe_json(overlay)});
+        </script>
+        """
+        return self._inject(base_html, js)
+
+    def _base_document(self) -> tuple[str, str]:
+        """Tile layer and station_map.js for this theme; stations are fetched per viewport by the page."""
+        cached = _base_documents.get(self.theme)
+        if cached is not None:
+            return cached
+
+        import folium
+
+        m = folium.Map(location=[52.0, 19.0], zoom_start=6, tiles=self.tiles, zoom_control=False, prefer_canvas=True)
+        js = """
+        <script src="/static/js/polyline.js"></script>
+        <script src="/static/js/station_map.js"></script>
+        """
+        cached = (self._inject(m.get_root().render(), js), m.get_name())
+        _base_documents.put(self.theme, cached)
+        return cached
+
+    @staticmethod
+    def _inject(html: str, fragment: str) -> str:
+        head, sep, tail = html.rpartition('</html>')
+        if not sep:
+            return html + fragment
+        return head + fragment + sep + tail
 
     def _add_station_markers(
         self,
-        m: folium.Map,
+        m: 'folium.Map',
         all_stations: list[dict],
         from_station: str | None,
         to_station: str | None,
@@ -94,12 +229,7 @@ class MapBuilder:
         to_station: str | None,
         reachable_names: list[str],
     ) -> dict:
-        try:
-            platforms = int(st.get('platforms') or 1)
-        except (ValueError, TypeError):
-            platforms = 1
-
-        base_radius = 3 + platforms * 1.5
+        base_radius = MapBuilder._base_radius(st)
         name = st['name']
 
         if not from_station and not to_station:
@@ -122,10 +252,20 @@ class MapBuilder:
                     radius=base_radius, fill_opacity=0.2)
 
     @staticmethod
-    def _place_marker(m: folium.Map, st: dict, style: dict) -> None:
+    def _base_radius(st: dict) -> float:
+        try:
+            platforms = int(st.get('platforms') or 1)
+        except (ValueError, TypeError):
+            platforms = 1
+        return 3 + platforms * 1.5
+
+    @staticmethod
+    def _place_marker(m: 'folium.Map', st: dict, style: dict) -> None:
         lat, lon = st['lat'], st['lon']
         name = st['name']
 
+        import folium
+
         folium.CircleMarker(
             location=[lat, lon],
             radius=style['radius'],
@@ -151,4 +291,9 @@ class MapBuilder:
             }});
         </script>
         """
-        m.get_root().html.add_child(Element(click_js))
+        m.get_root().html.add_child(folium.Element(click_js))
+
+
+def _safe_json(data) -> str:
+    """JSON that is safe to embed inside a <script> block."""
+    return json.dumps(data).replace('<', '\\u003c').replace('>', '\\u003e')
@@ -0,0 +1,137 @@
+from datetime import datetime
+
+import numpy as np
+
+from services.geometry import Polyline
+from services.service_time import DAY_SECONDS, clock_seconds
+
+
+def _located(stop: dict) -> bool:
+    return stop['lat'] is not None and stop['lon'] is not None
+
+
+class PositionEngine:
+    """
+    Computes live positions for many trips at once with NumPy: active segment lookup,
+    elapsed ratio and polyline interpolation run as array operations over all trips.
+
+    Produces the same GeoJSON features as live_trains.calculate_train_position.
+    """
+
+    def __init__(self, route_service):
+        self.service = route_service
+
+    def positions(self, trip_ids, current_time: datetime) -> dict[int, dict]:
+        trip_ids = list(dict.fromkeys(trip_ids))
+        stops_by_trip = self.service.get_trip_stops(trip_ids)
+
+        segments = self._segments(trip_ids, stops_by_trip)
+        if segments is None:
+            return {}
+        seg_trip, seg_dep, seg_arr, dep_s, arr_s = segments
+
+        # Service-day clock, as in service_time.service_clock: today's run, else the tail of yesterday's
+        now_s = clock_seconds(current_time) + current_time.microsecond / 1e6
+        today = (dep_s <= now_s) & (now_s <= arr_s)
+        c_s = np.where(today, now_s, now_s + DAY_SECONDS)
+        active = today | ((dep_s <= c_s) & (c_s <= arr_s))
+
+        active_idx = np.flatnonzero(active)
+        if active_idx.size == 0:
+            return {}
+        _, first = np.unique(seg_trip[active_idx], return_index=True)
+        chosen = active_idx[first]
+
+        elapsed = c_s[chosen] - dep_s[chosen]
+        total = arr_s[chosen] - dep_s[chosen]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratio = np.where(total > 0, np.clip(elapsed / total, 0.0, 1.0), 1.0)
+
+        dep_stops = [seg_dep[i] for i in chosen]
+        arr_stops = [seg_arr[i] for i in chosen]
+        lats, lons = self._interpolate(dep_stops, arr_stops, ratio)
+
+        features = {}
+        for k, i in enumerate(chosen):
+            trip_id = trip_ids[seg_trip[i]]
+            dep_stop, arr_stop = dep_stops[k], arr_stops[k]
+            features[trip_id] = {
+                "type": "Feature",
+                "geometry": {
+                    "type": "Point",
+                    "coordinates": [float(lons[k]), float(lats[k])]
+                },
+                "properties": {
+                    "trip_id": trip_id,
+                    "current_speed_ratio": round(float(ratio[k]), 4),
+                    "next_station": arr_stop['station'],
+                    "next_station_id": arr_stop['station_id'],
+                    "previous_station": dep_stop['station'],
+                    "dep_stop_order": int(dep_stop['order']),
+                    "arr_stop_order": int(arr_stop['order']),
+                    "delay_status": "on_time",
+                    "calculated_at": current_time.strftime('%H:%M:%S')
+                }
+            }
+        return features
+
+    @staticmethod
+    def _segments(trip_ids: list, stops_by_trip: dict):
+        seg_trip, seg_dep, seg_arr, dep_times, arr_times = [], [], [], [], []
+        for t, trip_id in enumerate(trip_ids):
+            stops = stops_by_trip.get(trip_id, [])
+            for dep_stop, arr_stop in zip(stops, stops[1:]):
+                # Unsnapped stations have no coordinates to fall back on; such a segment
+                # has no position rather than failing the whole batch
+                if not (_located(dep_stop) and _located(arr_stop)):
+                    continue
+                seg_trip.append(t)
+                seg_dep.append(dep_stop)
+                seg_arr.append(arr_stop)
+                arrival = arr_stop['arrival'] if arr_stop['arrival'] is not None else arr_stop['departure']
+                dep_times.append(np.nan if dep_stop['departure'] is None else dep_stop['departure'])
+                arr_times.append(np.nan if arrival is None else arrival)
+
+        if not seg_trip:
+            return None
+
+        return (
+            np.asarray(seg_trip, dtype=np.int64), seg_dep, seg_arr,
+            np.asarray(dep_times, dtype=np.float64), np.asarray(arr_times, dtype=np.float64),
+        )
+
+    def _interpolate(self, dep_stops: list, arr_stops: list, ratio: np.ndarray):
+        pairs = [(d['station_id'], a['station_id']) for d, a in zip(dep_stops, arr_stops)]
+        paths = self.service.get_segment_paths(pairs)
+
+        polylines = []
+        for pair, dep_stop, arr_stop in zip(pairs, dep_stops, arr_stops):
+            polyline = paths.get(pair)
+            if polyline is None or len(polyline) < 2:
+                polyline = Polyline([(dep_stop['lat'], dep_stop['lon']), (arr_stop['lat'], arr_stop['lon'])])
+            polylines.append(polyline)
+
+        sizes = np.fromiter((len(p) for p in polylines), dtype=np.int64, count=len(polylines))
+        starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+        cum = np.concatenate([np.frombuffer(p.cumulative, dtype=np.float64) for p in polylines])
+        lat = np.concatenate([np.frombuffer(p.lats, dtype=np.float64) for p in polylines])
+        lon = np.concatenate([np.frombuffer(p.lons, dtype=np.float64) for p in polylines])
+
+        totals = cum[starts + sizes - 1]
+        traveled = ratio * totals
+
+        # Per polyline: first vertex j >= 1 whose cumulative distance reaches `traveled`
+        below = (cum < np.repeat(traveled, sizes)).astype(np.int64)
+        j = np.maximum(np.add.reduceat(below, starts), 1)
+        past_end = j >= sizes
+        j = np.minimum(j, sizes - 1)
+
+        gi = starts + j - 1
+        gj = starts + j
+        dist = cum[gj] - cum[gi]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            seg_ratio = np.where(dist > 0, (traveled - cum[gi]) / dist, 0.0)
+
+        out_lat = np.where(past_end, lat[gj], lat[gi] + (lat[gj] - lat[gi]) * seg_ratio)
+        out_lon = np.where(past_end, lon[gj], lon[gi] + (lon[gj] - lon[gi]) * seg_ratio)
+        return out_lat, out_lon
@@ -0,0 +1,137 @@
+import os
+
+from sqlalchemy import create_engine, text
+
+
+class ReachabilityIndex:
+    """
+    Direct-reachability index: for every origin station a packed bitset over station IDs
+    with bit N set when some trip calls at station N after calling at the origin.
+
+    The bitsets are persisted in the `reachability` table of the same database. SQLite
+    triggers on `route_stops` flag the index as stale, and the next `load` rebuilds it.
+    """
+
+    TABLE = 'reachability'
+    STATE_TABLE = 'reachability_state'
+
+    def __init__(self, bitsets: dict[int, int]):
+        self.bitsets = bitsets
+        self._decoded: dict[int, tuple[int, ...]] = {}
+
+    def reachable_from(self, station_id: int) -> tuple[int, ...]:
+        decoded = self._decoded.get(station_id)
+        if decoded is None:
+            decoded = tuple(self._iter_bits(self.bitsets.get(station_id, 0)))
+            self._decoded[station_id] = decoded
+        return decoded
+
+    def can_reach(self, origin_id: int, station_id: int) -> bool:
+        return bool((self.bitsets.get(origin_id, 0) >> station_id) & 1)
+
+    @staticmethod
+    def _iter_bits(bits: int):
+        while bits:
+            low = bits & -bits
+            yield low.bit_length() - 1
+            bits ^= low
+
+    # ------------------------------------------------------------------
+    # Building and persistence
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def build(cls, conn) -> 'ReachabilityIndex':
+        rows = conn.execute(text("""
+            SELECT trip_id, station_id
+            FROM route_stops
+            WHERE station_id IS NOT NULL
+            ORDER BY trip_id, stop_order
+        """))
+
+        bitsets: dict[int, int] = {}
+
+        def add_trip(station_ids):
+            downstream = 0
+            for station_id in reversed(station_ids):
+                if downstream:
+                    bitsets[station_id] = bitsets.get(station_id, 0) | downstream
+                downstream |= 1 << station_id
+
+        current_trip, trip_stations = None, []
+        for trip_id, station_id in rows:
+            if trip_id != current_trip:
+                add_trip(trip_stations)
+                current_trip, trip_stations = trip_id, []
+            trip_stations.append(station_id)
+        add_trip(trip_stations)
+
+        return cls(bitsets)
+
+    def save(self, conn) -> None:
+        conn.execute(text(f"DELETE FROM {self.TABLE}"))
+        if self.bitsets:
+            conn.execute(
+                text(f"INSERT INTO {self.TABLE} (station_id, bits) VALUES (:station_id, :bits)"),
+                [
+                    {"station_id": station_id, "bits": bits.to_bytes((bits.bit_length() + 7) // 8, 'little')}
+                    for station_id, bits in self.bitsets.items()
+                ],
+            )
+        conn.execute(text(f"UPDATE {self.STATE_TABLE} SET stale = 0"))
+
+    @classmethod
+    def _read(cls, conn) -> 'ReachabilityIndex':
+        rows = conn.execute(text(f"SELECT station_id, bits FROM {cls.TABLE}"))
+        return cls({station_id: int.from_bytes(bits, 'little') for station_id, bits in rows})
+
+    @classmethod
+    def _ensure_schema(cls, conn) -> None:
+        conn.execute(text(f"""
+            CREATE TABLE IF NOT EXISTS {cls.TABLE} (
+                station_id INTEGER PRIMARY KEY,
+                bits BLOB NOT NULL
+            )
+        """))
+        conn.execute(text(f"CREATE TABLE IF NOT EXISTS {cls.STATE_TABLE} (stale INTEGER NOT NULL)"))
+        conn.execute(text(f"""
+            INSERT INTO {cls.STATE_TABLE} (stale)
+            SELECT 1 WHERE NOT EXISTS (SELECT 1 FROM {cls.STATE_TABLE})
+        """))
+        for event in ('INSERT', 'UPDATE', 'DELETE'):
+            conn.execute(text(f"""
+                CREATE TRIGGER IF NOT EXISTS route_stops_{event.lower()}_reachability
+                AFTER {event} ON route_stops
+                BEGIN
+                    UPDATE {cls.STATE_TABLE} SET stale = 1;
+                END
+            """))
+
+    @classmethod
+    def load(cls, engine) -> 'ReachabilityIndex':
+        """Reads the persisted index, rebuilding it first if route_stops changed since the last build."""
+        if engine.dialect.name != 'sqlite':
+            with engine.connect() as conn:
+                return cls.build(conn)
+
+        with engine.begin() as conn:
+            cls._ensure_schema(conn)
+            stale = conn.execute(text(f"SELECT MAX(stale) FROM {cls.STATE_TABLE}")).scalar()
+            if not stale:
+                return cls._read(conn)
+
+            index = cls.build(conn)
+            index.save(conn)
+            return index
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    engine = create_engine(os.getenv("DATABASE_URL"))
+    with engine.begin() as conn:
+        ReachabilityIndex._ensure_schema(conn)
+        index = ReachabilityIndex.build(conn)
+        index.save(conn)
+    print(f"Reachability index built for {len(index.bitsets)} origin stations")
@@ -0,0 +1,67 @@
+from datetime import datetime, time as dt_time
+
+DAY_SECONDS = 24 * 3600
+
+
+def parse_clock(value) -> int | None:
+    """Seconds since midnight for "HH:MM[:SS[.ffffff]]" or a datetime.time; None when missing or invalid."""
+    if value is None or value == '':
+        return None
+    if isinstance(value, dt_time):
+        return value.hour * 3600 + value.minute * 60 + value.second
+    parts = str(value).split(':')
+    if len(parts) not in (2, 3):
+        return None
+    try:
+        hours, minutes = int(parts[0]), int(parts[1])
+        seconds = int(float(parts[2])) if len(parts) == 3 else 0
+    except ValueError:
+        return None
+    return hours * 3600 + minutes * 60 + seconds
+
+
+def normalize_trip_times(stops) -> list[tuple[int | None, int | None]]:
+    """
+    Turns a trip's ordered (arrival, departure) clock times into seconds from the start of
+    the trip's service day: every step back in time is a midnight crossing, so later stops
+    get +24h and the times rise monotonically along the trip.
+    """
+    offset = 0
+    last = None
+    normalized = []
+    for arrival, departure in stops:
+        pair = []
+        for value in (parse_clock(arrival), parse_clock(departure)):
+            if value is None:
+                pair.append(None)
+                continue
+            if last is not None and value + offset < last:
+                offset += DAY_SECONDS
+            last = value + offset
+            pair.append(last)
+        normalized.append((pair[0], pair[1]))
+    return normalized
+
+
+def format_clock(seconds: int | None) -> str | None:
+    """Service-day seconds as the wall-clock "HH:MM:SS" shown to users (26:10 -> "02:10:00")."""
+    if seconds is None:
+        return None
+    seconds = int(seconds) % DAY_SECONDS
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+def clock_seconds(moment: datetime) -> int:
+    return moment.hour * 3600 + moment.minute * 60 + moment.second
+
+
+def service_clock(dep: int, arr: int, now: int) -> int | None:
+    """
+    Position of `now` (seconds since today's midnight) on a segment's service-day clock:
+    either today's service or the tail of yesterday's (now + 24h). None when not between dep and arr.
+    """
+    if dep <= now <= arr:
+        return now
+    if dep <= now + DAY_SECONDS <= arr:
+        return now + DAY_SECONDS
+    return None
@@ -0,0 +1,176 @@
+import json
+import math
+from collections import defaultdict
+
+from sqlalchemy import text
+
+from services.geometry import haversine
+
+
+def check_lat_lon(lat: float, lon: float) -> None:
+    """Raises ValueError unless (lat, lon) is a finite point on the globe; float() happily parses nan and inf."""
+    if not (math.isfinite(lat) and math.isfinite(lon)):
+        raise ValueError("coordinates must be finite numbers")
+    if not (-90.0 <= lat <= 90.0 and -180.0 <= lon <= 180.0):
+        raise ValueError("lat must be within [-90, 90] and lon within [-180, 180]")
+
+
+def parse_bbox(value: str | None) -> tuple[float, float, float, float] | None:
+    """
+    Parses "min_lon,min_lat,max_lon,max_lat" (Leaflet's toBBoxString order).
+    None when no bbox was given, ValueError when it is malformed.
+    """
+    if not value:
+        return None
+    parts = value.split(',')
+    if len(parts) != 4:
+        raise ValueError("bbox must be min_lon,min_lat,max_lon,max_lat")
+    min_lon, min_lat, max_lon, max_lat = (float(v) for v in parts)
+    check_lat_lon(min_lat, min_lon)
+    check_lat_lon(max_lat, max_lon)
+    if min_lon > max_lon or min_lat > max_lat:
+        raise ValueError("bbox minimum is greater than its maximum")
+    return min_lon, min_lat, max_lon, max_lat
+
+
+class SpatialIndex:
+    """
+    Uniform lat/lon grid over station coordinates and `graph` path bounding boxes,
+    answering viewport (bbox) queries and nearest-station lookups without a full scan.
+    """
+
+    def __init__(self, stations, path_bounds: dict, cell_size: float = 0.25):
+        self.cell_size = cell_size
+        self.stations = {st['id']: st for st in stations}
+        self.path_bounds = path_bounds
+
+        self._station_cells = defaultdict(list)
+        for st in self.stations.values():
+            self._station_cells[self._cell(st['lon'], st['lat'])].append(st['id'])
+
+        self._path_cells = defaultdict(list)
+        for pair, bounds in path_bounds.items():
+            for cell in self._cells_in(bounds, clamp=False):
+                self._path_cells[cell].append(pair)
+
+    @classmethod
+    def build(cls, stations, raw_paths: dict, cell_size: float = 0.25) -> 'SpatialIndex':
+        """`stations` are dicts with id/lat/lon, `raw_paths` maps (departure, arrival) to the graph.path value."""
+        path_bounds = {}
+        for pair, raw in raw_paths.items():
+            bounds = cls._path_bounds(raw)
+            if bounds is not None:
+                path_bounds[pair] = bounds
+        located = [st for st in stations if st['lat'] is not None and st['lon'] is not None]
+        return cls(located, path_bounds, cell_size)
+
+    @classmethod
+    def load(cls, engine, cell_size: float = 0.25) -> 'SpatialIndex':
+        with engine.connect() as conn:
+            stations = [dict(r) for r in conn.execute(text("""
+                SELECT id, name, latitude as lat, longitude as lon, platform as platforms, utc_offset
+                FROM stations
+                WHERE latitude IS NOT NULL AND longitude IS NOT NULL
+            """)).mappings()]
+            raw_paths = {}
+            for dep, arr, path in conn.execute(text("""
+                SELECT departure, arrival, path FROM graph
+                WHERE path IS NOT NULL AND path != ''
+                ORDER BY id DESC
+            """)):
+                raw_paths[(dep, arr)] = path
+        return cls.build(stations, raw_paths, cell_size)
+
+    def stations_in_bbox(self, bbox) -> list[dict]:
+        min_lon, min_lat, max_lon, max_lat = bbox
+        found = []
+        for cell in self._cells_in(bbox):
+            for station_id in self._station_cells.get(cell, ()):
+                st = self.stations[station_id]
+                if min_lon <= st['lon'] <= max_lon and min_lat <= st['lat'] <= max_lat:
+                    found.append(st)
+        return found
+
+    def paths_in_bbox(self, bbox) -> list[tuple[int, int]]:
+        min_lon, min_lat, max_lon, max_lat = bbox
+        found = set()
+        for cell in self._cells_in(bbox):
+            for pair in self._path_cells.get(cell, ()):
+                p_min_lon, p_min_lat, p_max_lon, p_max_lat = self.path_bounds[pair]
+                if p_min_lon <= max_lon and p_max_lon >= min_lon and p_min_lat <= max_lat and p_max_lat >= min_lat:
+                    found.add(pair)
+        return sorted(found)
+
+    def nearest_stations(self, lat: float, lon: float, limit: int = 1) -> list[tuple[float, dict]]:
+        """Returns up to `limit` (distance_km, station) pairs, closest first."""
+        if not self.stations:
+            return []
+
+        cx, cy = self._cell(lon, lat)
+        best = []
+        ring = 0
+        max_ring = self._max_ring(cx, cy)
+        while ring <= max_ring:
+            for cell in self._ring(cx, cy, ring):
+                for station_id in self._station_cells.get(cell, ()):
+                    st = self.stations[station_id]
+                    best.append((haversine(lat, lon, st['lat'], st['lon']), st))
+            best.sort(key=lambda item: item[0])
+            del best[limit:]
+
+            # Anything outside the searched rings is at least `ring` cells away
+            if len(best) >= limit and best[-1][0] <= self._ring_reach_km(lat, ring):
+                break
+            ring += 1
+
+        return best
+
+    # ------------------------------------------------------------------
+    # Grid helpers
+    # ------------------------------------------------------------------
+
+    def _cell(self, lon: float, lat: float) -> tuple[int, int]:
+        return math.floor(lon / self.cell_size), math.floor(lat / self.cell_size)
+
+    def _cells_in(self, bbox, clamp: bool = True):
+        min_lon, min_lat, max_lon, max_lat = bbox
+        x0, y0 = self._cell(min_lon, min_lat)
+        x1, y1 = self._cell(max_lon, max_lat)
+        # Huge viewports would enumerate mostly empty cells; only visit the occupied ones
+        if clamp and (x1 - x0 + 1) * (y1 - y0 + 1) > 4 * (len(self._station_cells) + len(self._path_cells)) + 16:
+            occupied = list(self._station_cells) + list(self._path_cells)
+            return [c for c in set(occupied) if x0 <= c[0] <= x1 and y0 <= c[1] <= y1]
+        return [(x, y) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1)]
+
+    @staticmethod
+    def _ring(cx: int, cy: int, ring: int):
+        if ring == 0:
+            return [(cx, cy)]
+        cells = []
+        for dx in range(-ring, ring + 1):
+            cells.append((cx + dx, cy - ring))
+            cells.append((cx + dx, cy + ring))
+        for dy in range(-ring + 1, ring):
+            cells.append((cx - ring, cy + dy))
+            cells.append((cx + ring, cy + dy))
+        return cells
+
+    def _max_ring(self, cx: int, cy: int) -> int:
+        return max(max(abs(x - cx), abs(y - cy)) for x, y in self._station_cells)
+
+    def _ring_reach_km(self, lat: float, ring: int) -> float:
+        # Smallest distance covered by `ring` full cells around the query point (longitude degrees shrink with latitude)
+        degrees = ring * self.cell_size
+        return haversine(lat, 0.0, lat, degrees) if abs(lat) < 89 else 0.0
+
+    @staticmethod
+    def _path_bounds(raw) -> tuple[float, float, float, float] | None:
+        try:
+            coords = json.loads(raw) if isinstance(raw, str) else raw
+        except Exception:
+            return None
+        if not coords:
+            return None
+        lats = [float(p[0]) for p in coords]
+        lons = [float(p[1]) for p in coords]
+        return min(lons), min(lats), max(lons), max(lats)
@@ -0,0 +1,97 @@
+import unicodedata
+from bisect import bisect_left
+from collections import defaultdict
+
+from sqlalchemy import text
+
+# NFKD splits most Polish letters into base + accent; ł has no decomposition
+_FOLD_TABLE = str.maketrans({'ł': 'l', 'Ł': 'l', 'ß': 'ss'})
+
+
+def fold(value: str) -> str:
+    """Lowercase, diacritic-free form used for matching ("Łódź Fabryczna" -> "lodz fabryczna")."""
+    decomposed = unicodedata.normalize('NFKD', value.translate(_FOLD_TABLE))
+    stripped = ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return ' '.join(stripped.casefold().split())
+
+
+def _trigrams(value: str) -> set[str]:
+    padded = f"  {value} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class StationNameIndex:
+    """
+    In-memory station name lookups: exact name -> id for the API endpoints, plus a
+    diacritic-insensitive autocomplete (whole-name prefix, word prefix, then trigram similarity).
+    """
+
+    def __init__(self, stations):
+        self.stations = {st['id']: st for st in stations}
+        self.ids = {st['name']: st['id'] for st in self.stations.values()}
+
+        self._names = sorted((fold(st['name']), st['id']) for st in self.stations.values())
+        self._words = sorted(
+            (word, st['id'])
+            for st in self.stations.values()
+            for word in set(fold(st['name']).replace('-', ' ').split()[1:])
+        )
+        self._trigram_postings = defaultdict(list)
+        for folded, station_id in self._names:
+            for gram in _trigrams(folded):
+                self._trigram_postings[gram].append(station_id)
+
+    @classmethod
+    def load(cls, engine) -> 'StationNameIndex':
+        with engine.connect() as conn:
+            stations = conn.execute(text("""
+                SELECT id, name, latitude as lat, longitude as lon, platform as platforms, utc_offset
+                FROM stations
+                ORDER BY id
+            """)).mappings()
+            return cls([dict(st) for st in stations])
+
+    def lookup(self, name: str | None) -> int | None:
+        return self.ids.get(name) if name else None
+
+    def search(self, query: str, limit: int = 10, station_filter=None) -> list[dict]:
+        """Best `limit` matches; `station_filter(id) -> bool` drops stations before the limit is applied."""
+        q = fold(query or '')
+        if not q:
+            return []
+
+        # Lower rank is better: 0 exact, 1 name prefix, 2 word prefix, 3 fuzzy (trigram)
+        ranked = {}
+
+        def add(station_id, rank, score=0.0):
+            if station_filter is not None and not station_filter(station_id):
+                return
+            key = (rank, -score, self.stations[station_id]['name'])
+            if station_id not in ranked or key < ranked[station_id]:
+                ranked[station_id] = key
+
+        for folded, station_id in self._prefixed(self._names, q):
+            add(station_id, 0 if folded == q else 1)
+        for _, station_id in self._prefixed(self._words, q):
+            add(station_id, 2)
+
+        if len(ranked) < limit and len(q) >= 3:
+            grams = _trigrams(q)
+            counts = defaultdict(int)
+            for gram in grams:
+                for station_id in self._trigram_postings.get(gram, ()):
+                    counts[station_id] += 1
+            for station_id, shared in counts.items():
+                score = shared / len(grams)
+                if score >= 0.5:
+                    add(station_id, 3, score)
+
+        best = sorted(ranked, key=ranked.get)[:limit]
+        return [self.stations[station_id] for station_id in best]
+
+    @staticmethod
+    def _prefixed(entries: list, prefix: str):
+        i = bisect_left(entries, (prefix,))
+        while i < len(entries) and entries[i][0].startswith(prefix):
+            yield entries[i]
+            i += 1
@@ -0,0 +1,173 @@
+import hashlib
+import threading
+import time
+from collections import defaultdict
+from typing import NamedTuple
+
+from sqlalchemy import text
+
+
+class StopTime(NamedTuple):
+    """Arrival/departure are seconds from the start of the trip's service day (monotonic along the trip)."""
+    station_id: int
+    arrival: int | None
+    departure: int | None
+    order: int
+
+
+class Posting(NamedTuple):
+    trip_id: int
+    order: int
+
+
+class TimetableSnapshot:
+    """
+    Read-only copy of the timetable tables (stations, trains, trips, route_stops, graph),
+    loaded once at startup so RouteService can answer requests without touching SQL.
+
+    Nothing in here is ever mutated after `load`; reloading the timetable means building
+    a new snapshot and swapping it in.
+    """
+
+    def __init__(self, stations: dict, trips: dict, trip_stops: dict, postings: dict, paths: dict, version: str):
+        self.version = version
+        self.stations = stations
+        self.trips = trips
+        self.trip_stops = trip_stops
+        self.postings = postings
+        self.paths = paths
+
+        self.station_ids = {st['name']: st['id'] for st in stations.values()}
+        self.located_stations = tuple(
+            st for st in stations.values()
+            if st['lat'] is not None and st['lon'] is not None
+        )
+
+    @classmethod
+    def load(cls, engine) -> 'TimetableSnapshot':
+        # The version is a digest of everything loaded, so it only changes when the data does
+        digest = hashlib.sha1()
+
+        def hashed(rows):
+            for row in rows:
+                digest.update(repr(tuple(row)).encode())
+                yield row
+
+        with engine.connect() as conn:
+            stations = {
+                r['id']: dict(r) for r in hashed(conn.execute(text("""
+                    SELECT id, name, latitude as lat, longitude as lon, platform as platforms, utc_offset
+                    FROM stations
+                    ORDER BY id
+                """)).mappings())
+            }
+
+            trips = {
+                r['trip_id']: dict(r) for r in hashed(conn.execute(text("""
+                    SELECT t.id AS trip_id, t.days_mask, tr.number AS train_number, tr.name AS train_name,
+                           tr.has_wifi, tr.has_air_con, tr.has_restaurant, tr.has_bicycle_holder, tr.is_accessible
+                    FROM trips t
+                    JOIN trains tr ON t.train_id = tr.id
+                    ORDER BY t.id
+                """)).mappings())
+            }
+
+            stops_by_trip = defaultdict(list)
+            postings = defaultdict(list)
+            rows = hashed(conn.execute(text("""
+                SELECT trip_id, station_id, arrival_sec, departure_sec, stop_order
+                FROM route_stops
+                ORDER BY trip_id, stop_order
+            """)))
+            for trip_id, station_id, arrival, departure, order in rows:
+                if station_id not in stations:
+                    continue
+                stops_by_trip[trip_id].append(StopTime(station_id, arrival, departure, order))
+                postings[station_id].append(Posting(trip_id, order))
+
+            paths = {
+                (r[0], r[1]): r[2] for r in hashed(conn.execute(text("""
+                    SELECT departure, arrival, path FROM graph
+                    WHERE path IS NOT NULL AND path != ''
+                    ORDER BY id DESC
+                """)))
+            }
+
+        return cls(
+            stations=stations,
+            trips=trips,
+            trip_stops={trip_id: tuple(stops) for trip_id, stops in stops_by_trip.items()},
+            postings={station_id: tuple(p) for station_id, p in postings.items()},
+            paths=paths,
+            version=digest.hexdigest()[:16],
+        )
+
+    def reachable_station_ids(self, station_id: int) -> set[int]:
+        reachable = set()
+        for trip_id, order in self.postings.get(station_id, ()):
+            for stop in self.trip_stops[trip_id]:
+                if stop.order > order:
+                    reachable.add(stop.station_id)
+        return reachable
+
+    def trips_between(self, dep_id: int, arr_id: int) -> list[tuple[int, int, int]]:
+        """Returns (trip_id, dep_order, arr_order) for every trip calling at dep_id before arr_id."""
+        arr_orders = defaultdict(list)
+        for trip_id, order in self.postings.get(arr_id, ()):
+            arr_orders[trip_id].append(order)
+
+        matches = []
+        for trip_id, dep_order in self.postings.get(dep_id, ()):
+            if trip_id not in self.trips:
+                continue
+            for arr_order in arr_orders.get(trip_id, ()):
+                if dep_order < arr_order:
+                    matches.append((trip_id, dep_order, arr_order))
+        return matches
+
+
+def data_fingerprint(engine) -> str:
+    """
+    Cheap data-version token for SQL mode: row counts, id ranges and text sizes of the
+    timetable tables. Changes on any insert/delete and on edits that alter a value's length.
+    """
+    digest = hashlib.sha1()
+    with engine.connect() as conn:
+        for query in (
+            "SELECT COUNT(*), MAX(id), TOTAL(LENGTH(name) + latitude + longitude) FROM stations",
+            "SELECT COUNT(*), MAX(id), TOTAL(LENGTH(number) + LENGTH(name)) FROM trains",
+            "SELECT COUNT(*), MAX(id), TOTAL(days_mask + train_id) FROM trips",
+            "SELECT COUNT(*), MAX(id), TOTAL(station_id + arrival_sec + departure_sec) FROM route_stops",
+            "SELECT COUNT(*), MAX(id), TOTAL(LENGTH(path)) FROM graph",
+        ):
+            digest.update(repr(tuple(conn.execute(text(query)).one())).encode())
+    return digest.hexdigest()[:16]
+
+
+class DataVersion:
+    """
+    Version token of the data being served, the ETag and render-cache base. A snapshot's version
+    is fixed; in SQL mode data_fingerprint is re-read at most once per `ttl` seconds, so an import
+    is picked up without a restart.
+    """
+
+    def __init__(self, engine=None, ttl: float = 5.0, version: str | None = None):
+        self.engine = engine
+        self.ttl = ttl
+        self._version = version
+        self._checked = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def fixed(cls, version: str) -> 'DataVersion':
+        return cls(version=version)
+
+    def current(self) -> str | None:
+        if self.engine is None or (self._checked is not None and time.monotonic() - self._checked < self.ttl):
+            return self._version
+        with self._lock:
+            # Another request may have refreshed it while we waited
+            if self._checked is None or time.monotonic() - self._checked >= self.ttl:
+                self._version = data_fingerprint(self.engine)
+                self._checked = time.monotonic()
+            return self._version
@@ -1,5 +1,4 @@
-from datetime import timedelta
-from live_trains import calculate_train_position, parse_time
+from services.service_time import clock_seconds, service_clock
 
 
 class TrainTracker:
@@ -10,56 +9,45 @@ class TrainTracker:
 
     def get_active_trains(self, from_station: str, to_station: str, time_str: str | None, date_str: str | None = None) -> list[dict]:
         trips = self.service.get_route_between(from_station, to_station, date_str)
-        active_trains = []
-
-        for trip in trips:
-            train_data = self._process_trip(trip, time_str)
-            if train_data:
-                active_trains.append(train_data)
-
-        return active_trains
-
-    def _process_trip(self, trip: dict, time_str: str | None) -> dict | None:
-        dep_order = int(trip["dep_order"])
-        arr_order = int(trip["arr_order"])
-        trip_id = trip["trip_id"]
-
-        dep_stop = next((s for s in trip["route"] if s["order"] == dep_order), None)
-        arr_stop = next((s for s in trip["route"] if s["order"] == arr_order), None)
+        trips = [trip for trip in trips if self._is_on_selected_leg(trip)]
 
-        if not dep_stop or not arr_stop:
-            return None
+        from services.position_engine import PositionEngine  # numpy is imported on first use
 
-        t_dep = parse_time(dep_stop["departure"] or dep_stop["arrival"])
-        t_arr = parse_time(arr_stop["arrival"] or arr_stop["departure"])
+        features = PositionEngine(self.service).positions([trip["trip_id"] for trip in trips], self.current_time)
 
-        if not t_dep or not t_arr:
-            return None
-
-        if t_arr < t_dep:
-            t_arr += timedelta(days=1)
-
-        current = self.current_time
-        if current < t_dep and (t_dep - current).total_seconds() > 12 * 3600:
-            current += timedelta(days=1)
+        active_trains = []
+        for trip in trips:
+            feature = features.get(trip["trip_id"])
+            if feature:
+                active_trains.append(self.build_train_entry(trip, feature))
 
-        if not (t_dep <= current <= t_arr):
-            return None
+        return active_trains
 
-        return self._build_train_entry(trip, trip_id, time_str)
+    def select_from_snapshot(self, trains: dict[int, dict], trips: list[dict]) -> list[dict]:
+        """
+        Same result as get_active_trains, but picks precomputed entries out of a live snapshot.
+        `trips` is the get_route_between result for the selected route.
+        """
+        return [
+            trains[trip["trip_id"]] for trip in trips
+            if trip["trip_id"] in trains and self._is_on_selected_leg(trip)
+        ]
+
+    def _is_on_selected_leg(self, trip: dict) -> bool:
+        t_dep = trip.get("departure_seconds")
+        t_arr = trip.get("arrival_seconds")
+        if t_dep is None or t_arr is None:
+            return False
+        return service_clock(t_dep, t_arr, clock_seconds(self.current_time)) is not None
 
     @staticmethod
-    def _build_train_entry(trip: dict, trip_id: int, time_str: str | None) -> dict | None:
-        feature = calculate_train_position(trip_id, current_time_str=time_str)
-        if not feature:
-            return None
-
+    def build_train_entry(trip: dict, feature: dict) -> dict:
         props = feature["properties"]
         lat = feature["geometry"]["coordinates"][1]
         lon = feature["geometry"]["coordinates"][0]
 
         return {
-            "trip_id": trip_id,
+            "trip_id": trip["trip_id"],
             "train_number": trip["train_number"],
             "lat": lat,
             "lon": lon,
@@ -1,6 +1,3 @@
-let ALL_STATIONS = [];
-let REACHABLE_FROM = [];
-
 function escapeHTML(str) {
     if (str === null || str === undefined) return '';
     return String(str)
@@ -12,11 +9,6 @@ function escapeHTML(str) {
 }
 
 document.addEventListener('DOMContentLoaded', () => {
-    fetch('/api/stations')
-        .then(res => res.json())
-        .then(stations => { ALL_STATIONS = stations; })
-        .catch(err => console.error("Error loading stations:", err));
-
     const themeToggler = document.getElementById('theme-toggler');
     const sunIcon = document.getElementById('sun-icon');
     const moonIcon = document.getElementById('moon-icon');
@@ -67,14 +59,6 @@ document.addEventListener('DOMContentLoaded', () => {
     updateClearBtnVisibility(inputFrom, clearFromBtn);
     updateClearBtnVisibility(inputTo, clearToBtn);
 
-    function fetchReachable(stationName) {
-        if (!stationName) { REACHABLE_FROM = []; return; }
-        fetch(`/api/reachable?name=${encodeURIComponent(stationName)}`)
-            .then(res => res.json())
-            .then(names => { REACHABLE_FROM = names; })
-            .catch(() => { REACHABLE_FROM = []; });
-    }
-
     function getPolandTime() {
         return new Date(new Date().toLocaleString('en-US', { timeZone: 'Europe/Warsaw' }));
     }
@@ -87,7 +71,6 @@ document.addEventListener('DOMContentLoaded', () => {
             inputTo.value = temp;
             updateClearBtnVisibility(inputFrom, clearFromBtn);
             updateClearBtnVisibility(inputTo, clearToBtn);
-            fetchReachable(inputFrom.value);
             updateMap();
         });
 
@@ -97,7 +80,6 @@ document.addEventListener('DOMContentLoaded', () => {
         inputFrom.addEventListener('input', () => updateClearBtnVisibility(inputFrom, clearFromBtn));
         clearFromBtn.addEventListener('click', () => {
             inputFrom.value = '';
-            REACHABLE_FROM = [];
             updateClearBtnVisibility(inputFrom, clearFromBtn);
             updateMap();
         });
@@ -149,39 +131,56 @@ document.addEventListener('DOMContentLoaded', () => {
 
     if (timeInput) timeInput.addEventListener('change', () => { window.isLiveMode = false; });
 
-    function setupAutocomplete(inputElement, listElement, isFromInput, getSource) {
+    function setupAutocomplete(inputElement, listElement, isFromInput, extraParams) {
         if (!inputElement || !listElement) return;
 
-        inputElement.addEventListener('input', (e) => {
-            const val = e.target.value.toLowerCase();
-            listElement.innerHTML = '';
+        let debounceTimer = null;
+        let requestSeq = 0;
 
-            if (!val) {
+        function renderMatches(matches) {
+            listElement.innerHTML = '';
+            if (matches.length === 0) {
                 listElement.classList.remove('active');
                 return;
             }
 
-            const source = getSource ? getSource() : ALL_STATIONS;
-            const matches = source.filter(st => st.name.toLowerCase().includes(val)).slice(0, 7);
-
-            if (matches.length > 0) {
-                listElement.classList.add('active');
-                matches.forEach(match => {
-                    const item = document.createElement('div');
-                    item.className = 'autocomplete-item';
-                    item.textContent = match.name;
-                    item.addEventListener('click', () => {
-                        inputElement.value = match.name;
-                        listElement.classList.remove('active');
-                        updateClearBtnVisibility(inputElement, isFromInput ? clearFromBtn : clearToBtn);
-                        if (isFromInput) fetchReachable(match.name);
-                        updateMap();
-                    });
-                    listElement.appendChild(item);
+            listElement.classList.add('active');
+            matches.forEach(match => {
+                const item = document.createElement('div');
+                item.className = 'autocomplete-item';
+                item.textContent = match.name;
+                item.addEventListener('click', () => {
+                    inputElement.value = match.name;
+                    listElement.classList.remove('active');
+                    updateClearBtnVisibility(inputElement, isFromInput ? clearFromBtn : clearToBtn);
+                    updateMap();
                 });
-            } else {
-                listElement.classList.remove('active');
+                listElement.appendChild(item);
+            });
+        }
+
+        inputElement.addEventListener('input', (e) => {
+            const val = e.target.value.trim();
+            clearTimeout(debounceTimer);
+
+            if (!val) {
+                requestSeq++;
+                renderMatches([]);
+                return;
             }
+
+            // Пошук на сервері (без урахування діакритики: "Lodz" знаходить "Łódź")
+            debounceTimer = setTimeout(() => {
+                const seq = ++requestSeq;
+                const extra = extraParams ? extraParams() : '';
+                fetch(`/api/stations/search?q=${encodeURIComponent(val)}&limit=7${extra}`)
+                    .then(res => res.json())
+                    .then(stations => {
+                        if (seq !== requestSeq) return;
+                        renderMatches(stations);
+                    })
+                    .catch(err => console.error("Error searching stations:", err));
+            }, 120);
         });
 
         document.addEventListener('click', (e) => {
@@ -191,13 +190,10 @@ document.addEventListener('DOMContentLoaded', () => {
         });
     }
 
-    setupAutocomplete(inputFrom, document.getElementById('from-autocomplete'), true, () => ALL_STATIONS);
-    setupAutocomplete(inputTo, document.getElementById('to-autocomplete'), false, () => {
-        if (inputFrom.value && REACHABLE_FROM.length > 0) {
-            return ALL_STATIONS.filter(st => REACHABLE_FROM.includes(st.name));
-        }
-        return ALL_STATIONS;
-    });
+    setupAutocomplete(inputFrom, document.getElementById('from-autocomplete'), true, null);
+    // Сервер сам відфільтровує станції, досяжні з пункту відправлення
+    setupAutocomplete(inputTo, document.getElementById('to-autocomplete'), false, () =>
+        inputFrom.value ? `&from_station=${encodeURIComponent(inputFrom.value)}` : '');
 
     const clockElement = document.getElementById('digital-clock');
     if (clockElement) {
@@ -216,7 +212,6 @@ document.addEventListener('DOMContentLoaded', () => {
                 inputTo.value = '';
                 updateClearBtnVisibility(inputFrom, clearFromBtn);
                 updateClearBtnVisibility(inputTo, clearToBtn);
-                fetchReachable(stationName);
                 updateMap();
             } else {
                 inputTo.value = stationName;
@@ -269,7 +264,7 @@ document.addEventListener('DOMContentLoaded', () => {
                     resultsList.innerHTML = '';
 
                     if (!trains || trains.length === 0) {
-                        resultsList.innerHTML = '<div style="color:var(--text-secondary); padding: 10px;">Прямих поїздів не знайдено.</div>';
+                        showJourneys(resultsList, fromVal, toVal, dateVal, timeVal);
                         return;
                     }
 
@@ -323,6 +318,63 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     }
 
+    function showJourneys(resultsList, fromVal, toVal, dateVal, timeVal) {
+        // Прямих поїздів немає - шукаємо маршрути з пересадками
+        let journeysUrl = `/api/journeys?from_station=${encodeURIComponent(fromVal)}&to_station=${encodeURIComponent(toVal)}`;
+        if (dateVal) journeysUrl += `&date=${encodeURIComponent(dateVal)}`;
+        if (timeVal) journeysUrl += `&time=${encodeURIComponent(timeVal)}`;
+
+        fetch(journeysUrl)
+            .then(res => res.json())
+            .then(journeys => {
+                if (!journeys || journeys.length === 0) {
+                    resultsList.innerHTML = '<div style="color:var(--text-secondary); padding: 10px;">Прямих поїздів не знайдено.</div>';
+                    return;
+                }
+
+                resultsList.innerHTML = '<div style="color:var(--text-secondary); padding: 10px;">Прямих поїздів не знайдено. Маршрути з пересадками:</div>';
+
+                journeys.forEach(journey => {
+                    const first = journey.legs[0];
+                    const last = journey.legs[journey.legs.length - 1];
+                    const dayBadge = journey.arrival_day_offset > 0 ? `<span class="tz-badge">+${journey.arrival_day_offset}</span>` : '';
+                    const transfersLabel = journey.transfers === 0 ? 'Без пересадок' : `Пересадок: ${journey.transfers}`;
+
+                    const legsHtml = journey.legs.map(leg => `
+                        <div class="train-name">
+                            ${escapeHTML(leg.train_number || 'Поїзд')}: ${escapeHTML(leg.from_station)} ${leg.departure.slice(0, 5)}
+                            ➔ ${escapeHTML(leg.to_station)} ${leg.arrival.slice(0, 5)}
+                        </div>
+                    `).join('');
+
+                    const card = document.createElement('div');
+                    card.className = 'train-card';
+                    card.innerHTML = `
+                        <div class="train-card-header">
+                            <span class="train-number">${transfersLabel}</span>
+                            ${legsHtml}
+                        </div>
+                        <div class="train-route-info">
+                            <div class="route-point">
+                                <span class="route-time">${journey.departure.slice(0, 5)}</span>
+                                <span class="route-station" title="${escapeHTML(first.from_station)}">${escapeHTML(first.from_station)}</span>
+                            </div>
+                            <div class="route-arrow">➔</div>
+                            <div class="route-point" style="text-align: right;">
+                                <span class="route-time">${journey.arrival.slice(0, 5)}</span>${dayBadge}
+                                <span class="route-station" title="${escapeHTML(last.to_station)}">${escapeHTML(last.to_station)}</span>
+                            </div>
+                        </div>
+                    `;
+                    resultsList.appendChild(card);
+                });
+            })
+            .catch(err => {
+                console.error('Error fetching journeys:', err);
+                resultsList.innerHTML = '<div style="color:var(--text-secondary); padding: 10px;">Прямих поїздів не знайдено.</div>';
+            });
+    }
+
     function showTrainDetails(trip) {
         if (!trainDetailsContent || !rightSidebar) return;
 
@@ -0,0 +1,28 @@
+// Decoder for the Google encoded-polyline strings returned with format=polyline
+// (services/geometry.py encode_polyline). Returns [[lat, lon], ...] ready for L.polyline.
+function decodePolyline(encoded, precision = 5) {
+  const factor = Math.pow(10, precision);
+  const coords = [];
+  let index = 0;
+  let lat = 0;
+  let lon = 0;
+
+  function nextDelta() {
+    let result = 0;
+    let shift = 0;
+    let byte;
+    do {
+      byte = encoded.charCodeAt(index++) - 63;
+      result |= (byte & 0x1f) << shift;
+      shift += 5;
+    } while (byte >= 0x20);
+    return result & 1 ? ~(result >> 1) : result >> 1;
+  }
+
+  while (index < encoded.length) {
+    lat += nextDelta();
+    lon += nextDelta();
+    coords.push([lat / factor, lon / factor]);
+  }
+  return coords;
+}
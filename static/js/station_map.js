@@ -0,0 +1,84 @@
+// Data-driven station layer for the cached /api/map document: stations live in one
+// GeoJSON layer with a single delegated click handler instead of one marker + script each,
+// and only the stations inside the current viewport are fetched from /api/stations/bbox.
+function initStationLayer(map, overlay) {
+  const { fromStation, toStation, reachable, route, routePrecision } = overlay;
+  const reachableNames = new Set(reachable || []);
+
+  function stationStyle(props) {
+    const radius = props.radius;
+    const name = props.name;
+
+    if (!fromStation && !toStation) {
+      return { color: '#000000', fillColor: '#f27b21', weight: 1.5, radius: radius, fillOpacity: 1.0 };
+    }
+    if (name === fromStation) {
+      return { color: '#f27b21', fillColor: '#f27b21', weight: 3.0, radius: radius * 1.4, fillOpacity: 1.0 };
+    }
+    if (name === toStation) {
+      return { color: '#00ff00', fillColor: '#00ff00', weight: 3.0, radius: radius * 1.4, fillOpacity: 1.0 };
+    }
+    if (!toStation && reachableNames.has(name)) {
+      return { color: '#000000', fillColor: '#f27b21', weight: 1.5, radius: radius, fillOpacity: 1.0 };
+    }
+    return { color: '#000000', fillColor: '#f27b21', weight: 1.0, radius: radius, fillOpacity: 0.2 };
+  }
+
+  if (route && route.length) {
+    // One encoded polyline per track segment (polyline.js)
+    L.polyline(route.map((line) => decodePolyline(line, routePrecision)), { color: '#00ff00', weight: 4, opacity: 0.9, smoothFactor: 1 }).addTo(map);
+  }
+
+  const layer = L.geoJSON(null, {
+    pointToLayer: (feature, latLng) => {
+      const style = stationStyle(feature.properties);
+      return L.circleMarker(latLng, Object.assign({ opacity: style.fillOpacity }, style));
+    },
+  }).addTo(map);
+
+  layer.bindTooltip((marker) => marker.feature.properties.name);
+  layer.on('click', (e) => {
+    window.parent.postMessage({ type: 'station_clicked', name: e.layer.feature.properties.name }, '*');
+  });
+
+  const loadedIds = new Set();
+
+  function stationRadius(st) {
+    const platforms = parseInt(st.platforms, 10);
+    return 3 + (platforms || 1) * 1.5;
+  }
+
+  function loadVisibleStations() {
+    // The padded viewport can run past the poles and the antimeridian when zoomed out
+    const bounds = map.getBounds().pad(0.25);
+    const bbox = [
+      Math.max(bounds.getWest(), -180), Math.max(bounds.getSouth(), -90),
+      Math.min(bounds.getEast(), 180), Math.min(bounds.getNorth(), 90),
+    ].join(',');
+
+    fetch(`/api/stations/bbox?bbox=${encodeURIComponent(bbox)}`)
+      .then((res) => {
+        if (!res.ok) throw new Error(`HTTP ${res.status}`);
+        return res.json();
+      })
+      .then((stations) => {
+        const features = stations
+          .filter((st) => !loadedIds.has(st.id))
+          .map((st) => {
+            loadedIds.add(st.id);
+            return {
+              type: 'Feature',
+              geometry: { type: 'Point', coordinates: [st.lon, st.lat] },
+              properties: { name: st.name, radius: stationRadius(st) },
+            };
+          });
+        if (features.length) layer.addData(features);
+      })
+      .catch((err) => console.error('Error loading stations layer:', err));
+  }
+
+  map.on('moveend', loadVisibleStations);
+  loadVisibleStations();
+
+  return layer;
+}
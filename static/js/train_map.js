@@ -14,6 +14,9 @@ function initTrainMap(config) {
   /** @type {Object.<number, L.Marker>} */
   const trainMarkers = {};
 
+  let pollTimer = null;
+  let stream = null;
+
   function fetchAndUpdateTrains() {
     const endpoint = buildEndpoint(fromStation, toStation, fallbackTime);
 
@@ -24,46 +27,106 @@ function initTrainMap(config) {
       });
   }
 
+  function startPolling() {
+    if (pollTimer) return;
+    setTimeout(fetchAndUpdateTrains, 500);
+    pollTimer = setInterval(fetchAndUpdateTrains, 2500);
+  }
+
+  // Live mode subscribes once to /api/live/stream and applies deltas;
+  // a picked time, a missing EventSource or a closed stream fall back to polling.
+  function startStream() {
+    if (!window.EventSource || !isLiveMode()) return false;
+
+    stream = new EventSource(`/api/live/stream?${buildRouteParams(fromStation, toStation)}`);
+
+    stream.addEventListener('full', (e) => {
+      if (leaveStreamIfNotLive()) return;
+      updateMarkers(JSON.parse(e.data));
+    });
+
+    stream.addEventListener('delta', (e) => {
+      if (leaveStreamIfNotLive()) return;
+      const delta = JSON.parse(e.data);
+      delta.removed.forEach(removeMarker);
+      delta.added.forEach(upsertMarker);
+      delta.changed.forEach(upsertMarker);
+    });
+
+    stream.onerror = () => {
+      if (stream.readyState === EventSource.CLOSED) {
+        stream = null;
+        startPolling();
+      }
+    };
+    return true;
+  }
+
+  function leaveStreamIfNotLive() {
+    if (isLiveMode()) return false;
+    stream.close();
+    stream = null;
+    startPolling();
+    return true;
+  }
+
+  function isLiveMode() {
+    return !(window.parent && window.parent.isLiveMode === false);
+  }
+
   function updateMarkers(trains) {
     const activeTripIds = new Set(trains.map((t) => t.trip_id));
 
     for (const tid in trainMarkers) {
       if (!activeTripIds.has(parseInt(tid))) {
-        map.removeLayer(trainMarkers[tid]);
-        delete trainMarkers[tid];
+        removeMarker(tid);
       }
     }
 
-    trains.forEach((train) => {
-      const latLng = [train.lat, train.lon];
-      const popup = buildPopup(train);
-
-      if (trainMarkers[train.trip_id]) {
-        trainMarkers[train.trip_id].setLatLng(latLng);
-        trainMarkers[train.trip_id].getPopup().setContent(popup);
-      } else {
-        trainMarkers[train.trip_id] = L.marker(latLng, { icon: trainIcon })
-          .bindPopup(popup)
-          .addTo(map);
-      }
-    });
+    trains.forEach(upsertMarker);
+  }
+
+  function upsertMarker(train) {
+    const latLng = [train.lat, train.lon];
+    const popup = buildPopup(train);
+
+    if (trainMarkers[train.trip_id]) {
+      trainMarkers[train.trip_id].setLatLng(latLng);
+      trainMarkers[train.trip_id].getPopup().setContent(popup);
+    } else {
+      trainMarkers[train.trip_id] = L.marker(latLng, { icon: trainIcon })
+        .bindPopup(popup)
+        .addTo(map);
+    }
+  }
+
+  function removeMarker(tripId) {
+    if (!trainMarkers[tripId]) return;
+    map.removeLayer(trainMarkers[tripId]);
+    delete trainMarkers[tripId];
   }
 
   function buildEndpoint(from, to, fallback) {
-    let url = `/api/train_positions?from_station=${encodeURIComponent(from)}&to_station=${encodeURIComponent(to)}`;
+    let url = `/api/train_positions?${buildRouteParams(from, to)}`;
 
-    if (window.parent && window.parent.isLiveMode === false) {
+    if (!isLiveMode()) {
       const parentInput = window.parent.document.getElementById('time-input');
       let timeParam = parentInput ? parentInput.value : fallback;
       if (timeParam && timeParam.length === 5) timeParam += ':00';
       if (timeParam) url += `&time=${encodeURIComponent(timeParam)}`;
     }
 
+    return url;
+  }
+
+  function buildRouteParams(from, to) {
+    let params = `from_station=${encodeURIComponent(from)}&to_station=${encodeURIComponent(to)}`;
+
     const dateInput = window.parent && window.parent.document.getElementById('date-input');
     const dateParam = dateInput ? dateInput.value : null;
-    if (dateParam) url += `&date=${encodeURIComponent(dateParam)}`;
+    if (dateParam) params += `&date=${encodeURIComponent(dateParam)}`;
 
-    return url;
+    return params;
   }
 
   function buildPopup(train) {
@@ -87,8 +150,7 @@ function initTrainMap(config) {
   map.on('zoomstart', disableTransitions);
   map.on('zoomend', enableTransitions);
 
-  setTimeout(fetchAndUpdateTrains, 500);
-  setInterval(fetchAndUpdateTrains, 2500);
+  if (!startStream()) startPolling();
 }
 function findLeafletMap() {
   for (const key in window) {
@@ -0,0 +1,183 @@
+"""
+Builds the `graph` table (track geometry between adjacent stations) from an OSM rail export.
+
+    python -m tools.build_geometry --osm poland.json              # only new or moved segments
+    python -m tools.build_geometry --osm poland.json --full       # reroute everything
+    python -m tools.build_geometry --osm poland.json --workers 8 --batch 1000
+
+Adjacent pairs come from route_stops. A segment is routed again when it has no stored path
+or when the coordinates of one of its stations changed since it was built (graph.source_key).
+Routing is spread over a process pool and results are written in batched transactions.
+Uses DATABASE_URL.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+from sqlalchemy import create_engine, text
+
+from tools.migrate import LATEST_VERSION, current_version, segment_source_key
+from tools.rail_graph import GraphLoader
+
+# The loader a pool worker routes with: inherited on fork, loaded by the initializer otherwise
+_loader = None
+
+
+def adjacent_pairs(conn) -> set[tuple[int, int]]:
+    rows = conn.execute(text("""
+        SELECT DISTINCT station_id, next_station_id
+        FROM (
+            SELECT station_id, LEAD(station_id) OVER (PARTITION BY trip_id ORDER BY stop_order) AS next_station_id
+            FROM route_stops
+        )
+        WHERE next_station_id IS NOT NULL AND next_station_id != station_id
+    """))
+    return {(row[0], row[1]) for row in rows}
+
+
+def load_stations(conn) -> dict[int, dict]:
+    rows = conn.execute(text("SELECT id, name, latitude AS lat, longitude AS lon FROM stations")).mappings()
+    return {row["id"]: dict(row) for row in rows}
+
+
+def pending_pairs(conn, stations: dict[int, dict], full: bool = False) -> list[tuple[int, int, str]]:
+    """(departure, arrival, source_key) of every adjacent pair that has to be routed."""
+    stored = {} if full else {
+        (row[0], row[1]): row[2]
+        for row in conn.execute(text("SELECT departure, arrival, source_key FROM graph WHERE path IS NOT NULL"))
+    }
+    pending = []
+    for dep_id, arr_id in sorted(adjacent_pairs(conn)):
+        if dep_id not in stations or arr_id not in stations:
+            continue
+        key = segment_source_key(stations[dep_id], stations[arr_id])
+        if stored.get((dep_id, arr_id)) != key:
+            pending.append((dep_id, arr_id, key))
+    return pending
+
+
+def build_loader(osm_file: str, stations: dict[int, dict]) -> GraphLoader:
+    loader = GraphLoader()
+    loader.load_data(osm_file)
+    loader.load_stations(stations.values())
+    loader.snap_stations()
+    return loader
+
+
+def _init_worker(osm_file, stations):
+    global _loader
+    if _loader is None:
+        _loader = build_loader(osm_file, stations)
+
+
+def _route(pair):
+    dep_id, arr_id, key = pair
+    path = _loader.find_path(dep_id, arr_id)
+    if not path:
+        return dep_id, arr_id, key, None
+    return dep_id, arr_id, key, json.dumps([[float(lat), float(lon)] for lat, lon in path])
+
+
+def write_batch(engine, batch: list[tuple]) -> None:
+    if not batch:
+        return
+    with engine.begin() as conn:
+        conn.execute(text("""
+            INSERT INTO graph (departure, arrival, path, source_key)
+            VALUES (:departure, :arrival, :path, :source_key)
+            ON CONFLICT (departure, arrival) DO UPDATE SET path = excluded.path, source_key = excluded.source_key
+        """), [
+            {"departure": dep_id, "arrival": arr_id, "path": path, "source_key": key}
+            for dep_id, arr_id, key, path in batch
+        ])
+
+
+class Progress:
+    def __init__(self, total: int, every: float = 5.0):
+        self.total = total
+        self.every = every
+        self.done = 0
+        self.missing = 0
+        self.started = time.perf_counter()
+        self._last_report = self.started
+
+    def update(self, count: int, missing: int) -> None:
+        self.done += count
+        self.missing += missing
+        now = time.perf_counter()
+        if now - self._last_report >= self.every or self.done == self.total:
+            self._last_report = now
+            self.report(now)
+
+    def report(self, now: float) -> None:
+        elapsed = now - self.started
+        rate = self.done / elapsed if elapsed else 0.0
+        eta = (self.total - self.done) / rate if rate else 0.0
+        print(
+            f"  {self.done}/{self.total} segments ({self.done / self.total:.1%}), "
+            f"{rate:.1f} segments/s, {self.missing} without path, ETA {eta:.0f}s"
+        )
+
+
+def build(engine, osm_file: str, workers: int, batch_size: int, full: bool = False) -> Progress:
+    global _loader
+
+    with engine.connect() as conn:
+        stations = load_stations(conn)
+        pending = pending_pairs(conn, stations, full=full)
+
+    progress = Progress(len(pending))
+    if not pending:
+        print("graph is up to date")
+        return progress
+    print(f"{len(pending)} segments to route with {workers} workers")
+
+    started = time.perf_counter()
+    _loader = build_loader(osm_file, stations)
+    print(f"rail graph ready in {time.perf_counter() - started:.1f}s")
+
+    # fork shares the loaded graph with the workers instead of parsing the export once per process
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+    chunksize = max(1, min(64, len(pending) // (workers * 8) or 1))
+
+    batch = []
+    with context.Pool(workers, initializer=_init_worker, initargs=(osm_file, stations)) as pool:
+        for result in pool.imap_unordered(_route, pending, chunksize=chunksize):
+            batch.append(result)
+            if len(batch) >= batch_size:
+                write_batch(engine, [r for r in batch if r[3] is not None])
+                progress.update(len(batch), sum(1 for r in batch if r[3] is None))
+                batch = []
+    if batch:
+        write_batch(engine, [r for r in batch if r[3] is not None])
+        progress.update(len(batch), sum(1 for r in batch if r[3] is None))
+    return progress
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--osm', default='poland.json', help='Overpass JSON export with railway ways')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--batch', type=int, default=500, help='segments per write transaction')
+    parser.add_argument('--full', action='store_true', help='reroute every segment, not only new or moved ones')
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    engine = create_engine(os.getenv("DATABASE_URL"))
+    with engine.connect() as conn:
+        if current_version(conn) < LATEST_VERSION:
+            sys.exit(f"schema version {current_version(conn)} < {LATEST_VERSION}, run `python -m tools.migrate upgrade` first")
+
+    progress = build(engine, args.osm, args.workers, max(1, args.batch), full=args.full)
+    elapsed = time.perf_counter() - progress.started
+    print(f"routed {progress.done} segments in {elapsed:.1f}s, {progress.missing} without path")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,260 @@
+"""
+Imports stations and train timetables from the scraper's JSON files in one transaction.
+
+    python -m tools.import_timetable --stations railway_stations.json --structure structure.json
+    python -m tools.import_timetable --structure structure.json          # timetables only
+
+Replaces the row-by-row loaders in old_files/SQL_fill.py. Station and train names are resolved
+from in-memory maps and every table is written with executemany. Re-importing is an upsert:
+stations are matched by name, trains by number, each train keeps its trip, and the trip's
+route_stops are replaced. A structure file is the whole timetable: trains missing from it are
+deleted with their trips and stops, unless --keep-missing is given for a partial import.
+Stations are never deleted. Uses DATABASE_URL.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+from sqlalchemy import bindparam, create_engine, text
+
+from tools.migrate import LATEST_VERSION, current_version, fill_service_seconds
+
+# Ids per DELETE ... WHERE id IN (...), below SQLite's bound-parameter limit
+DELETE_CHUNK = 500
+
+
+def _clock(value: str | None) -> str | None:
+    # "HH:MM" from the scraper -> the TIME format SQLAlchemy stores in SQLite
+    if not value:
+        return None
+    hours, minutes = value.split(":")[:2]
+    return f"{int(hours):02d}:{int(minutes):02d}:00.000000"
+
+
+def _name_map(conn, query: str) -> dict[str, int]:
+    # Lowest id wins for duplicated names, the same row the old `.first()` lookups returned
+    ids = {}
+    for row_id, name in conn.execute(text(query)):
+        ids.setdefault(name, row_id)
+    return ids
+
+
+class ImportStats:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.rows = {}
+        self.removed = {}
+        self.skipped_stops = 0
+        self.unknown_stations = set()
+
+    def count(self, table: str, rows: int) -> None:
+        self.rows[table] = self.rows.get(table, 0) + rows
+
+    def report(self) -> None:
+        elapsed = time.perf_counter() - self.started
+        total = sum(self.rows.values())
+        for table, rows in self.rows.items():
+            print(f"  {table}: {rows} rows")
+        if any(self.removed.values()):
+            print("  removed " + ", ".join(f"{rows} {table}" for table, rows in self.removed.items()))
+        if self.skipped_stops:
+            print(f"  skipped {self.skipped_stops} stops at {len(self.unknown_stations)} unknown stations")
+        rate = total / elapsed if elapsed else 0.0
+        print(f"wrote {total} rows in {elapsed:.2f}s ({rate:.0f} rows/s)")
+
+
+def upsert_stations(conn, stations: dict, stats: ImportStats) -> dict[str, int]:
+    """Station name -> id after the import."""
+    ids = _name_map(conn, "SELECT id, name FROM stations ORDER BY id")
+    updates, inserts = [], []
+    for name, info in stations.items():
+        row = {
+            "name": name,
+            "platform": info.get("platforms", 1),
+            # A few scraped stations lack coordinates; they stay unsnapped until fixed
+            "latitude": info.get("lat"),
+            "longitude": info.get("lon"),
+            "utc_offset": info.get("utc", 1),
+        }
+        if name in ids:
+            updates.append({**row, "id": ids[name]})
+        else:
+            inserts.append(row)
+
+    if updates:
+        conn.execute(text("""
+            UPDATE stations SET platform = :platform, latitude = :latitude, longitude = :longitude, utc_offset = :utc_offset
+            WHERE id = :id
+        """), updates)
+    if inserts:
+        conn.execute(text("""
+            INSERT INTO stations (name, platform, latitude, longitude, utc_offset)
+            VALUES (:name, :platform, :latitude, :longitude, :utc_offset)
+        """), inserts)
+        ids = _name_map(conn, "SELECT id, name FROM stations ORDER BY id")
+    stats.count("stations", len(updates) + len(inserts))
+    return ids
+
+
+def upsert_trains(conn, structure: dict, stats: ImportStats) -> dict[str, int]:
+    """Train number -> id after the import."""
+    ids = _name_map(conn, "SELECT id, number FROM trains ORDER BY id")
+    updates, inserts = [], []
+    for number, info in structure.items():
+        row = {
+            "number": number,
+            "name": info.get("name"),
+            "has_wifi": bool(info.get("has_wifi", False)),
+            "has_air_con": bool(info.get("has_AC", False)),
+            "has_restaurant": bool(info.get("has_restaurant", False)),
+            "has_bicycle_holder": bool(info.get("has_bicycle", False)),
+            "is_accessible": bool(info.get("accessible", False)),
+        }
+        if number in ids:
+            updates.append({**row, "id": ids[number]})
+        else:
+            inserts.append(row)
+
+    if updates:
+        conn.execute(text("""
+            UPDATE trains SET name = :name, has_wifi = :has_wifi, has_air_con = :has_air_con,
+                has_restaurant = :has_restaurant, has_bicycle_holder = :has_bicycle_holder, is_accessible = :is_accessible
+            WHERE id = :id
+        """), updates)
+    if inserts:
+        conn.execute(text("""
+            INSERT INTO trains (number, name, has_wifi, has_air_con, has_restaurant, has_bicycle_holder, is_accessible)
+            VALUES (:number, :name, :has_wifi, :has_air_con, :has_restaurant, :has_bicycle_holder, :is_accessible)
+        """), inserts)
+        ids = _name_map(conn, "SELECT id, number FROM trains ORDER BY id")
+    stats.count("trains", len(updates) + len(inserts))
+    return ids
+
+
+def upsert_trips(conn, structure: dict, train_ids: dict[str, int], stats: ImportStats) -> dict[str, int]:
+    """Train number -> id of its trip. A train keeps its first trip, so trip ids survive a re-import."""
+    query = "SELECT MIN(id), train_id FROM trips GROUP BY train_id"
+    trip_of_train = {train_id: trip_id for trip_id, train_id in conn.execute(text(query))}
+    updates, inserts = [], []
+    for number, info in structure.items():
+        train_id = train_ids[number]
+        row = {"train_id": train_id, "days_mask": info.get("day_mask", 127)}
+        if train_id in trip_of_train:
+            updates.append({**row, "id": trip_of_train[train_id]})
+        else:
+            inserts.append(row)
+
+    if updates:
+        conn.execute(text("UPDATE trips SET days_mask = :days_mask WHERE id = :id"), updates)
+    if inserts:
+        conn.execute(text("INSERT INTO trips (train_id, days_mask) VALUES (:train_id, :days_mask)"), inserts)
+        trip_of_train = {train_id: trip_id for trip_id, train_id in conn.execute(text(query))}
+    stats.count("trips", len(updates) + len(inserts))
+    return {number: trip_of_train[train_ids[number]] for number in structure}
+
+
+def replace_route_stops(conn, structure: dict, trip_ids: dict[str, int], station_ids: dict[str, int],
+                        stats: ImportStats) -> None:
+    rows = []
+    for number, info in structure.items():
+        trip_id = trip_ids[number]
+        stops = info.get("stations", [])
+        total = len(stops)
+        for stop in stops:
+            station_id = station_ids.get(stop.get("stationName"))
+            if station_id is None:
+                stats.skipped_stops += 1
+                stats.unknown_stations.add(stop.get("stationName"))
+                continue
+            order = stop.get("orderNumber")
+            # The first stop only departs, the last one only arrives
+            arrival = None if order == 1 else _clock(stop.get("arrivalTime"))
+            departure = None if order == total else _clock(stop.get("departureTime"))
+            rows.append({
+                "trip_id": trip_id,
+                "station_id": station_id,
+                "arrival_time": arrival,
+                "departure_time": departure,
+                "stop_order": order,
+            })
+
+    _delete_in(conn, "route_stops", "trip_id", list(trip_ids.values()))
+    if rows:
+        conn.execute(text("""
+            INSERT INTO route_stops (trip_id, station_id, arrival_time, departure_time, stop_order)
+            VALUES (:trip_id, :station_id, :arrival_time, :departure_time, :stop_order)
+        """), rows)
+    stats.count("route_stops", len(rows))
+
+
+def remove_missing(conn, structure: dict, trip_ids: dict[str, int], stats: ImportStats) -> None:
+    """Deletes trains missing from the structure and every trip other than an imported train's, with their stops."""
+    kept_trips = set(trip_ids.values())
+    stale_trips = [row[0] for row in conn.execute(text("SELECT id FROM trips")) if row[0] not in kept_trips]
+    stale_trains = [row[0] for row in conn.execute(text("SELECT id, number FROM trains")) if row[1] not in structure]
+    stats.removed["route_stops"] = _delete_in(conn, "route_stops", "trip_id", stale_trips)
+    stats.removed["trips"] = _delete_in(conn, "trips", "id", stale_trips)
+    stats.removed["trains"] = _delete_in(conn, "trains", "id", stale_trains)
+
+
+def _delete_in(conn, table: str, column: str, ids: list[int]) -> int:
+    delete = text(f"DELETE FROM {table} WHERE {column} IN :ids").bindparams(bindparam("ids", expanding=True))
+    deleted = 0
+    for start in range(0, len(ids), DELETE_CHUNK):
+        deleted += conn.execute(delete, {"ids": ids[start:start + DELETE_CHUNK]}).rowcount
+    return deleted
+
+
+def import_timetable(engine, stations: dict | None, structure: dict | None, keep_missing: bool = False) -> ImportStats:
+    stats = ImportStats()
+    with engine.begin() as conn:
+        if stations:
+            station_ids = upsert_stations(conn, stations, stats)
+        else:
+            station_ids = _name_map(conn, "SELECT id, name FROM stations ORDER BY id")
+
+        if structure:
+            train_ids = upsert_trains(conn, structure, stats)
+            trip_ids = upsert_trips(conn, structure, train_ids, stats)
+            replace_route_stops(conn, structure, trip_ids, station_ids, stats)
+            if not keep_missing:
+                remove_missing(conn, structure, trip_ids, stats)
+            fill_service_seconds(conn, set(trip_ids.values()))
+    return stats
+
+
+def _load_json(path: str | None) -> dict | None:
+    if not path:
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--stations', help='{name: {lat, lon, platforms, utc}} JSON')
+    parser.add_argument('--structure', help='{train number: {name, flags, day_mask, stations: [...]}} JSON')
+    parser.add_argument('--keep-missing', action='store_true',
+                        help='partial import: keep trains that are not in the structure file')
+    args = parser.parse_args()
+    if not args.stations and not args.structure:
+        parser.error("nothing to import, pass --stations and/or --structure")
+
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    engine = create_engine(os.getenv("DATABASE_URL"))
+    with engine.connect() as conn:
+        if current_version(conn) < LATEST_VERSION:
+            sys.exit(f"schema version {current_version(conn)} < {LATEST_VERSION}, run `python -m tools.migrate upgrade` first")
+
+    stats = import_timetable(engine, _load_json(args.stations), _load_json(args.structure), args.keep_missing)
+    stats.report()
+    if args.structure:
+        print("run `python -m tools.build_geometry` to route new station pairs")
+
+
+if __name__ == '__main__':
+    main()
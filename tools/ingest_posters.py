@@ -0,0 +1,276 @@
+"""
+Parses a directory of PKP station departure posters into one structure.json for tools.import_timetable.
+
+    python -m tools.ingest_posters posters/ --stations railway_stations.json --out structure.json
+    python -m tools.ingest_posters posters/ --workers 16 --records records.jsonl
+    python -m tools.ingest_posters --merge-only --records records.jsonl --out structure.json
+
+Every page of every `Plakat_*_Odjazdy_*.pdf` is parsed on a process pool (the parsing rules are
+the ones from old_files/parse_trips/ok_parser.py). Each train found on a page is streamed to a
+JSONL records file as soon as its page is done, so a long run can be re-merged without
+re-parsing. A train shows up on the poster of every station it calls at; the merge keeps the
+record with the longest route, which is the one from its origin station. Needs pdfplumber.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import re
+import sys
+import time
+import unicodedata
+
+POSTER_PATTERN = re.compile(r"^Plakat_\d{4}_(?P<station>.+?)_(?P<kind>Odjazdy|Przyjazdy)_", re.IGNORECASE)
+
+START_BLOCK_PATTERN = re.compile(r"(?m)^(\d{1,2}:\d{2})(?:\s+\d)?")
+TRAIN_ID_PATTERN = re.compile(r"\b(\d{4,5})\b")
+ROUTE_PATTERN = re.compile(r"([^\d,;]+?)\s+(\d{1,2}:\d{2})")
+
+IGNORED_TRAIN_NAMES = [
+    "WAWEL", "NIEDŹWIADEK", "ZEFIR", "SAN", "RZESZOWIANIN", "WYCZÓŁKOWSKI",
+    "VIA REGIA", "KOSSAK", "CRACOVIA", "GALICJA", "SZKUNER", "MATEJKO",
+    "FAŁAT", "SIEMIRADZKI", "WYSPIAŃSKI", "WITOS", "GROTTGER", "CARPATIA",
+    "URSA", "UZNAM", "PRZEMYŚLANIN", "PODHALANIN", "ŚLĄZAK", "MEHOFFER",
+    "ROZEWIE", "ARTUS", "PIAST", "GÓRSKI", "LWOVIANIN", "HETMAN", "ZAMOYSKI",
+    "MIESZKO", "ŁOKIETEK", "DANUBIUS", "LUBOMIRSKI", "ODRA", "PORTA MORAVICA",
+    "REGIOJET", "ROZTOCZE", "SKARBEK", "MALCZEWSKI", "BIEBRZA",
+    "ANIN", "KARPATY"
+]
+
+# One pass over the name instead of a re.sub per train name; longest first so "VIA REGIA" wins over its parts
+IGNORED_NAMES_PATTERN = re.compile(
+    r"\b(?:" + "|".join(re.escape(name) for name in sorted(IGNORED_TRAIN_NAMES, key=len, reverse=True)) + r")\b",
+    re.IGNORECASE,
+)
+
+SPACED_CAPS_PATTERN = re.compile(r"\b(?:[A-ZŚĆŻŹŁÓŃĘĄV]\s+){3,}[A-ZŚĆŻŹŁÓŃĘĄV]\b")
+CATEGORY_PREFIX_PATTERN = re.compile(r"^(?:IC|PR|MP|RJ|RP|TLK|EIC|RegioJet)\b\s*[-–]?\s*", re.IGNORECASE)
+LEADING_DASH_PATTERN = re.compile(r"^[-–]\s*")
+SYMBOLS_PATTERN = re.compile(r"[@+/~]")
+# Pictogram codes of the poster font (wifi, bicycle, restaurant, ...)
+FORBIDDEN_CODES_PATTERN = re.compile(r"\b(?:b|x|R|y|a|G|I|e|k|h|T|l|d|c|Z|M|W|0|g)\b")
+DATE_RANGE_PATTERN = re.compile(r"(\d{1,2}\s*[IVX]+[-\s]+\d{1,2}\s*[IVX]+)")
+
+MASK_PATTERNS = [
+    (re.compile(pattern), mask, pattern.replace(r"\b", "").replace(r"\(", "").replace(r"\)", ""))
+    for pattern, mask in (
+        (r"\b1-5\b", 31), (r"\b1-6\b", 63), (r"\b6-7\b", 96), (r"\b1-7\b", 127),
+        (r"\b\(D\)", 31), (r"\b\(C\)", 96), (r"\b7\b", 64), (r"\b6\b", 32),
+        (r"codziennie", 127),
+    )
+]
+
+NOT_A_STATION = ("godzina", "peron", "tor", "odjazdu", "przyjazdu")
+
+# Per worker: the poster whose pages it is currently parsing, kept open between pages
+_open_poster = None
+
+
+def clean_station_name(raw_name: str) -> str:
+    name = raw_name.strip()
+    name = SPACED_CAPS_PATTERN.sub("", name)
+    name = IGNORED_NAMES_PATTERN.sub("", name)
+    name = CATEGORY_PREFIX_PATTERN.sub("", name)
+    name = LEADING_DASH_PATTERN.sub("", name)
+    name = SYMBOLS_PATTERN.sub(" ", name)
+    name = FORBIDDEN_CODES_PATTERN.sub(" ", name)
+    name = " ".join(name.split())
+    if name.isupper() and len(name) > 3:
+        return ""
+    if len(name) < 2:
+        return ""
+    return name
+
+
+def parse_day_mask(text_block: str) -> tuple[int, str]:
+    mask, period = 127, "codziennie"
+    for pattern, value, label in MASK_PATTERNS:
+        if pattern.search(text_block):
+            mask, period = value, label
+            break
+    date_match = DATE_RANGE_PATTERN.search(text_block)
+    if date_match:
+        period = date_match.group(1)
+    return mask, period
+
+
+def parse_amenities(text_block: str) -> dict:
+    lowered = text_block.lower()
+    amenities = {
+        "has_wifi": "@" in text_block,
+        "has_AC": "y" in text_block,
+        "has_bicycle": "b" in text_block,
+        "accessible": "&" in text_block or " G " in text_block or " a " in text_block or "wózk" in lowered,
+        "has_restaurant": "e" in text_block or " I " in text_block or "x" in lowered or "bistro" in lowered,
+    }
+    if "IC" in text_block:
+        amenities["has_wifi"] = True
+        amenities["has_AC"] = True
+    return amenities
+
+
+def parse_block(block_text: str, departure_time: str, station_name: str) -> tuple[str, dict]:
+    id_match = TRAIN_ID_PATTERN.search(block_text)
+    train_id = id_match.group(1) if id_match else f"UNK_{departure_time.replace(':', '')}"
+
+    stations = [{"stationName": station_name, "orderNumber": 1, "departureTime": departure_time}]
+    order = 2
+    for match in ROUTE_PATTERN.finditer(block_text.replace("\n", " ")):
+        name, arrival = clean_station_name(match.group(1)), match.group(2)
+        if not name:
+            continue
+        if arrival == departure_time and order == 2:
+            continue
+        lowered = name.lower()
+        if any(word in lowered for word in NOT_A_STATION):
+            continue
+        stations.append({"stationName": name, "orderNumber": order, "arrivalTime": arrival})
+        order += 1
+
+    mask, _ = parse_day_mask(block_text)
+    return train_id, {**parse_amenities(block_text), "day_mask": mask, "stations": stations}
+
+
+def parse_page_text(text: str, station_name: str) -> list[tuple[str, dict]]:
+    """(train number, record) of every departure block on one poster page."""
+    trains = []
+    starts = list(START_BLOCK_PATTERN.finditer(text or ""))
+    for idx, match in enumerate(starts):
+        end = starts[idx + 1].start() if idx + 1 < len(starts) else len(text)
+        train_id, record = parse_block(text[match.start():end], match.group(1), station_name)
+        if len(record["stations"]) > 1:
+            trains.append((train_id, record))
+    return trains
+
+
+# ----------------------------------------------------------------------
+# Posters
+# ----------------------------------------------------------------------
+
+def fold_name(name: str) -> str:
+    # "PRZEMYSL_GLOWNY" and "Przemyśl Główny" fold to the same key
+    name = name.lower().replace("ł", "l")
+    name = "".join(ch for ch in unicodedata.normalize("NFKD", name) if not unicodedata.combining(ch))
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", name).split())
+
+
+def find_posters(directory: str, known_stations: dict[str, str]) -> list[tuple[str, str]]:
+    """(path, station name) of every departure poster; arrival posters repeat the same trains."""
+    posters = []
+    for filename in sorted(os.listdir(directory)):
+        match = POSTER_PATTERN.match(filename)
+        if not filename.lower().endswith(".pdf") or match is None:
+            continue
+        if match.group("kind").lower() != "odjazdy":
+            continue
+        key = fold_name(match.group("station"))
+        station = known_stations.get(key)
+        if station is None:
+            station = key.title()
+            print(f"  {filename}: station {station!r} is not in the stations file")
+        posters.append((os.path.join(directory, filename), station))
+    return posters
+
+
+def _page_count(path: str) -> int:
+    import pdfplumber
+
+    with pdfplumber.open(path) as pdf:
+        return len(pdf.pages)
+
+
+def _parse_page(task):
+    global _open_poster
+    import pdfplumber
+
+    path, station, page_number = task
+    if _open_poster is None or _open_poster[0] != path:
+        if _open_poster is not None:
+            _open_poster[1].close()
+        _open_poster = (path, pdfplumber.open(path))
+    page = _open_poster[1].pages[page_number]
+    try:
+        return path, page_number, parse_page_text(page.extract_text(), station)
+    finally:
+        # pdfplumber caches every parsed object on the page; drop them before the next one
+        page.close()
+
+
+def parse_posters(posters: list[tuple[str, str]], records_file: str, workers: int) -> int:
+    """Parses all pages into records_file (one JSON object per train and page); returns the number of records."""
+    with multiprocessing.Pool(workers) as pool:
+        counts = pool.map(_page_count, [path for path, _ in posters])
+    tasks = [(path, station, page) for (path, station), count in zip(posters, counts) for page in range(count)]
+    print(f"{len(posters)} posters, {len(tasks)} pages, {workers} workers")
+
+    started = time.perf_counter()
+    records = 0
+    # Pages of one poster stay together so a worker reopens a PDF as rarely as possible
+    chunksize = max(1, min(16, len(tasks) // (workers * 4) or 1))
+    with open(records_file, "w", encoding="utf-8") as out, multiprocessing.Pool(workers) as pool:
+        for done, (path, page_number, trains) in enumerate(pool.imap_unordered(_parse_page, tasks, chunksize), 1):
+            poster = os.path.basename(path)
+            for train_id, record in trains:
+                out.write(json.dumps({"train": train_id, "poster": poster, "page": page_number, **record},
+                                     ensure_ascii=False) + "\n")
+            records += len(trains)
+            if done % 200 == 0 or done == len(tasks):
+                elapsed = time.perf_counter() - started
+                print(f"  {done}/{len(tasks)} pages, {records} trains, {done / elapsed:.1f} pages/s")
+    return records
+
+
+def merge_records(records_file: str) -> dict:
+    """structure.json content: per train, the record with the most stops (ties go to the first poster by name)."""
+    merged = {}
+    best = {}
+    with open(records_file, "r", encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            train_id = record.pop("train")
+            # Records arrive in pool order; poster and page break ties so the merge is deterministic
+            key = (-len(record["stations"]), record.pop("poster"), record.pop("page"))
+            if train_id not in best or key < best[train_id]:
+                best[train_id] = key
+                merged[train_id] = record
+    return dict(sorted(merged.items()))
+
+
+def load_station_names(stations_file: str | None) -> dict[str, str]:
+    if not stations_file:
+        return {}
+    with open(stations_file, "r", encoding="utf-8") as f:
+        return {fold_name(name): name for name in json.load(f)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('directory', nargs='?', help='directory with Plakat_*.pdf posters')
+    parser.add_argument('--stations', help='railway_stations.json, to spell poster station names like the database')
+    parser.add_argument('--out', default='structure.json')
+    parser.add_argument('--records', help='per-train JSONL stream (default: <out>.records.jsonl)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--merge-only', action='store_true', help='merge an existing records file without parsing')
+    args = parser.parse_args()
+    records_file = args.records or f"{args.out}.records.jsonl"
+
+    started = time.perf_counter()
+    if not args.merge_only:
+        if not args.directory:
+            parser.error("a poster directory is required unless --merge-only is given")
+        posters = find_posters(args.directory, load_station_names(args.stations))
+        if not posters:
+            sys.exit(f"no departure posters in {args.directory}")
+        records = parse_posters(posters, records_file, max(1, args.workers))
+        print(f"parsed {records} train records into {records_file}")
+
+    structure = merge_records(records_file)
+    tmp_file = f"{args.out}.tmp"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump(structure, f, indent=4, ensure_ascii=False)
+    os.replace(tmp_file, args.out)
+    print(f"wrote {len(structure)} trains to {args.out} in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
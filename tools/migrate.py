@@ -0,0 +1,247 @@
+"""
+Versioned schema migrations for the EuroTicket SQLite database.
+
+    python -m tools.migrate status    # current and latest schema version
+    python -m tools.migrate upgrade   # apply pending migrations
+    python -m tools.migrate check     # EXPLAIN QUERY PLAN of the hot queries, fails on full scans
+
+The schema version is kept in SQLite's `PRAGMA user_version`. Uses DATABASE_URL.
+"""
+import argparse
+import os
+import sys
+
+from sqlalchemy import bindparam, create_engine, event, text
+
+from services.service_time import normalize_trip_times
+
+
+def _integer_stop_order(conn):
+    # Older imports stored stop_order as text, which forced CAST(...) in every comparison
+    conn.execute(text("""
+        UPDATE route_stops SET stop_order = CAST(stop_order AS INTEGER)
+        WHERE typeof(stop_order) != 'integer' AND stop_order IS NOT NULL
+    """))
+
+
+def _route_stop_indexes(conn):
+    # (station_id, trip_id, stop_order) serves "trips calling at X"; (trip_id, stop_order) walks a trip in order.
+    # Both make the old single-column indexes redundant.
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_route_stops_station_trip_order ON route_stops (station_id, trip_id, stop_order)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_route_stops_trip_order ON route_stops (trip_id, stop_order)"))
+    conn.execute(text("DROP INDEX IF EXISTS ix_route_stops_trip_id"))
+    conn.execute(text("DROP INDEX IF EXISTS ix_route_stops_station_id"))
+
+
+def _unique_graph_segments(conn):
+    # Keep one row per (departure, arrival): the lowest id that has geometry, or the lowest id
+    # when none of the duplicates has a path
+    conn.execute(text("""
+        DELETE FROM graph
+        WHERE id NOT IN (
+            SELECT COALESCE(
+                MIN(CASE WHEN path IS NOT NULL AND TRIM(path) NOT IN ('', '[]', 'null') THEN id END),
+                MIN(id)
+            )
+            FROM graph GROUP BY departure, arrival
+        )
+    """))
+    conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS ux_graph_departure_arrival ON graph (departure, arrival)"))
+
+
+def _service_day_seconds(conn):
+    conn.execute(text("ALTER TABLE route_stops ADD COLUMN arrival_sec INTEGER"))
+    conn.execute(text("ALTER TABLE route_stops ADD COLUMN departure_sec INTEGER"))
+    fill_service_seconds(conn)
+
+
+def segment_source_key(departure: dict, arrival: dict) -> str:
+    """
+    What a stored graph path was routed from: the coordinates of both stations.
+    A segment whose key no longer matches its stations has to be routed again.
+    """
+    def point(st):
+        return "" if st["lat"] is None or st["lon"] is None else f"{st['lat']:.7f},{st['lon']:.7f}"
+
+    return f"{point(departure)}>{point(arrival)}"
+
+
+def _graph_source_keys(conn):
+    # Existing paths are taken as routed from the stations' current coordinates
+    conn.execute(text("ALTER TABLE graph ADD COLUMN source_key TEXT"))
+    rows = conn.execute(text("""
+        SELECT g.id, d.latitude, d.longitude, a.latitude, a.longitude
+        FROM graph g
+        JOIN stations d ON d.id = g.departure
+        JOIN stations a ON a.id = g.arrival
+    """)).all()
+    updates = [
+        {"id": row[0], "source_key": segment_source_key({"lat": row[1], "lon": row[2]}, {"lat": row[3], "lon": row[4]})}
+        for row in rows
+    ]
+    if updates:
+        conn.execute(text("UPDATE graph SET source_key = :source_key WHERE id = :id"), updates)
+
+
+def fill_service_seconds(conn, trip_ids=None) -> int:
+    """
+    Recomputes route_stops.arrival_sec/departure_sec (seconds from the start of the trip's
+    service day, monotonic along the trip) from the clock times. Importers call this for the
+    trips they wrote; None means every trip. Returns the number of updated rows.
+    """
+    query = "SELECT id, trip_id, arrival_time, departure_time FROM route_stops"
+    if trip_ids is not None:
+        trip_ids = list(trip_ids)
+        if not trip_ids:
+            return 0
+        statement = text(query + " WHERE trip_id IN :trip_ids ORDER BY trip_id, stop_order").bindparams(
+            bindparam("trip_ids", expanding=True))
+        rows = conn.execute(statement, {"trip_ids": trip_ids})
+    else:
+        rows = conn.execute(text(query + " ORDER BY trip_id, stop_order"))
+
+    updates = []
+
+    def flush_trip(stops):
+        for (stop_id, _, _), (arrival, departure) in zip(stops, normalize_trip_times((a, d) for _, a, d in stops)):
+            updates.append({"id": stop_id, "arrival_sec": arrival, "departure_sec": departure})
+
+    current_trip, stops = None, []
+    for stop_id, trip_id, arrival, departure in rows:
+        if trip_id != current_trip:
+            flush_trip(stops)
+            current_trip, stops = trip_id, []
+        stops.append((stop_id, arrival, departure))
+    flush_trip(stops)
+
+    if updates:
+        conn.execute(
+            text("UPDATE route_stops SET arrival_sec = :arrival_sec, departure_sec = :departure_sec WHERE id = :id"),
+            updates,
+        )
+    return len(updates)
+
+
+# Append only: the position in this list (1-based) is the schema version it produces
+MIGRATIONS = [
+    _integer_stop_order,
+    _route_stop_indexes,
+    _unique_graph_segments,
+    _service_day_seconds,
+    _graph_source_keys,
+]
+
+LATEST_VERSION = len(MIGRATIONS)
+
+
+def current_version(conn) -> int:
+    return conn.execute(text("PRAGMA user_version")).scalar()
+
+
+def upgrade(engine) -> list[int]:
+    applied = []
+    with engine.begin() as conn:
+        version = current_version(conn)
+        for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+            migration(conn)
+            conn.execute(text(f"PRAGMA user_version = {number}"))
+            applied.append(number)
+        if applied:
+            conn.execute(text("ANALYZE"))
+    return applied
+
+
+# ----------------------------------------------------------------------
+# Query-plan check
+# ----------------------------------------------------------------------
+
+# Tables that must never be scanned in full by a request-path query
+HOT_TABLES = ('route_stops', 'graph')
+
+
+def capture_hot_queries(engine) -> list[tuple[str, object]]:
+    """Runs the SQL-mode RouteService paths once and records every statement they execute."""
+    from sqlalchemy.orm import sessionmaker
+
+    from db_interface import RouteService
+    from services.geometry import geometry_store
+
+    with engine.connect() as conn:
+        names = [r[0] for r in conn.execute(text("""
+            SELECT s.name FROM stations s
+            JOIN route_stops rs ON rs.station_id = s.id
+            GROUP BY s.id ORDER BY COUNT(*) DESC LIMIT 2
+        """))]
+    if len(names) < 2:
+        return []
+
+    captured = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            captured.append((statement, parameters))
+
+    session = sessionmaker(bind=engine)()
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        geometry_store.clear()
+        service = RouteService(session)
+        service.get_reachable_stations(names[0])
+        service.get_reachable_paths(names[0])
+        service.get_route_between(names[0], names[1])
+        service.get_specific_path(names[0], names[1])
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+        session.close()
+        geometry_store.clear()
+    return captured
+
+
+def check_plans(engine) -> list[str]:
+    failures = []
+    with engine.connect() as conn:
+        raw = conn.connection.driver_connection
+        for statement, parameters in capture_hot_queries(engine):
+            plan = [row[3] for row in raw.execute(f"EXPLAIN QUERY PLAN {statement}", parameters)]
+            scans = [
+                step for step in plan
+                if step.startswith('SCAN') and step.split()[1] in HOT_TABLES and 'USING' not in step
+            ]
+            print(' '.join(statement.split())[:110])
+            for step in plan:
+                print(f"    {'FULL SCAN ' if step in scans else ''}{step}")
+            if scans:
+                failures.append(statement)
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('command', choices=('status', 'upgrade', 'check'))
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    engine = create_engine(os.getenv("DATABASE_URL"))
+
+    if args.command == 'status':
+        with engine.connect() as conn:
+            print(f"schema version {current_version(conn)} (latest {LATEST_VERSION})")
+
+    elif args.command == 'upgrade':
+        applied = upgrade(engine)
+        print(f"applied migrations {applied}" if applied else "schema is up to date")
+
+    else:
+        with engine.connect() as conn:
+            if current_version(conn) < LATEST_VERSION:
+                sys.exit(f"schema version {current_version(conn)} < {LATEST_VERSION}, run upgrade first")
+        failures = check_plans(engine)
+        if failures:
+            sys.exit(f"{len(failures)} hot queries fall back to a full scan")
+        print("all hot queries use indexes")
+
+
+if __name__ == '__main__':
+    main()
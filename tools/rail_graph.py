@@ -0,0 +1,224 @@
+"""
+Rail network from an Overpass/OSM JSON export, with stations snapped to it and
+shortest-path routing between them. Used by tools/build_geometry.py.
+
+The network is kept in CSR form (node coordinates, int32 adjacency, float32 weights) and
+cached next to the export as `<export>.npz`, so only the first build pays for the ijson pass.
+"""
+import heapq
+import math
+import os
+
+import numpy as np
+
+# Bumped whenever the cached arrays change meaning
+CACHE_FORMAT = 1
+
+# Snapping grid cell in degrees; must be larger than the snapping distance
+SNAP_CELL = 0.05
+
+
+def iter_railway_ways(osm_file: str):
+    """Point lists [(lat, lon), ...] of every railway way in the export, streamed."""
+    import ijson
+
+    count = 0
+    with open(osm_file, 'rb') as f:
+        for el in ijson.items(f, 'elements.item'):
+            if el.get("type") != "way" or "geometry" not in el or "railway" not in el.get("tags", {}):
+                continue
+            yield [(float(pt["lat"]), float(pt["lon"])) for pt in el["geometry"]]
+            count += 1
+            if count % 5000 == 0:
+                print(f"  Processed {count} ways...")
+
+
+class RailGraph:
+    """Undirected rail network: node i is at nodes[i], its neighbours are indices[indptr[i]:indptr[i + 1]]."""
+
+    def __init__(self, nodes: np.ndarray, indptr: np.ndarray, indices: np.ndarray, weights: np.ndarray):
+        self.nodes = nodes
+        self.indptr = indptr
+        self.indices = indices
+        self.weights = weights
+
+    @property
+    def node_count(self) -> int:
+        return len(self.nodes)
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.indices) // 2
+
+    @classmethod
+    def from_ways(cls, ways) -> 'RailGraph':
+        coords = []
+        way_ends = []
+        total = 0
+        for points in ways:
+            if len(points) < 2:
+                continue
+            coords.append(np.asarray(points, dtype=np.float64))
+            total += len(points)
+            way_ends.append(total)
+        if not coords:
+            return cls(np.empty((0, 2)), np.zeros(1, np.int64), np.empty(0, np.int32), np.empty(0, np.float32))
+
+        # Ways share nodes by exact coordinates, like the (lat, lon) keys of the old networkx graph
+        nodes, node_of = np.unique(np.concatenate(coords), axis=0, return_inverse=True)
+        node_of = node_of.reshape(-1).astype(np.int32)
+
+        # Consecutive points of one way are an edge; the last point of a way is not linked to the next way
+        linked = np.ones(total - 1, dtype=bool)
+        linked[np.array(way_ends[:-1], dtype=np.int64) - 1] = False
+        u, v = node_of[:-1][linked], node_of[1:][linked]
+        keep = u != v
+        u, v = u[keep], v[keep]
+
+        # Both directions, duplicates dropped
+        src = np.concatenate([u, v])
+        dst = np.concatenate([v, u])
+        pairs = np.unique(src.astype(np.int64) * len(nodes) + dst)
+        src = (pairs // len(nodes)).astype(np.int32)
+        dst = (pairs % len(nodes)).astype(np.int32)
+
+        delta = nodes[src] - nodes[dst]
+        weights = np.hypot(delta[:, 0], delta[:, 1]).astype(np.float32)
+        indptr = np.zeros(len(nodes) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=len(nodes)), out=indptr[1:])
+        return cls(nodes, indptr, dst, weights)
+
+    @classmethod
+    def load(cls, osm_file: str, cache_file: str | None = None) -> 'RailGraph':
+        """From the .npz cache when it was built from this very export, otherwise parsed and cached."""
+        cache_file = cache_file or f"{osm_file}.npz"
+        source = cls._source_stamp(osm_file)
+        if os.path.exists(cache_file):
+            with np.load(cache_file) as cached:
+                if int(cached["format"]) == CACHE_FORMAT and str(cached["source"]) == source:
+                    print(f"Rail graph loaded from {cache_file}")
+                    return cls(cached["nodes"], cached["indptr"], cached["indices"], cached["weights"])
+
+        graph = cls.from_ways(iter_railway_ways(osm_file))
+        graph.save(cache_file, source)
+        return graph
+
+    def save(self, cache_file: str, source: str) -> None:
+        tmp_file = f"{cache_file}.tmp.npz"
+        np.savez(
+            tmp_file,
+            format=CACHE_FORMAT, source=source,
+            nodes=self.nodes, indptr=self.indptr, indices=self.indices, weights=self.weights,
+        )
+        os.replace(tmp_file, cache_file)
+
+    @staticmethod
+    def _source_stamp(osm_file: str) -> str:
+        stat = os.stat(osm_file)
+        return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+    def nearest_nodes(self, points: np.ndarray, max_distance: float) -> np.ndarray:
+        """Index of the closest node to every (lat, lon) point, -1 when none is within max_distance."""
+        result = np.full(len(points), -1, dtype=np.int64)
+        if self.node_count == 0:
+            return result
+
+        cells = np.floor(self.nodes / SNAP_CELL).astype(np.int64)
+        keys = cells[:, 0] * 100_000 + cells[:, 1]
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+
+        for i, (lat, lon) in enumerate(points):
+            cy, cx = math.floor(lat / SNAP_CELL), math.floor(lon / SNAP_CELL)
+            candidates = []
+            for dy in (-1, 0, 1):
+                row = (cy + dy) * 100_000
+                lo = np.searchsorted(sorted_keys, row + cx - 1, 'left')
+                hi = np.searchsorted(sorted_keys, row + cx + 1, 'right')
+                candidates.append(order[lo:hi])
+            candidates = np.concatenate(candidates)
+            if not len(candidates):
+                continue
+            distances = np.hypot(self.nodes[candidates, 0] - lat, self.nodes[candidates, 1] - lon)
+            best = int(np.argmin(distances))
+            if distances[best] <= max_distance:
+                result[i] = candidates[best]
+        return result
+
+    def shortest_path(self, source: int, target: int) -> list[int] | None:
+        """A* over the CSR arrays; straight-line distance is an exact lower bound of the edge weights."""
+        if source == target:
+            return [source]
+        nodes, indptr, indices, weights = self.nodes, self.indptr, self.indices, self.weights
+        t_lat, t_lon = nodes[target]
+
+        best = {source: 0.0}
+        previous = {}
+        closed = set()
+        heap = [(math.hypot(nodes[source, 0] - t_lat, nodes[source, 1] - t_lon), 0.0, source)]
+        while heap:
+            _, cost, u = heapq.heappop(heap)
+            if u == target:
+                path = [u]
+                while u != source:
+                    u = previous[u]
+                    path.append(u)
+                return path[::-1]
+            if u in closed:
+                continue
+            closed.add(u)
+
+            start, end = indptr[u], indptr[u + 1]
+            for v, w in zip(indices[start:end].tolist(), weights[start:end].tolist()):
+                new_cost = cost + w
+                if new_cost < best.get(v, math.inf):
+                    best[v] = new_cost
+                    previous[v] = u
+                    lat, lon = nodes[v]
+                    heapq.heappush(heap, (new_cost + math.hypot(lat - t_lat, lon - t_lon), new_cost, v))
+        return None
+
+
+class GraphLoader:
+    def __init__(self):
+        self.graph = RailGraph.from_ways([])
+        self.stations = {}
+        self.station_node_map = {}
+
+    def load_data(self, osm_file: str = "poland.json", cache_file: str | None = None) -> None:
+        self.graph = RailGraph.load(osm_file, cache_file)
+        print(f"Graph loaded: {self.graph.node_count} nodes, {self.graph.edge_count} edges.")
+
+    def load_stations(self, rows) -> None:
+        for row in rows:
+            self.stations[row["id"]] = {"id": row["id"], "name": row["name"], "lat": row["lat"], "lon": row["lon"]}
+
+    def snap_stations(self, max_distance: float = 0.03) -> None:
+        if self.graph.node_count == 0:
+            print("Graph is empty. Cannot snap.")
+            return
+
+        located = [st for st in self.stations.values() if st["lat"] is not None and st["lon"] is not None]
+        points = np.array([(st["lat"], st["lon"]) for st in located], dtype=np.float64).reshape(-1, 2)
+        for st, node in zip(located, self.graph.nearest_nodes(points, max_distance)):
+            if node < 0:
+                print(f"Station {st['name']} (ID {st['id']}) is too far from graph. Left unsnapped.")
+                continue
+            self.station_node_map[st["id"]] = int(node)
+
+    def find_path(self, start_station_id: int, end_station_id: int) -> list[tuple[float, float]] | None:
+        start_node = self.station_node_map.get(start_station_id)
+        end_node = self.station_node_map.get(end_station_id)
+
+        if start_node is None or end_node is None:
+            s_raw = self.stations.get(start_station_id)
+            e_raw = self.stations.get(end_station_id)
+            if s_raw and e_raw and s_raw["lat"] is not None and e_raw["lat"] is not None:
+                # Unsnapped station: straight line
+                return [(s_raw["lat"], s_raw["lon"]), (e_raw["lat"], e_raw["lon"])]
+            return None
+
+        path = self.graph.shortest_path(start_node, end_node)
+        if path is None:
+            path = [start_node, end_node]
+        return [tuple(self.graph.nodes[node].tolist()) for node in path]